@@ -0,0 +1,51 @@
+"""Benchmark reading build metadata files from large source archives.
+
+Compares looking up members by name, as pybuild-deps used to do, with the single
+pass over members done by ``read_archive_files``.
+"""
+
+import tarfile
+
+import pytest
+
+from pybuild_deps.archive import read_archive_files
+from pybuild_deps.constants import BUILD_METADATA_FILES
+
+
+MEMBERS = 20_000
+
+
+def read_by_name(path):
+    """Previous implementation, looking up members by name."""
+    files = {}
+    with tarfile.open(path) as tarball:
+        root_dir = tarball.getnames()[0].split("/")[0]
+        for file_name in BUILD_METADATA_FILES:
+            try:
+                file = tarball.extractfile(f"{root_dir}/{file_name}")
+            except KeyError:
+                continue
+            if file is not None:
+                files[file_name] = file.read()
+    return files
+
+
+def read_single_pass(path):
+    """Current implementation, reading all files in a single pass over members."""
+    return read_archive_files(path, BUILD_METADATA_FILES)
+
+
+@pytest.fixture(params=[True, False], ids=["metadata-first", "metadata-last"])
+def archive(request, sdist_factory, corpus):
+    """Source distribution with MEMBERS modules, before or after build metadata."""
+    modules = {f"src/pkg/module_{i}.py": f"x_{i} = {i}\n" * 200 for i in range(MEMBERS)}
+    files = {**corpus, **modules} if request.param else {**modules, **corpus}
+    return sdist_factory("pkg", "1.0", files)
+
+
+@pytest.mark.parametrize("read", [read_by_name, read_single_pass])
+def test_read_archive(benchmark, archive, read):
+    """Read build metadata files of a large source distribution."""
+    files = benchmark(read, archive)
+    assert files == read_by_name(archive)
+    assert set(files) == set(BUILD_METADATA_FILES)
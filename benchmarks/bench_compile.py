@@ -0,0 +1,84 @@
+"""Benchmark resolving graphs of build dependencies.
+
+Graphs are synthetic: finding and pinning build dependencies is replaced by
+lookups in a fake index (like tests/test_compile_build_dependencies.py does), so
+only the graph traversal and bookkeeping of the compiler are measured.
+"""
+
+from __future__ import annotations
+
+import pytest
+from pip._internal.req.constructors import install_req_from_req_string
+from piptools.repositories import PyPIRepository
+
+from pybuild_deps.compile_build_dependencies import (
+    BuildDependencyCompiler,
+    deduplicate_install_requirements,
+)
+from pybuild_deps.constants import PIPTOOLS_CACHE_DIR
+
+
+def make_graph(size: int) -> dict[tuple[str, str], list[str]]:
+    """Build dependencies of size packages.
+
+    Packages form a binary tree, and all of them share a common leaf (like most
+    packages depend on setuptools).
+    """
+    graph = {}
+    for i in range(size):
+        children = [f"pkg-{child}" for child in (2 * i + 1, 2 * i + 2) if child < size]
+        graph[(f"pkg-{i}", "1.0")] = [*children, "common"]
+    graph[("common", "1.0")] = []
+    return graph
+
+
+@pytest.fixture
+def fake_index(mocker):
+    """Replace network-bound steps with a fake index, returning its setter."""
+    index = {}
+
+    def find_build_dependencies(package_name, version, **kwargs):
+        return index[(package_name, version)]
+
+    def resolve_with_piptools(self, package, ireqs, constraints=None):
+        return {
+            install_req_from_req_string(f"{ireq.name}==1.0", comes_from=package)
+            for ireq in ireqs
+        }
+
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=find_build_dependencies,
+    )
+    mocker.patch.object(
+        BuildDependencyCompiler, "_resolve_with_piptools", resolve_with_piptools
+    )
+    return index.update
+
+
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def test_resolve(benchmark, fake_index, size):
+    """Resolve a graph of size packages, requiring a tenth of them."""
+    graph = make_graph(size)
+    fake_index(graph)
+    repository = PyPIRepository([], cache_dir=PIPTOOLS_CACHE_DIR)
+    requirements = [f"pkg-{i}==1.0" for i in range(max(size // 10, 1))]
+
+    def resolve():
+        compiler = BuildDependencyCompiler(repository)
+        return compiler.resolve(map(install_req_from_req_string, requirements))
+
+    build_dependencies = benchmark(resolve)
+    # every package is a build dependency of its parent, but the root of the tree
+    assert len(build_dependencies) == size
+
+
+@pytest.mark.parametrize("size", [1000, 10000])
+def test_deduplicate_install_requirements(benchmark, size):
+    """Deduplicate size requirements of a hundred packages, required by many."""
+    ireqs = [
+        install_req_from_req_string(f"pkg-{i % 100}==1.0", comes_from=f"parent-{i}")
+        for i in range(size)
+    ]
+    unique = benchmark(deduplicate_install_requirements, ireqs)
+    assert len(unique) == 100
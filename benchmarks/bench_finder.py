@@ -0,0 +1,45 @@
+"""Benchmark finding build dependencies, with a cold and a warm cache."""
+
+import pytest
+
+from pybuild_deps import finder
+from pybuild_deps.source import get_pip_session
+
+
+PACKAGES = 20
+
+
+@pytest.fixture
+def packages(corpus_index):
+    """Packages published to the local index."""
+    return corpus_index(PACKAGES)
+
+
+def find_all(packages, index_url):
+    """Find build dependencies of every package."""
+    pip_session = get_pip_session()
+    return [
+        finder.find_build_dependencies(
+            name, version, pip_session=pip_session, index_url=index_url
+        )
+        for name, version in packages
+    ]
+
+
+def test_find_build_dependencies_cold(benchmark, packages, http_server, clear_cache):
+    """Download, extract and parse sources of every package."""
+    results = benchmark.pedantic(
+        find_all,
+        args=(packages, http_server.index_url),
+        setup=clear_cache,
+        rounds=5,
+    )
+    assert len(results) == PACKAGES
+    assert all(results)
+
+
+def test_find_build_dependencies_warm(benchmark, packages, http_server):
+    """Look up results of every package in the cache."""
+    expected = find_all(packages, http_server.index_url)
+    results = benchmark(find_all, packages, http_server.index_url)
+    assert results == expected
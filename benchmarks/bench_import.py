@@ -0,0 +1,60 @@
+"""Benchmark the import time of the command-line interface.
+
+pybuild-deps is often invoked from shell loops (e.g. ``find-build-deps`` for each
+package of a lock file), so its startup time matters. This measures importing
+``pybuild_deps.__main__`` in a fresh interpreter with ``python -X importtime``,
+and fails when it goes over budget, or when modules only needed by some
+subcommands are imported eagerly.
+"""
+
+import subprocess
+import sys
+
+
+MODULE = "pybuild_deps.__main__"
+# maximum import time, in milliseconds
+BUDGET = 100
+# only needed by compile (or by find-build-deps once invoked)
+LAZY_MODULES = (
+    "piptools.repositories",
+    "piptools.resolver",
+    "piptools.scripts.compile",
+    "pip._internal.network.session",
+    "pybuild_deps.scripts.compile",
+    "pybuild_deps.finder",
+)
+PREFIX = "import time:"
+
+
+def measure_import(module):
+    """Import module in a fresh interpreter.
+
+    Returns the cumulative import time of every module imported along with it
+    (itself included), in milliseconds.
+    """
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith(PREFIX) or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len(PREFIX) :].split("|")
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def test_import_cli(benchmark):
+    """Import the command-line interface, without modules of subcommands."""
+    measurements = []
+
+    def measure():
+        measurements.append(measure_import(MODULE))
+
+    benchmark.pedantic(measure, rounds=5)
+    imported = min(measurements, key=lambda times: times[MODULE])
+    assert [name for name in LAZY_MODULES if name in imported] == []
+    assert imported[MODULE] <= BUDGET
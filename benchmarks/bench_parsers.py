@@ -0,0 +1,19 @@
+"""Benchmark parsers on large, real-world like, build metadata files."""
+
+import pytest
+
+from pybuild_deps.parsers import parse_pyproject_toml, parse_setup_cfg, parse_setup_py
+
+
+@pytest.mark.parametrize(
+    "file_name, parser",
+    [
+        ("pyproject.toml", parse_pyproject_toml),
+        ("setup.cfg", parse_setup_cfg),
+        ("setup.py", parse_setup_py),
+    ],
+)
+def test_parser(benchmark, corpus, file_name, parser):
+    """Parse build dependencies of a file of the corpus."""
+    build_dependencies = benchmark(parser, corpus[file_name])
+    assert build_dependencies
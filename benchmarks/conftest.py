@@ -0,0 +1,61 @@
+"""Fixtures of the benchmark suite.
+
+Benchmarks run against the local package index of the test suite (see the root
+conftest.py), serving source distributions built from the corpus directory, so
+no network is needed.
+"""
+
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from pybuild_deps.cache import close_stores
+from pybuild_deps.constants import BUILD_METADATA_FILES
+
+
+CORPUS = Path(__file__).parent / "corpus"
+# files of every source distribution published to the local index, on top of
+# the build metadata files of the corpus
+FILLER_MODULES = 200
+
+
+@pytest.fixture(scope="session")
+def corpus() -> dict[str, str]:
+    """Build metadata files of the corpus, by file name."""
+    return {name: (CORPUS / name).read_text() for name in BUILD_METADATA_FILES}
+
+
+@pytest.fixture
+def corpus_index(http_server, sdist_factory, corpus):
+    """Publish a source distribution of each package to the local index.
+
+    Returns a function taking the number of packages to publish and returning
+    their (name, version).
+    """
+
+    def publish(packages: int) -> list[tuple[str, str]]:
+        files = dict(corpus)
+        for i in range(FILLER_MODULES):
+            files[f"src/pkg/module_{i}.py"] = f"x_{i} = {i}\n" * 50
+        published = []
+        for i in range(packages):
+            name, version = f"corpus-{i}", "1.0"
+            http_server.publish_sdist(sdist_factory(name, version, files))
+            published.append((name, version))
+        return published
+
+    return publish
+
+
+@pytest.fixture
+def clear_cache(cache):
+    """Return a function emptying the cache, to benchmark cold runs."""
+
+    def clear():
+        close_stores()
+        shutil.rmtree(cache, ignore_errors=True)
+
+    return clear
@@ -0,0 +1,482 @@
+"""Setup script for a C/Cython extension package.
+
+Modeled after the setup.py of large projects shipping compiled extensions:
+lots of module level configuration, platform detection, helpers building the
+extension list, and build requirements assembled from named constants.
+"""
+
+import os
+import platform
+import re
+import shlex
+import subprocess
+import sys
+import sysconfig
+from pathlib import Path
+
+from setuptools import Extension, find_packages, setup
+from setuptools.command.build_ext import build_ext
+from setuptools.command.sdist import sdist
+
+
+PYTHON_STEM = Path(__file__).resolve().parent
+PACKAGE_NAME = "fastcodec"
+PACKAGE_DIRECTORY = PYTHON_STEM / "src" / PACKAGE_NAME
+VERSION_FILE = PACKAGE_DIRECTORY / "_version.py"
+README_FILE = PYTHON_STEM / "README.rst"
+CHANGELOG_FILE = PYTHON_STEM / "CHANGELOG.rst"
+THIRD_PARTY = PYTHON_STEM / "third_party"
+ZLIB_INCLUDE = THIRD_PARTY / "zlib"
+ZSTD_INCLUDE = THIRD_PARTY / "zstd" / "lib"
+LZ4_INCLUDE = THIRD_PARTY / "lz4" / "lib"
+BROTLI_INCLUDE = THIRD_PARTY / "brotli" / "c" / "include"
+SNAPPY_INCLUDE = THIRD_PARTY / "snappy"
+XXHASH_INCLUDE = THIRD_PARTY / "xxhash"
+CORE_INCLUDE = PYTHON_STEM / "include"
+CORE_SOURCES_DIR = PYTHON_STEM / "src" / "core"
+CYTHON_SOURCES_DIR = PACKAGE_DIRECTORY / "_cython"
+
+IS_WINDOWS = sys.platform == "win32"
+IS_DARWIN = sys.platform == "darwin"
+IS_LINUX = sys.platform.startswith("linux")
+IS_PYPY = platform.python_implementation() == "PyPy"
+IS_ARM = platform.machine().lower() in ("arm64", "aarch64", "armv7l")
+IS_32_BIT = sys.maxsize <= 2**32
+IS_FREETHREADED = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+
+BUILD_WITH_CYTHON = os.environ.get("FASTCODEC_BUILD_WITH_CYTHON", "0") == "1"
+BUILD_WITH_SYSTEM_ZLIB = os.environ.get("FASTCODEC_SYSTEM_ZLIB", "0") == "1"
+BUILD_WITH_SYSTEM_ZSTD = os.environ.get("FASTCODEC_SYSTEM_ZSTD", "0") == "1"
+BUILD_WITH_SYSTEM_LZ4 = os.environ.get("FASTCODEC_SYSTEM_LZ4", "0") == "1"
+BUILD_WITH_SYSTEM_BROTLI = os.environ.get("FASTCODEC_SYSTEM_BROTLI", "0") == "1"
+BUILD_WITH_SYSTEM_SNAPPY = os.environ.get("FASTCODEC_SYSTEM_SNAPPY", "0") == "1"
+BUILD_WITH_STATIC_LIBSTDCXX = os.environ.get("FASTCODEC_STATIC_LIBSTDCXX", "0") == "1"
+BUILD_WITH_DEBUG_SYMBOLS = os.environ.get("FASTCODEC_DEBUG", "0") == "1"
+BUILD_WITH_COVERAGE = os.environ.get("FASTCODEC_COVERAGE", "0") == "1"
+BUILD_WITH_LTO = os.environ.get("FASTCODEC_LTO", "1") == "1"
+BUILD_PARALLELISM = int(os.environ.get("FASTCODEC_BUILD_JOBS", os.cpu_count() or 1))
+BUILD_EXT_COMPILE_ARGS = shlex.split(os.environ.get("FASTCODEC_CFLAGS", ""))
+BUILD_EXT_LINK_ARGS = shlex.split(os.environ.get("FASTCODEC_LDFLAGS", ""))
+
+DEFINE_MACROS = [
+    ("FASTCODEC_VERSION_MAJOR", "3"),
+    ("FASTCODEC_VERSION_MINOR", "14"),
+    ("ZSTD_MULTITHREAD", "1"),
+    ("XXH_NAMESPACE", "FASTCODEC_"),
+    ("LZ4_DISABLE_DEPRECATE_WARNINGS", "1"),
+    ("BROTLI_BUILD_PORTABLE", "1"),
+    ("HAVE_CONFIG_H", "1"),
+    ("_FILE_OFFSET_BITS", "64"),
+]
+UNIX_COMPILE_ARGS = [
+    "-std=c11",
+    "-fvisibility=hidden",
+    "-fno-strict-aliasing",
+    "-Wall",
+    "-Wextra",
+    "-Wno-unused-parameter",
+    "-Wno-missing-field-initializers",
+    "-O3",
+]
+UNIX_CXX_COMPILE_ARGS = [
+    "-std=c++17",
+    "-fvisibility=hidden",
+    "-fvisibility-inlines-hidden",
+    "-fno-exceptions",
+    "-fno-rtti",
+    "-O3",
+]
+WINDOWS_COMPILE_ARGS = ["/O2", "/GL", "/W3", "/wd4244", "/wd4267", "/wd4996"]
+WINDOWS_LINK_ARGS = ["/LTCG"]
+DARWIN_LINK_ARGS = ["-Wl,-dead_strip", "-Wl,-undefined,dynamic_lookup"]
+LINUX_LINK_ARGS = ["-Wl,--gc-sections", "-Wl,--as-needed", "-Wl,-z,relro"]
+COVERAGE_COMPILE_ARGS = ["--coverage", "-O0", "-g"]
+COVERAGE_LINK_ARGS = ["--coverage"]
+DEBUG_COMPILE_ARGS = ["-O0", "-g3", "-UNDEBUG"]
+LTO_COMPILE_ARGS = ["-flto=auto"]
+LTO_LINK_ARGS = ["-flto=auto"]
+
+ZLIB_SOURCES = [
+    "adler32.c",
+    "compress.c",
+    "crc32.c",
+    "deflate.c",
+    "infback.c",
+    "inffast.c",
+    "inflate.c",
+    "inftrees.c",
+    "trees.c",
+    "uncompr.c",
+    "zutil.c",
+]
+ZSTD_SOURCES = [
+    "common/debug.c",
+    "common/entropy_common.c",
+    "common/error_private.c",
+    "common/fse_decompress.c",
+    "common/pool.c",
+    "common/threading.c",
+    "common/xxhash.c",
+    "common/zstd_common.c",
+    "compress/fse_compress.c",
+    "compress/hist.c",
+    "compress/huf_compress.c",
+    "compress/zstd_compress.c",
+    "compress/zstd_compress_literals.c",
+    "compress/zstd_compress_sequences.c",
+    "compress/zstd_compress_superblock.c",
+    "compress/zstd_double_fast.c",
+    "compress/zstd_fast.c",
+    "compress/zstd_lazy.c",
+    "compress/zstd_ldm.c",
+    "compress/zstd_opt.c",
+    "compress/zstdmt_compress.c",
+    "decompress/huf_decompress.c",
+    "decompress/zstd_ddict.c",
+    "decompress/zstd_decompress.c",
+    "decompress/zstd_decompress_block.c",
+]
+LZ4_SOURCES = ["lz4.c", "lz4hc.c", "lz4frame.c", "xxhash.c"]
+BROTLI_SOURCES = [
+    "common/constants.c",
+    "common/context.c",
+    "common/dictionary.c",
+    "common/platform.c",
+    "common/shared_dictionary.c",
+    "common/transform.c",
+    "dec/bit_reader.c",
+    "dec/decode.c",
+    "dec/huffman.c",
+    "dec/state.c",
+    "enc/backward_references.c",
+    "enc/backward_references_hq.c",
+    "enc/bit_cost.c",
+    "enc/block_splitter.c",
+    "enc/brotli_bit_stream.c",
+    "enc/cluster.c",
+    "enc/command.c",
+    "enc/compound_dictionary.c",
+    "enc/compress_fragment.c",
+    "enc/compress_fragment_two_pass.c",
+    "enc/dictionary_hash.c",
+    "enc/encode.c",
+    "enc/encoder_dict.c",
+    "enc/entropy_encode.c",
+    "enc/fast_log.c",
+    "enc/histogram.c",
+    "enc/literal_cost.c",
+    "enc/memory.c",
+    "enc/metablock.c",
+    "enc/static_dict.c",
+    "enc/utf8_util.c",
+]
+SNAPPY_SOURCES = ["snappy.cc", "snappy-c.cc", "snappy-sinksource.cc"]
+CORE_SOURCES = [
+    "buffer.c",
+    "codec_registry.c",
+    "crc.c",
+    "dispatch.c",
+    "framing.c",
+    "pool.c",
+    "stream.c",
+]
+CYTHON_MODULES = [
+    "_buffer",
+    "_checksum",
+    "_codecs",
+    "_frame",
+    "_registry",
+    "_streaming",
+]
+
+CLASSIFIERS = [
+    "Development Status :: 5 - Production/Stable",
+    "Intended Audience :: Developers",
+    "License :: OSI Approved :: BSD License",
+    "Operating System :: MacOS :: MacOS X",
+    "Operating System :: Microsoft :: Windows",
+    "Operating System :: POSIX :: Linux",
+    "Programming Language :: C",
+    "Programming Language :: C++",
+    "Programming Language :: Cython",
+    "Programming Language :: Python :: 3",
+    "Programming Language :: Python :: 3 :: Only",
+    "Programming Language :: Python :: 3.9",
+    "Programming Language :: Python :: 3.10",
+    "Programming Language :: Python :: 3.11",
+    "Programming Language :: Python :: 3.12",
+    "Programming Language :: Python :: 3.13",
+    "Programming Language :: Python :: Implementation :: CPython",
+    "Programming Language :: Python :: Implementation :: PyPy",
+    "Topic :: System :: Archiving :: Compression",
+]
+PROJECT_URLS = {
+    "Documentation": "https://fastcodec.example.org/en/stable/",
+    "Changelog": "https://fastcodec.example.org/en/stable/changelog.html",
+    "Source": "https://github.com/example/fastcodec",
+    "Tracker": "https://github.com/example/fastcodec/issues",
+}
+
+# build requirements, kept in sync with pyproject.toml for legacy installers
+CYTHON = "Cython>=3.0.10,<4"
+CYTHON_REQUIREMENT = CYTHON
+PKGCONFIG = "pkgconfig>=1.5.5"
+SETUPTOOLS = "setuptools>=64"
+SETUPTOOLS_REQUIREMENT = SETUPTOOLS
+SETUPTOOLS_SCM = "setuptools-scm[toml]>=8"
+WHEEL = "wheel>=0.42"
+WHEEL_REQUIREMENT = WHEEL
+SETUP_REQUIRES = [
+    CYTHON_REQUIREMENT,
+    PKGCONFIG,
+    SETUPTOOLS_REQUIREMENT,
+    SETUPTOOLS_SCM,
+    WHEEL_REQUIREMENT,
+    "cffi>=1.16; platform_python_implementation == 'PyPy'",
+]
+SETUP_REQUIRES_ALIAS = SETUP_REQUIRES
+
+INSTALL_REQUIRES = [
+    "typing-extensions>=4.6; python_version < '3.11'",
+]
+EXTRAS_REQUIRE = {
+    "cli": ["click>=8.1", "rich>=13"],
+    "numpy": ["numpy>=1.24"],
+    "test": [
+        "hypothesis>=6.100",
+        "pytest>=8",
+        "pytest-benchmark>=4",
+        "pytest-xdist>=3.5",
+    ],
+    "docs": ["furo", "sphinx>=7", "sphinx-autodoc-typehints"],
+}
+ENTRY_POINTS = {
+    "console_scripts": ["fastcodec=fastcodec.cli:main"],
+    "fastcodec.codecs": [
+        "zlib=fastcodec.codecs.zlib:ZlibCodec",
+        "zstd=fastcodec.codecs.zstd:ZstdCodec",
+        "lz4=fastcodec.codecs.lz4:Lz4Codec",
+        "brotli=fastcodec.codecs.brotli:BrotliCodec",
+        "snappy=fastcodec.codecs.snappy:SnappyCodec",
+    ],
+}
+
+
+def read_version():
+    """Read the version from the package, without importing it."""
+    match = re.search(
+        r"^__version__ = ['\"]([^'\"]+)['\"]", VERSION_FILE.read_text(), re.M
+    )
+    if not match:
+        raise RuntimeError(f"unable to find version in {VERSION_FILE}")
+    return match.group(1)
+
+
+def read_long_description():
+    """Concatenate the README and the changelog."""
+    parts = [README_FILE.read_text(encoding="utf-8")]
+    if CHANGELOG_FILE.exists():
+        parts.append(CHANGELOG_FILE.read_text(encoding="utf-8"))
+    return "\n\n".join(parts)
+
+
+def pkg_config(package, option):
+    """Query pkg-config, returning an empty list when it's unavailable."""
+    try:
+        output = subprocess.check_output(
+            ["pkg-config", option, package], stderr=subprocess.DEVNULL
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    return shlex.split(output.decode())
+
+
+def compile_args(cxx=False):
+    """Compiler arguments for the current platform and build options."""
+    if IS_WINDOWS:
+        args = list(WINDOWS_COMPILE_ARGS)
+    elif cxx:
+        args = list(UNIX_CXX_COMPILE_ARGS)
+    else:
+        args = list(UNIX_COMPILE_ARGS)
+    if BUILD_WITH_COVERAGE and not IS_WINDOWS:
+        args += COVERAGE_COMPILE_ARGS
+    if BUILD_WITH_DEBUG_SYMBOLS and not IS_WINDOWS:
+        args += DEBUG_COMPILE_ARGS
+    if BUILD_WITH_LTO and not (IS_WINDOWS or BUILD_WITH_DEBUG_SYMBOLS):
+        args += LTO_COMPILE_ARGS
+    return args + BUILD_EXT_COMPILE_ARGS
+
+
+def link_args():
+    """Linker arguments for the current platform and build options."""
+    if IS_WINDOWS:
+        args = list(WINDOWS_LINK_ARGS)
+    elif IS_DARWIN:
+        args = list(DARWIN_LINK_ARGS)
+    else:
+        args = list(LINUX_LINK_ARGS)
+    if BUILD_WITH_STATIC_LIBSTDCXX and IS_LINUX:
+        args.append("-static-libstdc++")
+    if BUILD_WITH_COVERAGE and not IS_WINDOWS:
+        args += COVERAGE_LINK_ARGS
+    if BUILD_WITH_LTO and not (IS_WINDOWS or BUILD_WITH_DEBUG_SYMBOLS):
+        args += LTO_LINK_ARGS
+    return args + BUILD_EXT_LINK_ARGS
+
+
+def bundled_library(name, include_dir, sources, system, pkg):
+    """Sources, include dirs and libraries for a (possibly bundled) library."""
+    if system:
+        return {
+            "sources": [],
+            "include_dirs": [flag[2:] for flag in pkg_config(pkg, "--cflags-only-I")],
+            "libraries": [flag[2:] for flag in pkg_config(pkg, "--libs-only-l")]
+            or [name],
+        }
+    return {
+        "sources": [str(include_dir / source) for source in sources],
+        "include_dirs": [str(include_dir)],
+        "libraries": [],
+    }
+
+
+def build_extensions():
+    """Build the list of extensions, depending on build options."""
+    libraries = [
+        bundled_library(
+            "z", ZLIB_INCLUDE, ZLIB_SOURCES, BUILD_WITH_SYSTEM_ZLIB, "zlib"
+        ),
+        bundled_library(
+            "zstd", ZSTD_INCLUDE, ZSTD_SOURCES, BUILD_WITH_SYSTEM_ZSTD, "libzstd"
+        ),
+        bundled_library(
+            "lz4", LZ4_INCLUDE, LZ4_SOURCES, BUILD_WITH_SYSTEM_LZ4, "liblz4"
+        ),
+        bundled_library(
+            "brotlienc",
+            BROTLI_INCLUDE.parent,
+            BROTLI_SOURCES,
+            BUILD_WITH_SYSTEM_BROTLI,
+            "libbrotlienc",
+        ),
+    ]
+    sources = [str(CORE_SOURCES_DIR / source) for source in CORE_SOURCES]
+    include_dirs = [str(CORE_INCLUDE)]
+    extra_libraries = []
+    for library in libraries:
+        sources += library["sources"]
+        include_dirs += library["include_dirs"]
+        extra_libraries += library["libraries"]
+    suffix = ".pyx" if BUILD_WITH_CYTHON else ".c"
+    extensions = [
+        Extension(
+            f"{PACKAGE_NAME}._cython.{module}",
+            sources=[str(CYTHON_SOURCES_DIR / f"{module}{suffix}"), *sources],
+            include_dirs=include_dirs,
+            libraries=extra_libraries,
+            define_macros=DEFINE_MACROS,
+            extra_compile_args=compile_args(),
+            extra_link_args=link_args(),
+        )
+        for module in CYTHON_MODULES
+    ]
+    snappy = bundled_library(
+        "snappy", SNAPPY_INCLUDE, SNAPPY_SOURCES, BUILD_WITH_SYSTEM_SNAPPY, "snappy"
+    )
+    extensions.append(
+        Extension(
+            f"{PACKAGE_NAME}._snappy",
+            sources=[str(CORE_SOURCES_DIR / "snappy_module.cc"), *snappy["sources"]],
+            include_dirs=[str(CORE_INCLUDE), *snappy["include_dirs"]],
+            libraries=snappy["libraries"],
+            language="c++",
+            extra_compile_args=compile_args(cxx=True),
+            extra_link_args=link_args(),
+        )
+    )
+    if BUILD_WITH_CYTHON:
+        from Cython.Build import cythonize
+
+        extensions = cythonize(
+            extensions,
+            nthreads=BUILD_PARALLELISM,
+            compiler_directives={
+                "language_level": "3",
+                "binding": True,
+                "embedsignature": True,
+                "freethreading_compatible": IS_FREETHREADED,
+            },
+        )
+    return extensions
+
+
+class BuildExt(build_ext):
+    """Build extensions in parallel, skipping them on PyPy when unsupported."""
+
+    def finalize_options(self):
+        """Default to building in parallel."""
+        super().finalize_options()
+        if self.parallel is None:
+            self.parallel = BUILD_PARALLELISM
+
+    def build_extension(self, ext):
+        """Build an extension, explaining how to fix common failures."""
+        try:
+            super().build_extension(ext)
+        except Exception:
+            sys.stderr.write(
+                f"failed to build {ext.name}; set FASTCODEC_SYSTEM_* to link "
+                "against system libraries instead of the bundled ones\n"
+            )
+            raise
+
+
+class SDist(sdist):
+    """Generate C sources with Cython before making a source distribution."""
+
+    def run(self):
+        """Cythonize, then make the source distribution."""
+        from Cython.Build import cythonize
+
+        cythonize(
+            [str(CYTHON_SOURCES_DIR / f"{module}.pyx") for module in CYTHON_MODULES]
+        )
+        super().run()
+
+
+if IS_PYPY:
+    CYTHON_MODULES = [module for module in CYTHON_MODULES if module != "_streaming"]
+
+if IS_32_BIT and IS_WINDOWS:
+    DEFINE_MACROS.append(("ZSTD_NO_ASM", "1"))
+
+if IS_ARM and IS_DARWIN:
+    UNIX_COMPILE_ARGS.append("-mcpu=apple-m1")
+
+
+setup(
+    name=PACKAGE_NAME,
+    version=read_version(),
+    description="Fast compression codecs with a common streaming interface",
+    long_description=read_long_description(),
+    long_description_content_type="text/x-rst",
+    author="Example Authors",
+    author_email="fastcodec@example.org",
+    url="https://fastcodec.example.org",
+    project_urls=PROJECT_URLS,
+    license="BSD-3-Clause",
+    classifiers=CLASSIFIERS,
+    keywords=["compression", "zstd", "lz4", "brotli", "snappy", "zlib"],
+    package_dir={"": "src"},
+    packages=find_packages("src", exclude=["tests", "tests.*"]),
+    package_data={PACKAGE_NAME: ["py.typed", "*.pyi", "_cython/*.pxd"]},
+    ext_modules=build_extensions(),
+    cmdclass={"build_ext": BuildExt, "sdist": SDist},
+    python_requires=">=3.9",
+    setup_requires=SETUP_REQUIRES_ALIAS,
+    install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
+    entry_points=ENTRY_POINTS,
+    zip_safe=False,
+)
@@ -1,10 +1,24 @@
 """pytest configuration."""
 
+from __future__ import annotations
+
+import io
+import json
+import re
+import tarfile
+import zipfile
+from dataclasses import dataclass, field
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from importlib import reload
+from pathlib import Path
+from threading import Thread
 
 import pytest
 
 from pybuild_deps import finder
+from pybuild_deps.cache import close_stores
 
 
 def pytest_configure(config):
@@ -23,3 +37,112 @@ def cache(mocker, tmp_path):
     reload(finder)
 
     yield mocked_cache
+    close_stores()
+
+
+@dataclass
+class LocalServer:
+    """A local HTTP server serving files from root."""
+
+    root: Path
+    url: str = ""
+    supports_ranges: bool = True
+    # (method, path, range header) of every request received
+    requests: list = field(default_factory=list)
+
+    @property
+    def index_url(self) -> str:
+        """Index url of a package index standing in for PyPI."""
+        return f"{self.url}/simple/"
+
+    def publish(self, name: str, version: str, urls: list[dict]):
+        """Serve PyPI's JSON API response for a package version."""
+        json_file = self.root / "pypi" / name / version / "json"
+        json_file.parent.mkdir(parents=True)
+        json_file.write_text(json.dumps({"urls": urls}))
+
+    def publish_sdist(self, sdist: Path):
+        """Publish a source distribution served by this server."""
+        name, version = sdist.name.split(".tar")[0].split(".zip")[0].rsplit("-", 1)
+        self.publish(
+            name,
+            version,
+            [{"python_version": "source", "url": f"{self.url}/{sdist.name}"}],
+        )
+
+
+class _RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files, supporting single range requests."""
+
+    def send_head(self):
+        local_server: LocalServer = self.server.local_server
+        range_header = self.headers.get("Range")
+        local_server.requests.append((self.command, self.path, range_header))
+        path = Path(self.translate_path(self.path))
+        if not path.is_file():
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return None
+        content = path.read_bytes()
+        start, end = 0, len(content) - 1
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header or "")
+        if match and local_server.supports_ranges:
+            start = int(match[1])
+            end = min(int(match[2] or end), end)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+        else:
+            self.send_response(HTTPStatus.OK)
+        if local_server.supports_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", self.guess_type(str(path)))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        return io.BytesIO(content[start : end + 1])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Serve files from a temporary directory over HTTP."""
+    root = tmp_path / "www"
+    root.mkdir()
+    local_server = LocalServer(root)
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(_RangeRequestHandler, directory=str(root))
+    )
+    server.local_server = local_server
+    local_server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield local_server
+    server.shutdown()
+    server.server_close()
+
+
+def make_sdist(
+    directory: Path, name: str, version: str, files: dict, fmt: str = "tar.gz"
+) -> Path:
+    """Create a source distribution with given files in directory."""
+    root_dir = f"{name}-{version}"
+    path = directory / f"{root_dir}.{fmt}"
+    if fmt == "zip":
+        with zipfile.ZipFile(path, "w") as archive:
+            for file_name, content in files.items():
+                archive.writestr(f"{root_dir}/{file_name}", content)
+        return path
+    mode = "w:gz" if fmt == "tar.gz" else "w"
+    with tarfile.open(path, mode) as tarball:
+        for file_name, content in files.items():
+            data = content.encode()
+            info = tarfile.TarInfo(f"{root_dir}/{file_name}")
+            info.size = len(data)
+            tarball.addfile(info, io.BytesIO(data))
+    return path
+
+
+@pytest.fixture
+def sdist_factory(http_server):
+    """Create source distributions served by the local HTTP server."""
+    return partial(make_sdist, http_server.root)
@@ -168,6 +168,25 @@ def xdoctest(session: Session) -> None:
     session.run("python", "-m", "xdoctest", *args)
 
 
+@session(python=python_versions[0])
+def benchmarks(session: Session) -> None:
+    """Run the benchmark suite, saving results under .benchmarks.
+
+    Compare with the results saved by the previous run with::
+
+        nox --session=benchmarks -- --benchmark-compare
+    """
+    session.install(".")
+    session.install("pytest-benchmark", *test_requirements)
+    session.run(
+        "pytest",
+        "benchmarks",
+        "--override-ini=python_files=bench_*.py",
+        "--benchmark-autosave",
+        *session.posargs,
+    )
+
+
 @session(name="docs-build", python=python_versions[0])
 def docs_build(session: Session) -> None:
     """Build the documentation."""
@@ -1,17 +1,53 @@
 """Command-line interface."""
 
+from __future__ import annotations
+
+import importlib
+import json
 import sys
 
 import click
 
-from pybuild_deps.exceptions import PyBuildDepsError
-
-from .finder import find_build_dependencies
 from .logger import log
-from .scripts import compile
+from .offline import offline_option
+from .process_pool import processes_option
+from .profiling import profile_option
+
+
+class LazyGroup(click.Group):
+    """Group importing the modules of its subcommands only when invoked.
+
+    Subcommands like compile depend on pip-tools' resolver and pip internals,
+    which take a while to import. Loading them lazily keeps ``--version``,
+    ``--help`` and find-build-deps fast.
+    """
+
+    def __init__(self, *args, lazy_commands: dict[str, str], **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # command name -> "module:attribute"
+        self.lazy_commands = lazy_commands
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        """List eager and lazy subcommands."""
+        return sorted([*super().list_commands(ctx), *self.lazy_commands])
 
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        """Get a subcommand, importing its module if needed."""
+        if cmd_name in self.lazy_commands:
+            module_name, attribute = self.lazy_commands[cmd_name].split(":")
+            module = importlib.import_module(module_name, __package__)
+            return getattr(module, attribute)
+        return super().get_command(ctx, cmd_name)
 
-@click.group()
+
+@click.group(
+    cls=LazyGroup,
+    lazy_commands={
+        "cache": ".scripts.cache:cache",
+        "compile": ".scripts.compile:compile",
+        "warm": ".scripts.warm:warm",
+    },
+)
 @click.version_option(package_name="pybuild-deps")
 def cli() -> None:
     """Entrypoint for PyBuild Deps."""
@@ -19,25 +55,115 @@ def cli() -> None:
 
 
 @cli.command()
-@click.argument("package-name")
-@click.argument("package-version")
+@click.argument("package-name", required=False)
+@click.argument("package-version", required=False)
 @click.option("-v", "--verbose", count=True, help="Show more output")
-def find_build_deps(package_name, package_version, verbose):
-    """Find build dependencies for given package."""
+@click.option(
+    "-i",
+    "--index-url",
+    envvar="PIP_INDEX_URL",
+    help="Base URL of the Python Package Index used to look up sources.",
+)
+@click.option(
+    "--batch",
+    type=click.File("r"),
+    help=(
+        "Read pinned requirements (like 'foo==1.0'), one per line, from a file "
+        "('-' for stdin) instead of PACKAGE_NAME and PACKAGE_VERSION, writing "
+        "results as JSON lines as they complete."
+    ),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of packages looked up in parallel with --batch.",
+)
+@click.option(
+    "--processes",
+    type=click.IntRange(min=0),
+    expose_value=False,
+    callback=processes_option,
+    help=(
+        "Read and parse sources in a pool of this many processes (0 for one per "
+        "CPU), instead of the threads looking them up."
+    ),
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    expose_value=False,
+    callback=offline_option,
+    help=(
+        "Only use sources and results cached by 'pybuild-deps warm', failing on "
+        "anything missing instead of accessing the network."
+    ),
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    expose_value=False,
+    callback=profile_option,
+    help="Print a summary of where time was spent to stderr.",
+)
+def find_build_deps(package_name, package_version, verbose, index_url, batch, jobs):
+    """Find build dependencies for given package.
+
+    With --batch, the exit code is 2 when any of the packages failed.
+    """
+    from .eviction import auto_prune
+    from .exceptions import PyBuildDepsError
+    from .finder import find_build_dependencies
+
     log.verbosity = verbose
 
+    if batch is not None:
+        if package_name or package_version:
+            raise click.UsageError(
+                "PACKAGE_NAME and PACKAGE_VERSION can't be used with --batch."
+            )
+        failed = _find_build_deps_batch(batch, jobs, index_url)
+        auto_prune()
+        sys.exit(2 if failed else 0)
+    if not (package_name and package_version):
+        raise click.UsageError(
+            "PACKAGE_NAME and PACKAGE_VERSION are required (unless using --batch)."
+        )
+
     try:
         deps = find_build_dependencies(
-            package_name=package_name, version=package_version
+            package_name=package_name, version=package_version, index_url=index_url
         )
     except PyBuildDepsError as err:
         log.error(str(err))
         sys.exit(2)
     for dep in deps:
         click.echo(dep)
+    auto_prune()
+
+
+def _find_build_deps_batch(file, jobs: int, index_url: str | None) -> int:
+    """Write a JSON line for each requirement in file, returning failures."""
+    from .batch import find_build_dependencies_batch
+    from .exceptions import CacheMissError
 
+    failed = 0
+    missing = []
+    for result in find_build_dependencies_batch(file, jobs=jobs, index_url=index_url):
+        if "error" in result:
+            failed += 1
+            missing += result.get("missing", [])
+            log.error(f"{result['requirement']}: {result['error']}")
+        click.echo(json.dumps(result))
+    if missing:
+        # report everything missing from the cache at once
+        log.error(str(CacheMissError(missing)))
+    return failed
 
-cli.add_command(compile.compile, "compile")
 
 if __name__ == "__main__":
     cli(prog_name="pybuild-deps")  # pragma: no cover
@@ -0,0 +1,81 @@
+"""Read files from source archives (sdists)."""
+
+from __future__ import annotations
+
+import tarfile
+import zipfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import BinaryIO
+
+from .profiling import profiled
+
+
+def is_archive(path: Path) -> bool:
+    """Check if given path is an archive supported by pybuild-deps."""
+    return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+
+
+@profiled
+def read_archive_files(
+    archive: Path | BinaryIO, file_names: Iterable[str]
+) -> dict[str, bytes]:
+    """Read files from the root directory of a source archive.
+
+    Source archives are expected to have a single root directory, like sdists or
+    tarballs generated by github. Files not found are omitted from the result.
+    archive can be either a path or a seekable binary file object.
+    """
+    if zipfile.is_zipfile(archive):
+        return _read_zip_files(archive, file_names)
+    return _read_tar_files(archive, file_names)
+
+
+def _read_zip_files(
+    archive: Path | BinaryIO, file_names: Iterable[str]
+) -> dict[str, bytes]:
+    files = {}
+    with zipfile.ZipFile(archive) as zip_file:
+        names = zip_file.namelist()
+        if not names:
+            return files
+        root_dir = names[0].split("/")[0]
+        for file_name in file_names:
+            try:
+                files[file_name] = zip_file.read(f"{root_dir}/{file_name}")
+            except KeyError:
+                continue
+    return files
+
+
+def _read_tar_files(
+    archive: Path | BinaryIO, file_names: Iterable[str]
+) -> dict[str, bytes]:
+    """Read files from a tar archive in a single pass over its members.
+
+    Looking up members by name makes tarfile load the whole member list first,
+    which is slow for compressed archives with lots of members. Instead, members
+    are visited in order, stopping as soon as all wanted files were found.
+    """
+    files = {}
+    if isinstance(archive, Path):
+        open_kwargs = {"name": archive}
+    else:
+        archive.seek(0)
+        open_kwargs = {"fileobj": archive}
+    with tarfile.open(**open_kwargs) as tarball:
+        wanted = None
+        for member in tarball:
+            if wanted is None:
+                root_dir = member.name.split("/")[0]
+                wanted = {
+                    f"{root_dir}/{file_name}": file_name for file_name in file_names
+                }
+            file_name = wanted.pop(member.name, None)
+            if file_name is not None:
+                file = tarball.extractfile(member)
+                if file is not None:
+                    files[file_name] = file.read()
+            if not wanted:
+                break
+    return files
@@ -0,0 +1,78 @@
+"""Find build dependencies of many packages in a single process."""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from pip._internal.exceptions import InstallationError
+from pip._internal.network.session import PipSession
+from pip._internal.req.constructors import install_req_from_req_string
+
+from .exceptions import CacheMissError, PyBuildDepsError
+from .finder import find_build_dependencies
+from .logger import log
+from .source import get_pip_session
+from .utils import get_version
+
+
+# same as pip requirement files: "#" starts a comment at the beginning of a line
+# or after whitespace (not in URL fragments, like #egg=)
+COMMENT_RE = re.compile(r"(^|\s+)#.*$")
+
+
+def find_build_dependencies_batch(
+    requirements: Iterable[str],
+    jobs: int = 1,
+    pip_session: PipSession | None = None,
+    index_url: str | None = None,
+) -> Iterator[dict]:
+    """Find build dependencies for many pinned requirements, like "foo==1.0".
+
+    Blank lines and comments are skipped. Requirements are looked up by a pool
+    of jobs threads sharing one pip session (and the cache), and one result is
+    yielded for each of them as soon as it completes, so results come in no
+    particular order. Results have the original "requirement" and either its
+    "build_dependencies" or an "error": failures don't stop the batch. Offline,
+    errors due to the cache lacking something list it under "missing".
+    Requirements are consumed as results are yielded, so they can be streamed.
+    """
+    pip_session = pip_session or get_pip_session()
+    with ThreadPoolExecutor(
+        max_workers=jobs, thread_name_prefix="pybuild-deps-batch"
+    ) as executor:
+        pending: set[Future] = set()
+        for requirement in requirements:
+            requirement = COMMENT_RE.sub("", requirement).strip()
+            if not requirement:
+                continue
+            pending.add(executor.submit(_find, requirement, pip_session, index_url))
+            # bound the number of queued lookups
+            if len(pending) >= jobs * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from (future.result() for future in done)
+
+
+def _find(requirement: str, pip_session: PipSession, index_url: str | None) -> dict:
+    result: dict = {"requirement": requirement}
+    try:
+        ireq = install_req_from_req_string(requirement)
+        result["name"] = ireq.name
+        result["version"] = version = get_version(ireq)
+        result["build_dependencies"] = find_build_dependencies(
+            ireq.name, version, pip_session=pip_session, index_url=index_url
+        )
+    except CacheMissError as err:
+        result["error"] = str(err)
+        result["missing"] = err.artifacts
+    except (PyBuildDepsError, InstallationError) as err:
+        result["error"] = str(err)
+    except Exception as err:  # noqa: BLE001
+        # an unexpected failure on a single package shouldn't stop the batch
+        log.debug(f"unexpected error finding build dependencies of {requirement}")
+        result["error"] = f"{type(err).__name__}: {err}"
+    return result
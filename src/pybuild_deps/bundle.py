@@ -0,0 +1,252 @@
+"""Export cached data to portable bundles, and import them into other caches.
+
+A bundle is a gzipped tarball holding everything cached for a set of pinned
+requirements: results of ``lookup_build_dependencies``, hashes and resolutions
+(see the resolution module) and sources (see the source module). It has a
+manifest with the sha256 of all its other members, and all of them are verified
+before anything is imported.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import tarfile
+import zlib
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from tempfile import TemporaryDirectory
+from typing import BinaryIO
+
+from pip._vendor.packaging.requirements import Requirement
+from pip._vendor.packaging.utils import canonicalize_name, canonicalize_version
+
+from . import constants
+from .cache import get_store
+from .exceptions import PyBuildDepsError
+from .finder import lookup_build_dependencies
+from .resolution import HASHES, RESOLUTIONS, hashes_key
+from .source import (
+    OBJECTS_DIR,
+    cache_key,
+    copy_cached_source,
+    get_cached_source_dirs,
+    iter_cached_source_files,
+    lock_package_source,
+)
+
+
+# bump when changing the layout of bundles
+BUNDLE_VERSION = 1
+MANIFEST = "manifest.json"
+RESULTS = "results.json"
+SOURCES_DIR = "sources"
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class BundleReport:
+    """Summary of a bundle export or import."""
+
+    results: int = 0
+    sources: int = 0
+    # requirements not cached when exporting, or entries already cached when
+    # importing
+    skipped: int = 0
+
+
+def export_bundle(path: Path, requirements: Iterable[tuple[str, str]]) -> BundleReport:
+    """Write a bundle of everything cached for requirements, as (name, version).
+
+    Resolutions are exported when all the packages they resolve to are part of
+    requirements, so compiled build requirements should be given as well.
+    """
+    requirements = list(dict.fromkeys(requirements))
+    report = BundleReport()
+    results = _export_results(requirements, report)
+    with tarfile.open(path, "w:gz") as bundle:
+        files = {RESULTS: _add_bytes(bundle, RESULTS, _dump(results))}
+        sources: list[str] = []
+        for name, version in requirements:
+            if not get_cached_source_dirs(name, version):
+                # locking creates the directory of a source, leaving it empty
+                report.skipped += 1
+                continue
+            # keep sources from being evicted while they are added
+            with lock_package_source(name, version):
+                cached_dirs = get_cached_source_dirs(name, version)
+                for cached_dir in cached_dirs:
+                    if cache_key(cached_dir) in sources:
+                        # objects are shared by all names and URLs of an artifact
+                        continue
+                    sources.append(cache_key(cached_dir))
+                    for file in iter_cached_source_files(cached_dir):
+                        arcname = f"{SOURCES_DIR}/{cache_key(file)}"
+                        files[arcname] = _hash_file(file)
+                        bundle.add(file, arcname=arcname, recursive=False)
+            if cached_dirs:
+                report.sources += 1
+            else:
+                report.skipped += 1
+        manifest = {"version": BUNDLE_VERSION, "sources": sources, "files": files}
+        _add_bytes(bundle, MANIFEST, _dump(manifest))
+    return report
+
+
+def import_bundle(path: Path) -> BundleReport:
+    """Merge a bundle written by ``export_bundle`` into the cache.
+
+    Raises PyBuildDepsError, importing nothing, when the bundle doesn't match its
+    manifest. Entries already cached are kept as they are.
+    """
+    report = BundleReport()
+    with TemporaryDirectory(prefix="pybuild-deps-bundle-") as tmp_dir:
+        root = Path(tmp_dir)
+        manifest = _extract(path, root)
+        # objects first, so index records never point to objects not imported yet
+        sources = sorted(
+            manifest["sources"], key=lambda key: not key.startswith(OBJECTS_DIR)
+        )
+        for key in sources:
+            source_dir = root / SOURCES_DIR / key
+            if copy_cached_source(source_dir, constants.CACHE_PATH / key):
+                report.sources += 1
+            else:
+                report.skipped += 1
+        store = get_store()
+        results = json.loads((root / RESULTS).read_text())
+        for namespace, values in results.items():
+            cached = store.items(namespace)
+            for key, value in values.items():
+                if key in cached:
+                    report.skipped += 1
+                    continue
+                store.set(namespace, key, value)
+                report.results += 1
+        store.flush()
+    return report
+
+
+def _export_results(
+    requirements: list[tuple[str, str]], report: BundleReport
+) -> dict[str, dict]:
+    store = get_store()
+    results: dict[str, dict] = {}
+    cached: dict[str, dict] = {}
+    for namespace, key in _result_keys(requirements):
+        if namespace not in cached:
+            cached[namespace] = store.items(namespace)
+        if key in cached[namespace]:
+            results.setdefault(namespace, {})[key] = cached[namespace][key]
+            report.results += 1
+    pins = {_pin(name, version) for name, version in requirements}
+    for key, resolution in store.items(RESOLUTIONS).items():
+        resolved = {_resolved_pin(r["req"]) for r in resolution["requirements"]}
+        if resolved <= pins:
+            results.setdefault(RESOLUTIONS, {})[key] = resolution
+            report.results += 1
+    return results
+
+
+def _result_keys(requirements: list[tuple[str, str]]) -> Iterator[tuple[str, str]]:
+    """Keys of results stored for requirements, with their namespace."""
+    for name, version in requirements:
+        yield (
+            lookup_build_dependencies.cache_name,
+            lookup_build_dependencies.cache_key(name, version),
+        )
+        yield HASHES, hashes_key(name, version)
+
+
+def _extract(path: Path, root: Path) -> dict:
+    """Extract the files of a bundle to root, verifying them against its manifest.
+
+    Returns the manifest.
+    """
+    hashes = {}
+    try:
+        with tarfile.open(path, "r:gz") as bundle:
+            for member in bundle:
+                if not member.isfile() or member.name in hashes:
+                    raise PyBuildDepsError(
+                        f"Unexpected member '{member.name}' in bundle '{path}'."
+                    )
+                target = root / _safe_path(path, member.name)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with bundle.extractfile(member) as src, open(target, "wb") as dst:
+                    hashes[member.name] = _copy(src, dst)
+    except (tarfile.TarError, EOFError, zlib.error, OSError) as err:
+        raise PyBuildDepsError(f"Unable to read bundle '{path}': {err}") from err
+    try:
+        manifest = json.loads((root / MANIFEST).read_text())
+        version, files, sources = (
+            manifest["version"],
+            manifest["files"],
+            manifest["sources"],
+        )
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        raise PyBuildDepsError(f"Bundle '{path}' has no valid manifest.") from err
+    if version != BUNDLE_VERSION:
+        raise PyBuildDepsError(
+            f"Bundle '{path}' has version {version}, expected {BUNDLE_VERSION}."
+        )
+    hashes.pop(MANIFEST)
+    if hashes != files:
+        raise PyBuildDepsError(
+            f"Bundle '{path}' is corrupted, its contents don't match its manifest."
+        )
+    for key in sources:
+        _safe_path(path, key)
+    return manifest
+
+
+def _safe_path(path: Path, name: str) -> PurePosixPath:
+    """Check that a path read from a bundle stays within the directory it's in."""
+    safe_path = PurePosixPath(name)
+    if safe_path.is_absolute() or ".." in safe_path.parts or not safe_path.parts:
+        raise PyBuildDepsError(f"Unexpected path '{name}' in bundle '{path}'.")
+    return safe_path
+
+
+def _add_bytes(bundle: tarfile.TarFile, name: str, content: bytes) -> str:
+    """Add a member with content to bundle, returning its sha256."""
+    member = tarfile.TarInfo(name)
+    member.size = len(content)
+    bundle.addfile(member, io.BytesIO(content))
+    return hashlib.sha256(content).hexdigest()
+
+
+def _dump(value) -> bytes:
+    return json.dumps(value, sort_keys=True).encode()
+
+
+def _hash_file(path: Path) -> str:
+    with open(path, "rb") as file:
+        return _copy(file, None)
+
+
+def _copy(src: BinaryIO, dst: BinaryIO | None) -> str:
+    """Copy src to dst (if any) in chunks, returning the sha256 of its content."""
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+        sha256.update(chunk)
+        if dst is not None:
+            dst.write(chunk)
+    return sha256.hexdigest()
+
+
+def _pin(name: str, version: str) -> tuple[str, str]:
+    return canonicalize_name(name), canonicalize_version(version)
+
+
+def _resolved_pin(requirement: str) -> tuple[str, str] | None:
+    """Get the name and version a requirement is pinned to, if any."""
+    req = Requirement(requirement)
+    if req.url:
+        return _pin(req.name, req.url)
+    specifiers = list(req.specifier)
+    if len(specifiers) != 1 or specifiers[0].operator not in ("==", "==="):
+        return None
+    return _pin(req.name, specifiers[0].version)
@@ -2,38 +2,496 @@
 
 from __future__ import annotations
 
+import atexit
 import hashlib
-import shelve
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Generator, Iterable
+from contextlib import contextmanager
+from dataclasses import dataclass
 from functools import wraps
+from pathlib import Path
+from typing import Any, NamedTuple
 
 from .constants import CACHE_PATH
 from .logger import log
+from .timing import count, timed
 
 
-def persistent_cache(cache_name: str, ignore_kwargs: list | None = None):
-    """Cache the results of decorated function to cache_file."""
+CACHE_DB = "cache.sqlite3"
+SCHEMA_VERSION = 1
+# bump when changing how persistent_cache builds its keys
+KEY_VERSION = 1
+# namespace used for statistics about cached sources
+SOURCES = "sources"
+# pending writes are flushed when reaching any of these limits
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 1.0  # seconds
+# how long to wait for a lock held by another process
+BUSY_TIMEOUT = 30.0  # seconds
+
+_MISSING = object()
+
+_SCHEMA = f"""
+DROP TABLE IF EXISTS results;
+DROP TABLE IF EXISTS sources;
+DROP TABLE IF EXISTS stats;
+DROP TABLE IF EXISTS meta;
+CREATE TABLE results (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE TABLE stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL
+);
+CREATE TABLE meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+
+class CacheEntry(NamedTuple):
+    """A result or a source tracked by the cache store."""
+
+    namespace: str
+    key: str
+    size: int
+    accessed_at: float
+
+
+@dataclass
+class NamespaceStats:
+    """Statistics about a cache namespace."""
+
+    namespace: str
+    entries: int = 0
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float | None:
+        """Ratio of lookups served from cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+class CacheStore:
+    """Persistent key-value store backed by SQLite.
+
+    The database runs in WAL mode, allowing many readers and writers across
+    processes. A single connection is kept open for the lifetime of the process,
+    results are memoized in memory and writes are batched.
+
+    Besides results, the store keeps track of cached sources (see the source
+    module), when each entry was last accessed and hit/miss counters, which are
+    used for eviction and reporting.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._memory: dict[tuple[str, str], Any] = {}
+        self._pending: dict[tuple[str, str], str] = {}
+        self._accessed: dict[tuple[str, str], float] = {}
+        self._sources: dict[str, tuple[int | None, float]] = {}
+        self._hits: Counter[str] = Counter()
+        self._misses: Counter[str] = Counter()
+        self._last_flush = time.monotonic()
+        self._pid = os.getpid()
+        self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if self._schema_version(connection) != SCHEMA_VERSION:
+            connection.execute("BEGIN IMMEDIATE")
+            # check again, another process might have just created the schema
+            if self._schema_version(connection) != SCHEMA_VERSION:
+                # it's just a cache, start over instead of migrating old data
+                for statement in _SCHEMA.split(";"):
+                    connection.execute(statement)
+            connection.execute("COMMIT")
+        return connection
+
+    @staticmethod
+    def _schema_version(connection: sqlite3.Connection) -> int:
+        return connection.execute("PRAGMA user_version").fetchone()[0]
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connection to the database, reopened after a fork."""
+        if self._pid != os.getpid():
+            # sqlite connections must not be shared with child processes
+            self._pid = os.getpid()
+            self._discard_pending()
+            self._connection = self._connect()
+        return self._connection
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Get value stored for key or default when not found."""
+        with self._lock:
+            value = self._memory.get((namespace, key), _MISSING)
+            if value is _MISSING:
+                row = self.connection.execute(
+                    "SELECT value FROM results WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                ).fetchone()
+                if row is None:
+                    self._misses[namespace] += 1
+                    return default
+                value = self._memory[namespace, key] = json.loads(row[0])
+            self._hits[namespace] += 1
+            self._accessed[namespace, key] = time.time()
+            self._maybe_flush()
+            return value
+
+    def items(self, namespace: str) -> dict[str, Any]:
+        """Get all values stored in namespace by key, without accessing them."""
+        self.flush()
+        return {
+            key: json.loads(value)
+            for key, value in self.connection.execute(
+                "SELECT key, value FROM results WHERE namespace = ?", (namespace,)
+            )
+        }
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Store a JSON serializable value for key."""
+        with self._lock:
+            self._memory[namespace, key] = value
+            self._pending[namespace, key] = json.dumps(value)
+            self._maybe_flush()
+
+    def record_source(self, path: str, size: int | None = None, hit: bool = True):
+        """Record an access to a cached source, stored under path.
+
+        size must be given when the source was just added to the cache.
+        """
+        with self._lock:
+            if size is None and path in self._sources:
+                size = self._sources[path][0]
+            self._sources[path] = (size, time.time())
+            if hit:
+                self._hits[SOURCES] += 1
+            else:
+                self._misses[SOURCES] += 1
+            self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        pending = len(self._pending) + len(self._accessed) + len(self._sources)
+        if (
+            pending >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending changes to the database."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not (
+                self._pending
+                or self._accessed
+                or self._sources
+                or self._hits
+                or self._misses
+            ):
+                return
+            now = time.time()
+            with self.transaction() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO results"
+                    " (namespace, key, value, size, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (namespace, key, value, len(value), now, now)
+                        for (namespace, key), value in self._pending.items()
+                    ],
+                )
+                connection.executemany(
+                    "UPDATE results SET accessed_at = max(accessed_at, ?)"
+                    " WHERE namespace = ? AND key = ?",
+                    [
+                        (accessed_at, namespace, key)
+                        for (namespace, key), accessed_at in self._accessed.items()
+                    ],
+                )
+                connection.executemany(
+                    "INSERT INTO sources (path, size, created_at, accessed_at)"
+                    " VALUES (?, coalesce(?, 0), ?, ?)"
+                    " ON CONFLICT (path) DO UPDATE SET"
+                    " size = coalesce(?, size),"
+                    " accessed_at = max(accessed_at, excluded.accessed_at)",
+                    [
+                        (path, size, accessed_at, accessed_at, size)
+                        for path, (size, accessed_at) in self._sources.items()
+                    ],
+                )
+                connection.executemany(
+                    "INSERT INTO stats (namespace, hits, misses) VALUES (?, ?, ?)"
+                    " ON CONFLICT (namespace) DO UPDATE SET"
+                    " hits = hits + excluded.hits,"
+                    " misses = misses + excluded.misses",
+                    [
+                        (namespace, self._hits[namespace], self._misses[namespace])
+                        for namespace in self._hits.keys() | self._misses.keys()
+                    ],
+                )
+            self._discard_pending()
+
+    def _discard_pending(self) -> None:
+        self._pending.clear()
+        self._accessed.clear()
+        self._sources.clear()
+        self._hits.clear()
+        self._misses.clear()
+
+    @contextmanager
+    def transaction(self) -> Generator[sqlite3.Connection]:
+        """Run statements in a write transaction."""
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def entries(self) -> list[CacheEntry]:
+        """List all results and sources in the store."""
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT namespace, key, size, accessed_at FROM results"
+            " UNION ALL"
+            " SELECT ?, path, size, accessed_at FROM sources",
+            (SOURCES,),
+        ).fetchall()
+        return [CacheEntry(*row) for row in rows]
+
+    def delete(self, entries: Iterable[CacheEntry]) -> None:
+        """Delete given entries (their sources must be removed by the caller)."""
+        results, sources = [], []
+        for entry in entries:
+            if entry.namespace == SOURCES:
+                sources.append((entry.key,))
+            else:
+                results.append((entry.namespace, entry.key))
+        with self.transaction() as connection:
+            connection.executemany(
+                "DELETE FROM results WHERE namespace = ? AND key = ?", results
+            )
+            connection.executemany("DELETE FROM sources WHERE path = ?", sources)
+        self.forget()
+
+    def sync_sources(self, sources: dict[str, tuple[int, float]]) -> None:
+        """Reconcile tracked sources with the ones found on disk.
+
+        sources maps the path of each source to its size and modification time.
+        Sources not tracked yet (e.g. cached by older versions) are added,
+        considering their modification time as the last access.
+        """
+        self.flush()
+        with self.transaction() as connection:
+            connection.execute("CREATE TEMP TABLE found_sources (path TEXT)")
+            connection.executemany(
+                "INSERT INTO found_sources (path) VALUES (?)", [(p,) for p in sources]
+            )
+            connection.execute(
+                "DELETE FROM sources WHERE path NOT IN (SELECT path FROM found_sources)"
+            )
+            connection.execute("DROP TABLE found_sources")
+            connection.executemany(
+                "INSERT INTO sources (path, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (path) DO UPDATE SET size = excluded.size",
+                [
+                    (path, size, modified_at, modified_at)
+                    for path, (size, modified_at) in sources.items()
+                ],
+            )
+
+    def stats(self) -> dict[str, NamespaceStats]:
+        """Number of entries, size and hit/miss counters per namespace."""
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT namespace, count(*), sum(size) FROM results GROUP BY namespace"
+            " UNION ALL"
+            " SELECT ?, count(*), coalesce(sum(size), 0) FROM sources",
+            (SOURCES,),
+        ).fetchall()
+        stats = {
+            namespace: NamespaceStats(namespace, entries, size)
+            for namespace, entries, size in rows
+        }
+        for namespace, hits, misses in self.connection.execute(
+            "SELECT namespace, hits, misses FROM stats"
+        ):
+            namespace_stats = stats.setdefault(namespace, NamespaceStats(namespace))
+            namespace_stats.hits, namespace_stats.misses = hits, misses
+        return stats
+
+    def clear(self) -> None:
+        """Delete all results and statistics (sources are removed by the caller)."""
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM results")
+            connection.execute("DELETE FROM sources")
+            connection.execute("DELETE FROM stats")
+        self.forget()
+        self._discard_pending()
+
+    def get_meta(self, name: str) -> str | None:
+        """Get a value stored for the store itself (e.g. when it was last pruned)."""
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: str) -> None:
+        """Store a value for the store itself."""
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value)
+            )
+
+    def forget(self, namespace: str | None = None, key: str | None = None) -> None:
+        """Drop memoized results, so they are read again from the database."""
+        with self._lock:
+            if namespace is None:
+                self._memory.clear()
+            else:
+                self._memory.pop((namespace, key), None)
+
+    def close(self) -> None:
+        """Flush pending writes and close the database."""
+        with self._lock:
+            if self._pid == os.getpid():
+                self.flush()
+            self._connection.close()
+
+
+_stores: dict[Path, CacheStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store() -> CacheStore:
+    """Get the process-wide store for the current cache path."""
+    path = CACHE_PATH / CACHE_DB
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = CacheStore(path)
+        return store
+
+
+@atexit.register
+def close_stores() -> None:
+    """Close all open stores, flushing pending writes."""
+    with _stores_lock:
+        while _stores:
+            _, store = _stores.popitem()
+            store.close()
+
+
+def persistent_cache(
+    cache_name: str,
+    ignore_kwargs: list | None = None,
+    normalizers: dict[str, Callable[[Any], Any]] | None = None,
+    version: int = 0,
+):
+    """Cache the results of decorated function in the cache store.
+
+    Arguments are bound to the function signature, so positional and keyword
+    calls share the same entries. Arguments listed in ignore_kwargs don't affect
+    the key, and normalizers maps argument names to functions normalizing their
+    values. version must be bumped whenever the function would return different
+    results for the same arguments, so old entries stop being used.
+
+    The decorated function has the cache_name, and a cache_key function getting
+    the key of its result for given arguments.
+    """
     ignore_kwargs = ignore_kwargs or []
+    normalizers = normalizers or {}
 
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # raise Exception(CACHE_PATH)
+        signature = inspect.signature(func)
+
+        def cache_key(*args, **kwargs) -> str:
             # Create a unique key for the function call based on its arguments
-            filtered_kwargs = {
-                k: v for k, v in kwargs.items() if k not in ignore_kwargs
+            bound_args = signature.bind(*args, **kwargs)
+            bound_args.apply_defaults()
+            arguments = {
+                name: normalizers.get(name, _identity)(value)
+                for name, value in bound_args.arguments.items()
+                if name not in ignore_kwargs
             }
-            key = hashlib.md5((str(args) + str(filtered_kwargs)).encode()).hexdigest()  # noqa: S324
-            CACHE_PATH.mkdir(exist_ok=True)
-            with shelve.open(str(CACHE_PATH / cache_name)) as cache:  # noqa: S301
-                # Check if the result is already cached
-                if key in cache:
-                    log.debug(f"Fetching from cache for key: {key}")
-                    return cache[key]
-                result = func(*args, **kwargs)
-                cache[key] = result
-                log.debug(f"Caching result for key: {key}")
+            return make_key(KEY_VERSION, version, arguments)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = cache_key(*args, **kwargs)
+            store = get_store()
+            # Check if the result is already cached
+            with timed("cache"):
+                result = store.get(cache_name, key, _MISSING)
+            if result is not _MISSING:
+                log.debug(f"Fetching from cache for key: {key}")
+                count("cache_hits")
                 return result
+            count("cache_misses")
+            result = func(*args, **kwargs)
+            store.set(cache_name, key, result)
+            log.debug(f"Caching result for key: {key}")
+            return result
 
+        wrapper.cache_name = cache_name
+        wrapper.cache_key = cache_key
         return wrapper
 
     return decorator
+
+
+def make_key(*parts: Any) -> str:
+    """Make a stable cache key out of JSON serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _identity(value: Any) -> Any:
+    return value
@@ -8,88 +8,249 @@ of build dependencies.
 
 from __future__ import annotations
 
-from collections.abc import Generator, Iterable
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 
 from pip._internal.exceptions import DistributionNotFound
 from pip._internal.req import InstallRequirement
 from pip._internal.req.constructors import install_req_from_req_string
+from pip._vendor.packaging.utils import canonicalize_name
 from pip._vendor.resolvelib.resolvers import ResolutionImpossible
 from piptools.repositories import PyPIRepository
 from piptools.resolver import BacktrackingResolver
 from piptools.utils import key_from_ireq
 
-from .exceptions import UnsolvableDependenciesError
+from .events import EventStream, cache_status
+from .exceptions import (
+    CacheMissError,
+    PyBuildDepsError,
+    UnsolvableDependenciesError,
+)
 from .finder import find_build_dependencies
+from .graph import (
+    BUILD,
+    RUNTIME,
+    BuildDependencyGraph,
+    NodeKey,
+    annotation_sources,
+    node_id,
+)
 from .logger import log
+from .offline import is_offline
+from .prefetch import SourcePrefetcher
+from .profiling import profiled
+from .resolution import ResolutionContext
+from .timing import (
+    collect_counters,
+    collect_timings,
+    install_download_counter,
+    timed,
+)
 from .utils import get_version
 
 
 class BuildDependencyCompiler:
     """Resolve exact build dependencies."""
 
-    def __init__(self, repository: PyPIRepository) -> None:
+    def __init__(
+        self,
+        repository: PyPIRepository,
+        jobs: int = 1,
+        prefetcher: SourcePrefetcher | None = None,
+        context: ResolutionContext | None = None,
+        events: EventStream | None = None,
+    ) -> None:
         self.repository = repository
         self.resolver = None
+        self.jobs = jobs
+        self.prefetcher = prefetcher
+        self.context = context or ResolutionContext()
+        self.events = events or EventStream()
+        self.graph = BuildDependencyGraph()
+        # build dependencies found for each (name, version), or the exception raised
+        # while looking for them. Populated concurrently ahead of the resolution.
+        self._build_deps_results: dict[
+            tuple[str, str], list[InstallRequirement] | Exception
+        ] = {}
+        # timings and counters of fetching and parsing sources for each
+        # (name, version), see pybuild_deps.timing
+        self._metrics: dict[
+            tuple[str, str], tuple[dict[str, float], dict[str, int]]
+        ] = {}
 
     def resolve(
         self,
         install_requirements: Iterable[InstallRequirement],
         existing_constraints: dict[str, InstallRequirement] | None = None,
-        dependency_cache: dict[str, InstallRequirement] | None = None,
+        previous_graph: BuildDependencyGraph | None = None,
     ) -> set[InstallRequirement]:
-        """Resolve all build dependencies for a given set of dependencies."""
-        all_build_deps = []
+        """Resolve all build dependencies for a given set of dependencies.
+
+        The graph of build dependencies is traversed breadth first, expanding each
+        package exactly once. It's kept in ``self.graph`` for inspection.
 
-        # reuse or initialize constraints (following what piptools expects downstream)
-        # and our dependency cache
+        Packages found in previous_graph aren't expanded again: their build
+        dependencies are reused from it instead (see
+        ``BuildDependencyGraph.reusable``).
+
+        Progress is reported to ``self.events``, one event per package.
+
+        Offline (see ``pybuild_deps.offline``), packages are expanded only from the
+        cache, and CacheMissError is raised once the graph is traversed, listing
+        everything missing.
+        """
+        started_at = time.monotonic()
+        previous_graph = previous_graph or BuildDependencyGraph()
+        install_requirements = list(install_requirements)
+        # initialize constraints (following what piptools expects downstream)
         existing_constraints = existing_constraints or {
             key_from_ireq(ireq): ireq for ireq in install_requirements
         }
-        dependency_cache = dependency_cache or {}
+        self.graph = graph = BuildDependencyGraph()
+        all_build_deps = []
+        self.events.emit("start", requirements=len(install_requirements))
 
+        # artifacts missing from the cache offline, all reported at the end
+        missing = []
+        frontier = []
         for ireq in install_requirements:
-            log.info("=" * 80)
-            log.info(str(ireq))
-            log.info("-" * 80)
-            req_str = str(ireq.req)
-            if req_str in dependency_cache:
-                all_build_deps.extend(dependency_cache[req_str])
-                log.debug(f"{ireq.req} was already solved, moving on...")
-                continue
-            # resolve ireq's build dependencies
-            build_dependencies = self._resolve_build_deps_for_ireq(
-                ireq, existing_constraints
+            key = graph.add_node(ireq, root=True)
+            if key not in frontier:
+                frontier.append(key)
+        while frontier:
+            self._prefetch_build_dependencies(
+                graph.nodes[key] for key in frontier if key not in previous_graph
             )
-            if not build_dependencies:
-                dependency_cache[req_str] = set()
-                continue
-            # dependencies of build dependencies might have their own build
-            # dependencies, so let's recursively search for those.
-            build_deps_qty = 0
-            while len(build_dependencies) != build_deps_qty:
-                build_deps_qty = len(build_dependencies)
-                build_dependencies |= self.resolve(
-                    build_dependencies,
-                    existing_constraints=existing_constraints,
-                    dependency_cache=dependency_cache,
-                )
-                build_dependencies = deduplicate_install_requirements(
-                    build_dependencies
-                )
+            next_frontier = []
+            for key in frontier:
+                try:
+                    edges = self._build_dependencies(
+                        key, existing_constraints, previous_graph
+                    )
+                except CacheMissError as err:
+                    missing += err.artifacts
+                    continue
+                for build_dep, kind in edges:
+                    child = graph.key(build_dep)
+                    if child not in graph:
+                        next_frontier.append(child)
+                    graph.add_node(build_dep)
+                    graph.add_edge(key, child, kind, annotation_sources(build_dep))
+                    all_build_deps.append(build_dep)
+            frontier = next_frontier
+        if missing:
+            raise CacheMissError(missing)
+
+        if self.resolver is None:
+            # nothing was resolved (e.g. all reused from previous_graph), but a
+            # resolver is still needed to generate hashes and write the results
+            self.resolver = BacktrackingResolver(
+                constraints=[],
+                existing_constraints={},
+                repository=self.repository,
+                allow_unsafe=True,
+            )
+        self.events.emit(
+            "finish", packages=len(graph), elapsed=time.monotonic() - started_at
+        )
+        return deduplicate_install_requirements(all_build_deps)
 
-            dependency_cache[req_str] = build_dependencies
+    def _build_dependencies(
+        self,
+        key: NodeKey,
+        constraints: dict[str, InstallRequirement],
+        previous_graph: BuildDependencyGraph,
+    ) -> list[tuple[InstallRequirement, str]]:
+        if key in previous_graph:
+            return self._reuse_build_dependencies(key, previous_graph)
+        return self._expand(key, constraints)
 
-            all_build_deps.extend(build_dependencies)
+    def _expand(
+        self,
+        key: NodeKey,
+        constraints: dict[str, InstallRequirement],
+    ) -> list[tuple[InstallRequirement, str]]:
+        """Find and resolve build dependencies of a node, timing each step."""
+        ireq = self.graph.nodes[key]
+        log.info("=" * 80)
+        log.info(str(ireq))
+        log.info("-" * 80)
+        try:
+            build_ireqs = set(self._find_build_dependencies(ireq))
+            with collect_timings() as timings, timed("resolve"):
+                build_dependencies = self._resolve_build_deps_for_ireq(
+                    ireq, build_ireqs, constraints
+                )
+        except PyBuildDepsError as err:
+            timings, counters = self._metrics.pop(_ireq_key(ireq), ({}, {}))
+            self._emit_package(key, "failed", timings, counters, error=str(err))
+            raise
+        found_timings, counters = self._metrics.pop(_ireq_key(ireq), ({}, {}))
+        self.graph.timings[key] = {**found_timings, **timings}
+        declared = {canonicalize_name(dep.name) for dep in build_ireqs}
+        edges = [
+            (
+                build_dep,
+                BUILD if canonicalize_name(build_dep.name) in declared else RUNTIME,
+            )
+            for build_dep in sorted(build_dependencies, key=self.graph.key)
+        ]
+        self._emit_package(
+            key,
+            "expanded",
+            self.graph.timings[key],
+            counters,
+            build_dependencies=[str(build_dep.req) for build_dep, _ in edges],
+        )
+        return edges
 
-        return deduplicate_install_requirements(all_build_deps)
+    def _reuse_build_dependencies(
+        self, key: NodeKey, previous_graph: BuildDependencyGraph
+    ) -> list[tuple[InstallRequirement, str]]:
+        log.debug(f"{node_id(key)} didn't change, reusing its build dependencies")
+        dependencies = previous_graph.dependencies(key)
+        self._emit_package(
+            key,
+            "reused",
+            build_dependencies=[node_id(child) for child in dependencies],
+        )
+        return [
+            (previous_graph.requirement(key, child), kind)
+            for child, kind in dependencies.items()
+        ]
+
+    def _emit_package(
+        self,
+        key: NodeKey,
+        status: str,
+        timings: dict[str, float] | None = None,
+        counters: dict[str, int] | None = None,
+        **fields,
+    ) -> None:
+        counters = counters or {}
+        self.events.emit(
+            "package",
+            package=node_id(key),
+            name=key[0],
+            version=key[1],
+            status=status,
+            timings=timings or {},
+            cache={
+                "results": cache_status(counters, "cache"),
+                "source": cache_status(counters, "source_cache"),
+            },
+            bytes_downloaded=counters.get("bytes_downloaded", 0),
+            **fields,
+        )
 
     def _resolve_build_deps_for_ireq(
         self,
         ireq: InstallRequirement,
+        build_ireqs: set[InstallRequirement],
         constraints: dict[str, InstallRequirement],
     ) -> set[InstallRequirement]:
-        # find build dependencies for ireq
-        build_ireqs = set(self._find_build_dependencies(ireq))
+        """Resolve build requirements of ireq into a set of pinned requirements."""
         if not build_ireqs:
             return set()
         # build_ireqs isn't a comprehensive list of dependencies yet.
@@ -117,7 +278,10 @@ class BuildDependencyCompiler:
                 ireqs=build_ireqs,
                 constraints=constraints,
             )
-        except UnsolvableDependenciesError:
+        except (UnsolvableDependenciesError, CacheMissError):
+            # Offline, a missing resolution may have been unsolvable when the cache
+            # was filled, so the resolution without constraints is tried as well.
+            #
             # Being unsolvable on the previous step doesn't mean a transitive
             # dependency is actually unsolvable. Per PEP-517, transitive
             # dependencies are built in isolated environments. We only
@@ -131,11 +295,37 @@ class BuildDependencyCompiler:
                 ireqs=build_ireqs,
             )
 
+    @profiled
     def _resolve_with_piptools(
         self,
         package: str,
         ireqs: Iterable[InstallRequirement],
         constraints: dict[InstallRequirement] | None = None,
+    ) -> set[InstallRequirement]:
+        ireqs = list(ireqs)
+        key = self.context.key(ireqs, constraints or {})
+        requirements = self.context.get(key, package, ireqs)
+        if requirements is not None:
+            log.debug(f"reusing previous resolution of {sorted(key[0])}")
+            return requirements
+        if is_offline():
+            raise CacheMissError(
+                [f"resolution of {', '.join(sorted(key[0]))} (for {package})"]
+            )
+        try:
+            requirements = self._run_piptools_resolver(package, ireqs, constraints)
+        except UnsolvableDependenciesError as err:
+            self.context.set(key, err)
+            raise
+        self.context.set(key, requirements)
+        return requirements
+
+    @profiled
+    def _run_piptools_resolver(
+        self,
+        package: str,
+        ireqs: list[InstallRequirement],
+        constraints: dict[InstallRequirement] | None = None,
     ) -> set[InstallRequirement]:
         # backup unsafe data before overriding resolver, we will need it later
         # on piptools writer to export the file
@@ -160,25 +350,106 @@ class BuildDependencyCompiler:
         self.resolver.unsafe_constraints |= unsafe_constraints
         return requirements
 
+    def _prefetch_build_dependencies(self, ireqs: Iterable[InstallRequirement]):
+        """Find build dependencies for a frontier of ireqs concurrently.
+
+        Fetching and parsing sources is mostly spent waiting on the network, so
+        it is done in a thread pool. Results (and errors) are stored to be consumed
+        in order by ``_find_build_dependencies``, keeping the resolution itself
+        serial and deterministic.
+        """
+        if self.jobs <= 1:
+            return
+        pending = {}
+        for ireq in ireqs:
+            key = _ireq_key(ireq)
+            if key is not None and key not in self._build_deps_results:
+                pending[key] = ireq
+        if len(pending) <= 1:
+            return
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {
+                key: executor.submit(self._collect_build_dependencies, ireq)
+                for key, ireq in pending.items()
+            }
+            for key, future in futures.items():
+                try:
+                    self._build_deps_results[key] = future.result()
+                except Exception as err:  # noqa: BLE001
+                    self._build_deps_results[key] = err
+
     def _find_build_dependencies(
         self,
         ireq: InstallRequirement,
-    ) -> Generator[InstallRequirement]:
+    ) -> list[InstallRequirement]:
         """Find build dependencies for a given ireq."""
+        result = self._build_deps_results.pop(_ireq_key(ireq), None)
+        if result is None:
+            return self._collect_build_dependencies(ireq)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _collect_build_dependencies(
+        self,
+        ireq: InstallRequirement,
+    ) -> list[InstallRequirement]:
         ireq_version = get_version(ireq)
-        for build_dep in find_build_dependencies(
-            ireq.name,
-            ireq_version,
-            raise_setuppy_parsing_exc=False,
-            pip_session=self.repository.session,
-        ):
+        key = ireq.name, ireq_version
+        prefetched: tuple[dict, dict] = ({}, {})
+        if self.prefetcher is not None:
+            self.prefetcher.wait(*key)
+            prefetched = self.prefetcher.metrics.pop(key, prefetched)
+        install_download_counter(self.repository.session)
+        with collect_timings() as timings, collect_counters() as counters:
+            try:
+                found = find_build_dependencies(
+                    ireq.name,
+                    ireq_version,
+                    raise_setuppy_parsing_exc=False,
+                    pip_session=self.repository.session,
+                    index_url=get_index_url(self.repository),
+                )
+            finally:
+                # account for the work done in the background by the prefetcher
+                self._metrics[key] = (
+                    _add(prefetched[0], timings),
+                    _add(prefetched[1], counters),
+                )
+        build_deps = []
+        for build_dep in found:
             # The original 'find_build_dependencies' function is very naive by design.
             # It only returns a simple list of strings representing builds dependencies.
             # In order to feed those to piptools resolver, those strings need to be
             # converted to InstallRequirements.
-            yield install_req_from_req_string(build_dep, comes_from=ireq.name)
+            build_deps.append(
+                install_req_from_req_string(build_dep, comes_from=ireq.name)
+            )
+        return build_deps
+
+
+def _add(first: dict, second: dict) -> dict:
+    """Sum values of two dicts of timings or counters."""
+    return {
+        **first,
+        **{key: first.get(key, 0) + value for key, value in second.items()},
+    }
+
+
+def get_index_url(repository: PyPIRepository) -> str | None:
+    """Get the index url configured for a repository, if any."""
+    return next(iter(repository.finder.index_urls), None)
+
+
+def _ireq_key(ireq: InstallRequirement) -> tuple[str, str] | None:
+    try:
+        return ireq.name, get_version(ireq)
+    except PyBuildDepsError:
+        # let the error surface in the same place it would on a serial run
+        return None
 
 
+@profiled
 def deduplicate_install_requirements(_ireqs: Iterable[InstallRequirement]):
     """Deduplicate InstallRequirements."""
     unique_ireqs = {}
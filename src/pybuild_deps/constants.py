@@ -1,7 +1,49 @@
 """constants for pybuild deps."""
 
-from piptools.locations import CACHE_DIR as PIPTOOLS_CACHE_DIR  # noqa: F401
+from __future__ import annotations
+
+import os
+
 from xdg import xdg_cache_home
 
 
 CACHE_PATH = xdg_cache_home() / "pybuild-deps"
+
+# files read by find_build_dependencies to discover build dependencies
+BUILD_METADATA_FILES = ("pyproject.toml", "setup.cfg", "setup.py")
+
+# how downloaded sources are stored in the cache:
+# - "metadata": only the files listed in BUILD_METADATA_FILES (default)
+# - "artifact": the original artifact (sdist), exactly as downloaded
+SOURCE_CACHE_MODE = os.environ.get("PYBUILD_DEPS_SOURCE_CACHE_MODE", "metadata")
+
+# fetch only the build metadata files of zip and uncompressed tar archives using
+# HTTP range requests, when the server supports them
+RANGE_REQUESTS = os.environ.get("PYBUILD_DEPS_RANGE_REQUESTS", "1") != "0"
+
+# seconds to wait for the server on HTTP requests
+REQUEST_TIMEOUT = 10
+
+# limits enforced when pruning the cache, e.g. "10G" and "30d"
+CACHE_MAX_SIZE = os.environ.get("PYBUILD_DEPS_CACHE_MAX_SIZE")
+CACHE_TTL = os.environ.get("PYBUILD_DEPS_CACHE_TTL")
+
+# how long failures to retrieve a package source (e.g. no sdist on PyPI) are
+# remembered before trying again, e.g. "12h"; "0" disables it
+DEFAULT_ERROR_CACHE_TTL = "1d"
+ERROR_CACHE_TTL = os.environ.get(
+    "PYBUILD_DEPS_ERROR_CACHE_TTL", DEFAULT_ERROR_CACHE_TTL
+)
+
+# how long resolutions of build dependencies are reused by later compilations,
+# e.g. "1d". Resolutions are only memoized during a single compilation when unset
+RESOLUTION_CACHE_TTL = os.environ.get("PYBUILD_DEPS_RESOLUTION_CACHE_TTL")
+
+
+def __getattr__(name: str) -> str:
+    # importing piptools is slow, so its cache dir is only looked up on demand
+    if name == "PIPTOOLS_CACHE_DIR":
+        from piptools.locations import CACHE_DIR
+
+        return CACHE_DIR
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
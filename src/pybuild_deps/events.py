@@ -0,0 +1,51 @@
+"""Machine readable progress events of a compilation."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, TextIO
+
+
+class EventStream:
+    """Write events as JSON lines, flushing each of them as soon as emitted.
+
+    Every event has its type ("event") and when it happened ("time", seconds
+    since the epoch). When compiling, these are emitted:
+
+    - start: before resolving, with the number of "requirements".
+    - package: once per package of the graph of build dependencies, with its
+      "status" (expanded, reused from a previous graph or failed), "timings" of
+      each step (cache, fetch, download, parse and resolve, in seconds), whether
+      its build dependencies ("results") and its "source" were found in the
+      "cache" ("hit" or "miss"), "bytes_downloaded" and the pinned
+      "build_dependencies".
+    - finish: after resolving, with the number of "packages" and the time
+      "elapsed".
+
+    Nothing is written when file is None.
+    """
+
+    def __init__(self, file: TextIO | None = None):
+        self.file = file
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """Write an event."""
+        if self.file is None:
+            return
+        record = {"event": event, "time": time.time(), **fields}
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+
+def cache_status(counters: dict[str, int], cache: str) -> str | None:
+    """Summarize hit and miss counters of a cache, as collected by timing.count."""
+    if counters.get(f"{cache}_misses"):
+        return "miss"
+    if counters.get(f"{cache}_hits"):
+        return "hit"
+    return None
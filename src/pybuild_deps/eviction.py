@@ -0,0 +1,137 @@
+"""Cache eviction and maintenance.
+
+Both results (see cache module) and sources (see source module) are evicted
+least recently used first.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+from . import constants
+from .cache import SOURCES, CacheEntry, NamespaceStats, get_store
+from .logger import log
+from .source import (
+    cache_key,
+    cached_source_size,
+    iter_cached_sources,
+    remove_cached_source,
+    remove_dangling_index_records,
+)
+from .utils import parse_duration, parse_size
+
+
+# minimum interval between automatic prunes
+AUTO_PRUNE_INTERVAL = 60 * 60  # seconds
+LAST_PRUNE = "last_prune"
+
+
+@dataclass
+class PruneReport:
+    """Summary of a cache prune."""
+
+    removed: int = 0
+    freed: int = 0
+    # entries in use by concurrent processes
+    skipped: int = 0
+
+
+def cache_info() -> dict[str, NamespaceStats]:
+    """Get statistics of each cache namespace (results and sources)."""
+    store = get_store()
+    _sync_sources()
+    return store.stats()
+
+
+def prune_cache(max_size: int | None = None, ttl: float | None = None) -> PruneReport:
+    """Evict least recently used entries.
+
+    Entries not accessed for more than ttl seconds are removed, then the least
+    recently used ones until the cache size is at most max_size bytes.
+    """
+    store = get_store()
+    _sync_sources()
+    now = time.time()
+    entries = sorted(store.entries(), key=lambda entry: entry.accessed_at)
+    total_size = sum(entry.size for entry in entries)
+    report = PruneReport()
+    removed = []
+    for entry in entries:
+        expired = ttl is not None and entry.accessed_at < now - ttl
+        oversized = max_size is not None and total_size > max_size
+        if not (expired or oversized):
+            # entries are sorted by last access, so the next ones are kept as well
+            break
+        if not _remove_entry(entry):
+            report.skipped += 1
+            continue
+        removed.append(entry)
+        total_size -= entry.size
+        report.removed += 1
+        report.freed += entry.size
+    store.delete(removed)
+    store.set_meta(LAST_PRUNE, str(now))
+    remove_dangling_index_records()
+    return report
+
+
+def clear_cache() -> PruneReport:
+    """Remove all cached results and sources not in use by other processes."""
+    store = get_store()
+    _sync_sources()
+    report = PruneReport()
+    for entry in store.entries():
+        if _remove_entry(entry):
+            report.removed += 1
+            report.freed += entry.size
+        else:
+            report.skipped += 1
+    store.clear()
+    remove_dangling_index_records()
+    # results stored by older versions of pybuild-deps
+    for legacy_shelve in constants.CACHE_PATH.glob("find-build-deps*"):
+        legacy_shelve.unlink()
+    return report
+
+
+def auto_prune() -> PruneReport | None:
+    """Prune the cache if limits are configured and it wasn't pruned recently."""
+    if constants.CACHE_MAX_SIZE is None and constants.CACHE_TTL is None:
+        return None
+    store = get_store()
+    last_prune = float(store.get_meta(LAST_PRUNE) or 0)
+    if time.time() - last_prune < AUTO_PRUNE_INTERVAL:
+        return None
+    report = prune_cache(
+        max_size=_parse_setting(parse_size, constants.CACHE_MAX_SIZE),
+        ttl=_parse_setting(parse_duration, constants.CACHE_TTL),
+    )
+    log.debug(f"pruned {report.removed} cache entries, freeing {report.freed} bytes")
+    return report
+
+
+def _parse_setting(parser, value: str | None):
+    if value is None:
+        return None
+    try:
+        return parser(value)
+    except ValueError as err:
+        log.warning(f"ignoring cache limit: {err}")
+        return None
+
+
+def _sync_sources() -> None:
+    sources = {}
+    for cached_path in iter_cached_sources():
+        sources[cache_key(cached_path)] = (
+            cached_source_size(cached_path),
+            cached_path.stat().st_mtime,
+        )
+    get_store().sync_sources(sources)
+
+
+def _remove_entry(entry: CacheEntry) -> bool:
+    if entry.namespace != SOURCES:
+        return True
+    return remove_cached_source(constants.CACHE_PATH / entry.key)
@@ -11,6 +11,29 @@ class PyBuildDepsError(Exception):
     """Custom exception for pybuild-deps."""
 
 
+class SourceUnavailableError(PyBuildDepsError):
+    """Source code for a package can't be retrieved, and retrying won't help."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class CacheMissError(PyBuildDepsError):
+    """Artifacts needed offline are missing from the cache."""
+
+    def __init__(self, artifacts: Iterable[str]):
+        self.artifacts = sorted(set(artifacts))
+        super().__init__(self.artifacts)
+
+    def __str__(self):
+        artifacts = "\n".join(self.artifacts)
+        return (
+            "The following are missing from the cache (fill it with "
+            f"'pybuild-deps warm'):\n{artifacts}"
+        )
+
+
 class UnsolvableDependenciesError(PyBuildDepsError):
     """Unsolvable dependencies."""
 
@@ -2,66 +2,155 @@
 
 from __future__ import annotations
 
-import tarfile
+from pathlib import Path
+from typing import NamedTuple
 
 from pip._internal.network.session import PipSession
+from pip._vendor.packaging.utils import canonicalize_name, canonicalize_version
 
 from .cache import persistent_cache
 from .logger import log
 from .parsers import parse_pyproject_toml, parse_setup_cfg, parse_setup_py
 from .parsers.setup_py import SetupPyParsingError
-from .source import get_package_source
+from .process_pool import get_process_pool
+from .profiling import profile_section, profiled
+from .source import (
+    get_package_source,
+    get_package_source_files,
+    lock_package_source,
+    read_source_files,
+)
+from .timing import timed
 
 
-@persistent_cache("find-build-deps", ignore_kwargs=["pip_session"])
+# parsers of build metadata files, in the order build dependencies are reported
+FILE_PARSERS = {
+    "pyproject.toml": parse_pyproject_toml,
+    "setup.cfg": parse_setup_cfg,
+    "setup.py": parse_setup_py,
+}
+
+# bump whenever changes to parsers (or how they are used) affect results, so
+# results cached by previous versions are not reused.
+RESULTS_VERSION = 3
+
+
+@profiled
 def find_build_dependencies(
     package_name,
     version,
     raise_setuppy_parsing_exc=True,
     pip_session: PipSession | None = None,
+    index_url: str | None = None,
 ) -> list[str]:
-    """Find build dependencies for a given package."""
-    file_parser_map = {
-        "pyproject.toml": parse_pyproject_toml,
-        "setup.cfg": parse_setup_cfg,
-        "setup.py": parse_setup_py,
-    }
+    """Find build dependencies for a given package.
+
+    Sources are read and parsed in the pool of processes in use, if any (see
+    ``pybuild_deps.process_pool``).
+    """
+    found = lookup_build_dependencies(
+        package_name, version, pip_session=pip_session, index_url=index_url
+    )
+    for file_name in found["unparsable"]:
+        error_msg = (
+            f"Unable to parse {file_name} for package {package_name}=={version}."
+        )
+        if raise_setuppy_parsing_exc:
+            raise SetupPyParsingError(error_msg)
+        log.error(error_msg)
+    return found["build_dependencies"]
+
+
+@persistent_cache(
+    "find-build-deps",
+    # sources are assumed to be the same on any index, like the source cache does
+    ignore_kwargs=["pip_session", "index_url"],
+    normalizers={"package_name": canonicalize_name, "version": canonicalize_version},
+    version=RESULTS_VERSION,
+)
+def lookup_build_dependencies(
+    package_name,
+    version,
+    pip_session: PipSession | None = None,
+    index_url: str | None = None,
+) -> dict[str, list[str]]:
+    """Find build dependencies for a given package, and files that can't be parsed.
+
+    Unlike ``find_build_dependencies``, files that can't be parsed never raise
+    errors, so the outcome is cached the same way for all callers.
+    """
     log.debug(f"retrieving source for package {package_name}=={version}")
-    source_path = get_package_source(package_name, version, pip_session=pip_session)
-    build_dependencies = []
-    with tarfile.open(fileobj=source_path.open("rb")) as tarball:
-        for file_name, parser in file_parser_map.items():
-            root_dir = tarball.getnames()[0].split("/")[0]
-            try:
-                file = tarball.extractfile(f"{root_dir}/{file_name}")
-            except KeyError:
-                log.debug(
-                    f"{file_name} file not found for package {package_name}=={version}",
+    pool = get_process_pool()
+    if pool is None:
+        with timed("fetch"):
+            source_files = get_package_source_files(
+                package_name,
+                version,
+                pip_session=pip_session,
+                file_names=FILE_PARSERS,
+                index_url=index_url,
+            )
+        parsed = parse_source_files(source_files)
+    else:
+        with lock_package_source(package_name, version):
+            with timed("fetch"):
+                source_path = get_package_source(
+                    package_name, version, pip_session=pip_session, index_url=index_url
                 )
-                continue
+            with timed("parse"):
+                parsed = pool.submit(read_and_parse_source, str(source_path)).result()
+    build_dependencies = []
+    unparsable = []
+    for file_name in FILE_PARSERS:
+        if file_name in parsed.requirements:
+            build_dependencies += parsed.requirements[file_name]
+        elif file_name in parsed.unparsable:
+            unparsable.append(file_name)
+            log.debug("{:=^80}".format(f" {file_name} contents "))
+            log.debug(parsed.unparsable[file_name])
+            log.debug("=" * 80)
+        else:
             log.debug(
-                f"parsing file {file_name} for package {package_name}=={version}",
+                f"{file_name} file not found for package {package_name}=={version}",
             )
-            # utf-8-sig is required due to a very odd edge case I found with
-            # package msal==1.24.1: it had a non printable character U+FEFF, which
-            # was causing a SyntaxError when using ast to parse this setup.py.
-            # utf-8-sig is a variant of UTF-8 invented by microsoft, so it kinda
-            # makes sense this package had this encoding (msal is from microsoft).
-            # No regression was found after running this with a large number of python
-            # packages, so making this exception apply to all packages seem to be fine.
-            file_contents = file.read().decode("utf-8-sig")
-            try:
-                build_dependencies += parser(file_contents)
-            except SetupPyParsingError:
-                error_msg = (
-                    f"Unable to parse setup.py for package {package_name}=={version}."
-                )
-                if not raise_setuppy_parsing_exc:
-                    log.error(error_msg)
-                log.debug("{:=^80}".format(" setup.py contents "))
-                log.debug(file_contents)
-                log.debug("=" * 80)
-                if raise_setuppy_parsing_exc:
-                    raise SetupPyParsingError(error_msg)  # noqa: B904
     log.debug(f"found build dependencies: {build_dependencies}")
-    return build_dependencies
+    return {"build_dependencies": build_dependencies, "unparsable": unparsable}
+
+
+class ParsedSource(NamedTuple):
+    """Build dependencies parsed from the files of a source.
+
+    Only holds strings, to be cheap to send back from a process of the pool.
+    """
+
+    # build dependencies found in each file parsed, by file name
+    requirements: dict[str, list[str]]
+    # contents of files that couldn't be parsed, by file name
+    unparsable: dict[str, str]
+
+
+def parse_source_files(source_files: dict[str, bytes]) -> ParsedSource:
+    """Parse build dependencies from the build metadata files of a source."""
+    parsed = ParsedSource({}, {})
+    for file_name, parser in FILE_PARSERS.items():
+        if file_name not in source_files:
+            continue
+        # utf-8-sig is required due to a very odd edge case I found with
+        # package msal==1.24.1: it had a non printable character U+FEFF, which
+        # was causing a SyntaxError when using ast to parse this setup.py.
+        # utf-8-sig is a variant of UTF-8 invented by microsoft, so it kinda
+        # makes sense this package had this encoding (msal is from microsoft).
+        # No regression was found after running this with a large number of python
+        # packages, so making this exception apply to all packages seem to be fine.
+        file_contents = source_files[file_name].decode("utf-8-sig")
+        try:
+            with timed("parse"), profile_section(f"parsers.{parser.__name__}"):
+                parsed.requirements[file_name] = parser(file_contents)
+        except SetupPyParsingError:
+            parsed.unparsable[file_name] = file_contents
+    return parsed
+
+
+def read_and_parse_source(source_path: str) -> ParsedSource:
+    """Read and parse the build metadata files of a source, in a pool process."""
+    return parse_source_files(read_source_files(Path(source_path), FILE_PARSERS))
@@ -0,0 +1,254 @@
+"""Graph of build dependencies."""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable, Iterator
+from typing import TextIO, Tuple  # noqa: UP035
+
+from pip._internal.req import InstallRequirement
+from pip._internal.req.constructors import install_req_from_req_string
+from pip._vendor.packaging.utils import canonicalize_name
+
+from .utils import get_version
+
+
+# (canonical name, version or url) identifying a node. Aliases are evaluated at
+# runtime, so typing generics are used to support python 3.8.
+NodeKey = Tuple[str, str]  # noqa: UP006
+
+# a declared build requirement of the parent package
+BUILD = "build"
+# a runtime dependency of one of the build requirements of the parent package
+RUNTIME = "runtime"
+EDGE_LABELS = {
+    BUILD: "build requirement",
+    RUNTIME: "runtime dependency of build requirement",
+}
+GRAPH_FORMATS = ("json", "dot")
+
+
+class BuildDependencyGraph:
+    """Build dependencies found while compiling, as a directed graph.
+
+    Roots are the requirements given to the compiler. Each edge goes from a
+    package to one of the (pinned) packages needed to build it, labeled with
+    whether it's a declared build requirement (BUILD) or a runtime dependency
+    of one (RUNTIME). Edges also keep the packages the child is annotated as
+    required by (its "via" comments). Time spent on each expanded node (in
+    seconds) is kept in ``timings``, per step: cache (lookup of previous
+    results), fetch (of the source, including its download), parse and resolve.
+    """
+
+    def __init__(self) -> None:
+        self.nodes: dict[NodeKey, InstallRequirement] = {}
+        self.roots: list[NodeKey] = []
+        self.timings: dict[NodeKey, dict[str, float]] = {}
+        self._edges: dict[NodeKey, dict[NodeKey, str]] = {}
+        self._via: dict[tuple[NodeKey, NodeKey], list[str]] = {}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> BuildDependencyGraph:
+        """Load a graph represented by ``to_dict``."""
+        graph = cls()
+        ids = {}
+        for node in data["nodes"]:
+            ireq = install_req_from_req_string(node["id"])
+            ids[node["id"]] = key = graph.add_node(
+                ireq, root=node["id"] in data["roots"]
+            )
+            if node["timings"]:
+                graph.timings[key] = node["timings"]
+        for edge in data["edges"]:
+            graph.add_edge(
+                ids[edge["from"]], ids[edge["to"]], edge["kind"], edge.get("via", ())
+            )
+        graph.roots = [ids[root] for root in data["roots"]]
+        return graph
+
+    @staticmethod
+    def key(ireq: InstallRequirement) -> NodeKey:
+        """Identify the node of a pinned requirement."""
+        return canonicalize_name(ireq.name), get_version(ireq)
+
+    def add_node(self, ireq: InstallRequirement, root: bool = False) -> NodeKey:
+        """Add a node for ireq, unless there is one already, and return its key."""
+        key = self.key(ireq)
+        self.nodes.setdefault(key, ireq)
+        self._edges.setdefault(key, {})
+        if root and key not in self.roots:
+            self.roots.append(key)
+        return key
+
+    def add_edge(
+        self,
+        parent: NodeKey,
+        child: NodeKey,
+        kind: str = BUILD,
+        via: Iterable[str] = (),
+    ) -> None:
+        """Add an edge from parent to one of its build dependencies."""
+        self._edges[parent][child] = kind
+        self._via[parent, child] = sorted(via)
+
+    def requirement(self, parent: NodeKey, child: NodeKey) -> InstallRequirement:
+        """Make a pinned requirement for child, annotated as it was under parent."""
+        ireq = install_req_from_req_string(node_id(child))
+        ireq._required_by = set(self._via[parent, child])
+        return ireq
+
+    def closure(self, key: NodeKey) -> set[NodeKey]:
+        """Nodes needed, directly or not, to build a node."""
+        found: set[NodeKey] = set()
+        pending = [key]
+        while pending:
+            for child in self._edges[pending.pop()]:
+                if child not in found:
+                    found.add(child)
+                    pending.append(child)
+        return found
+
+    def reusable(
+        self, pins: dict[str, str], constraints: dict[str, str]
+    ) -> BuildDependencyGraph:
+        """Subgraph of nodes whose build dependencies are all still pinned.
+
+        pins maps package names to versions, as locked in the compiled
+        requirements, and constraints maps them to versions of the requirements
+        being compiled (the roots), which constrain every resolution. Nodes whose
+        build dependencies were changed (or removed) since the graph was built, or
+        whose build dependencies are constrained differently, are left out, to be
+        expanded again.
+        """
+        previous_constraints = dict(self.roots)
+        changed = {
+            name
+            for name in {*previous_constraints, *constraints}
+            if previous_constraints.get(name) != constraints.get(name)
+        }
+        reusable = BuildDependencyGraph()
+        for key, ireq in self.nodes.items():
+            closure = self.closure(key)
+            if all(
+                pins.get(name) == version and name not in changed
+                for name, version in closure
+            ):
+                reusable.add_node(ireq)
+        for parent, child, kind in self.edges():
+            if parent in reusable:
+                reusable.add_node(self.nodes[child])
+                reusable.add_edge(parent, child, kind, self._via[parent, child])
+        return reusable
+
+    def dependencies(self, key: NodeKey) -> dict[NodeKey, str]:
+        """Build dependencies of a node, along with the kind of each edge."""
+        return dict(self._edges[key])
+
+    def dependents(self, key: NodeKey) -> list[NodeKey]:
+        """Nodes requiring a node to be built."""
+        return [parent for parent, children in self._edges.items() if key in children]
+
+    def edges(self) -> Iterator[tuple[NodeKey, NodeKey, str]]:
+        """Iterate over (parent, child, kind) edges."""
+        for parent, children in self._edges.items():
+            for child, kind in children.items():
+                yield parent, child, kind
+
+    def build_dependencies(self) -> list[NodeKey]:
+        """Nodes needed to build any of the roots, in order of discovery."""
+        children = {child for _, child, _ in self.edges()}
+        return [key for key in self.nodes if key in children]
+
+    def to_dict(self) -> dict:
+        """Represent the graph as a JSON serializable dict."""
+        return {
+            "roots": [node_id(key) for key in self.roots],
+            "nodes": [
+                {
+                    "id": node_id(key),
+                    "name": key[0],
+                    "version": key[1],
+                    "timings": self.timings.get(key, {}),
+                }
+                for key in self.nodes
+            ],
+            "edges": [
+                {
+                    "from": node_id(parent),
+                    "to": node_id(child),
+                    "kind": kind,
+                    "label": EDGE_LABELS[kind],
+                    "via": self._via[parent, child],
+                }
+                for parent, child, kind in self.edges()
+            ],
+        }
+
+    def to_dot(self) -> str:
+        """Represent the graph in Graphviz DOT language."""
+        lines = ["digraph build_dependencies {"]
+        for key in self.nodes:
+            timings = self.timings.get(key, {})
+            label = _quote(
+                node_id(key),
+                *(f"{step}: {seconds:.3f}s" for step, seconds in timings.items()),
+            )
+            shape = "box" if key in self.roots else "ellipse"
+            lines.append(f"  {_quote(node_id(key))} [label={label}, shape={shape}];")
+        for parent, child, kind in self.edges():
+            style = "solid" if kind == BUILD else "dashed"
+            lines.append(
+                f"  {_quote(node_id(parent))} -> {_quote(node_id(child))} "
+                f"[label={_quote(EDGE_LABELS[kind])}, style={style}];"
+            )
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, file: TextIO, fmt: str = "json") -> None:
+        """Write the graph to file, in one of GRAPH_FORMATS."""
+        if fmt == "dot":
+            file.write(self.to_dot())
+        else:
+            json.dump(self.to_dict(), file, indent=2)
+            file.write("\n")
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.nodes
+
+    def __iter__(self) -> Iterator[NodeKey]:
+        return iter(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+def node_id(key: NodeKey) -> str:
+    """Human readable identifier of a node, as a requirement specifier."""
+    name, version = key
+    if "://" in version:
+        return f"{name} @ {version}"
+    return f"{name}=={version}"
+
+
+def annotation_sources(ireq: InstallRequirement) -> set[str]:
+    """Packages a pinned requirement is annotated as required by.
+
+    Mirrors how pip-tools' writer builds "via" comments.
+    """
+    comes_from = [src.comes_from for src in getattr(ireq, "_source_ireqs", ())]
+    if ireq.comes_from and (
+        isinstance(ireq.comes_from, str) or ireq.comes_from.name != ireq.name
+    ):
+        comes_from.append(ireq.comes_from)
+    sources = {
+        value if isinstance(value, str) else canonicalize_name(value.name)
+        for value in comes_from
+        if value
+    }
+    return sources | set(getattr(ireq, "_required_by", ()))
+
+
+def _quote(*lines: str) -> str:
+    """Quote lines as a DOT string."""
+    escaped = (line.replace("\\", "\\\\").replace('"', '\\"') for line in lines)
+    return '"' + "\\n".join(escaped) + '"'
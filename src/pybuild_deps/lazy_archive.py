@@ -0,0 +1,160 @@
+"""Lazy source archives over HTTP.
+
+Only a few small files are needed from a source archive to find its build
+dependencies. For archive formats allowing random access (zip and uncompressed
+tar), those files can be fetched with HTTP range requests instead of
+downloading the whole archive.
+"""
+
+from __future__ import annotations
+
+import io
+import tarfile
+import zipfile
+from collections.abc import Iterable
+
+from pip._internal.exceptions import NetworkConnectionError
+from pip._internal.network.session import PipSession
+from pip._internal.network.utils import HEADERS, raise_for_status
+from requests import RequestException
+
+from .archive import read_archive_files
+from .constants import REQUEST_TIMEOUT
+from .profiling import profiled
+
+
+CHUNK_SIZE = 64 * 1024
+# archives requiring too many round trips are cheaper to download at once
+MAX_RANGE_REQUESTS = 32
+SEEKABLE_ARCHIVE_EXTENSIONS = (".zip", ".tar")
+
+
+class RangeRequestsUnsupportedError(Exception):
+    """Archive can't be read with HTTP range requests."""
+
+
+class LazyArchiveOverHTTP(io.RawIOBase):
+    """Read-only file-like object mapped to an archive over HTTP.
+
+    Content is fetched lazily, in chunks, using HTTP range requests. Raises
+    RangeRequestsUnsupportedError if the server doesn't support them.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: PipSession,
+        chunk_size: int = CHUNK_SIZE,
+        max_requests: int = MAX_RANGE_REQUESTS,
+    ) -> None:
+        super().__init__()
+        head = session.head(
+            url, headers=HEADERS, allow_redirects=True, timeout=REQUEST_TIMEOUT
+        )
+        raise_for_status(head)
+        if "bytes" not in head.headers.get("Accept-Ranges", "none"):
+            raise RangeRequestsUnsupportedError("range requests are not supported")
+        try:
+            self._length = int(head.headers["Content-Length"])
+        except (KeyError, ValueError) as err:
+            raise RangeRequestsUnsupportedError("unknown content length") from err
+        self._session = session
+        self._url = head.url
+        self._chunk_size = chunk_size
+        self._max_requests = max_requests
+        self._chunks: dict[int, bytes] = {}
+        self._position = 0
+        self.requests = 0
+        self.bytes_downloaded = 0
+
+    def readable(self) -> bool:  # noqa: D102
+        return True
+
+    def seekable(self) -> bool:  # noqa: D102
+        return True
+
+    def tell(self) -> int:  # noqa: D102
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:  # noqa: D102
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._position = offset
+        return self._position
+
+    def readinto(self, buffer) -> int:  # noqa: D102
+        end = min(self._position + len(buffer), self._length)
+        if end <= self._position:
+            return 0
+        first_chunk = self._position // self._chunk_size
+        last_chunk = (end - 1) // self._chunk_size
+        self._fetch(first_chunk, last_chunk)
+        data = b"".join(
+            self._chunks[index] for index in range(first_chunk, last_chunk + 1)
+        )
+        offset = self._position - first_chunk * self._chunk_size
+        size = end - self._position
+        buffer[:size] = data[offset : offset + size]
+        self._position = end
+        return size
+
+    def _fetch(self, first_chunk: int, last_chunk: int) -> None:
+        """Download missing chunks, coalescing adjacent ones in a single request."""
+        missing = [
+            index
+            for index in range(first_chunk, last_chunk + 1)
+            if index not in self._chunks
+        ]
+        while missing:
+            start_chunk = end_chunk = missing.pop(0)
+            while missing and missing[0] == end_chunk + 1:
+                end_chunk = missing.pop(0)
+            self._fetch_range(start_chunk, end_chunk)
+
+    def _fetch_range(self, start_chunk: int, end_chunk: int) -> None:
+        if self.requests >= self._max_requests:
+            raise RangeRequestsUnsupportedError("too many range requests")
+        start = start_chunk * self._chunk_size
+        end = min((end_chunk + 1) * self._chunk_size, self._length) - 1
+        headers = {**HEADERS, "Range": f"bytes={start}-{end}"}
+        response = self._session.get(
+            self._url, headers=headers, timeout=REQUEST_TIMEOUT
+        )
+        raise_for_status(response)
+        if response.status_code != 206:
+            raise RangeRequestsUnsupportedError("server ignored range request")
+        self.requests += 1
+        self.bytes_downloaded += len(response.content)
+        for index in range(start_chunk, end_chunk + 1):
+            offset = (index - start_chunk) * self._chunk_size
+            self._chunks[index] = response.content[offset : offset + self._chunk_size]
+
+
+@profiled
+def fetch_archive_files(
+    url: str, session: PipSession, file_names: Iterable[str]
+) -> dict[str, bytes]:
+    """Fetch files from the root of a remote source archive using range requests.
+
+    Raises RangeRequestsUnsupportedError when either the archive format or the server
+    can't be used for that, in which case the archive should be fully downloaded.
+    """
+    if not url.split("#")[0].split("?")[0].endswith(SEEKABLE_ARCHIVE_EXTENSIONS):
+        raise RangeRequestsUnsupportedError(
+            "archive format doesn't support random access"
+        )
+    try:
+        with LazyArchiveOverHTTP(url, session) as archive:
+            return read_archive_files(archive, file_names)
+    except (
+        NetworkConnectionError,
+        RequestException,
+        tarfile.TarError,
+        zipfile.BadZipFile,
+        EOFError,
+    ) as err:
+        raise RangeRequestsUnsupportedError(str(err)) from err
@@ -0,0 +1,48 @@
+"""Run entirely from the cache, without accessing the network.
+
+Offline, sources, results and resolutions of build dependencies (and hashes of
+the resolved packages) are only read from the cache, filled beforehand by
+``pybuild-deps warm``. Anything missing raises
+``pybuild_deps.exceptions.CacheMissError`` right away, instead of waiting on the
+network. For example::
+
+    from pybuild_deps.finder import find_build_dependencies
+    from pybuild_deps.offline import offline
+
+    with offline():
+        find_build_dependencies("cryptography", "39")
+"""
+
+from __future__ import annotations
+
+from collections.abc import Generator
+from contextlib import contextmanager
+
+
+# whether running offline
+_offline = False
+
+
+@contextmanager
+def offline() -> Generator[None]:
+    """Only use what is cached within the block, for every thread."""
+    global _offline
+    previous, _offline = _offline, True
+    try:
+        yield
+    finally:
+        _offline = previous
+
+
+def offline_option(ctx, param, value: bool) -> None:
+    """Click callback of --offline options.
+
+    Runs the rest of the command offline.
+    """
+    if value:
+        ctx.with_resource(offline())
+
+
+def is_offline() -> bool:
+    """Whether running offline."""
+    return _offline
@@ -3,8 +3,12 @@
 from __future__ import annotations
 
 import ast
+import bisect
 import operator
+from collections import defaultdict
+from collections.abc import Iterator
 from contextlib import suppress
+from typing import NamedTuple
 
 from ..exceptions import PyBuildDepsError
 
@@ -31,29 +35,116 @@ def parse_setup_py(content: str):
     """
     try:
         code_tree = ast.parse(content)
-        setup_expr = _get_setup_expr(code_tree)
-        if setup_expr is None:
-            # module don't have a setup/setuptools.setup
-            return []
-
-        setup_requires_ast = _get_setup_requires(setup_expr)
-        return _resolve_deps(setup_requires_ast, code_tree)
+        symbols = _SymbolIndex()
+        for position, statement in enumerate(_iter_statements(code_tree.body)):
+            if _is_setup_call(statement):
+                setup_requires_ast = _get_setup_requires(statement)
+                return _resolve_deps(setup_requires_ast, symbols, position)
+            symbols.add(statement, position)
+        # module don't have a setup/setuptools.setup
+        return []
     except (NotImplementedError, SyntaxError) as err:
         raise SetupPyParsingError from err
 
 
-def _get_setup_expr(module: ast.Module) -> ast.Expr | None:
-    for elem in module.body:
-        if isinstance(elem, ast.Expr) and isinstance(
-            attrgetter("value", elem), ast.Call
-        ):
-            func_id = attrgetter("func.id", elem.value)
-            if func_id == "setup":
-                return elem
-            func_attr = attrgetter("func.attr", elem.value)
-            func_value_id = attrgetter("func.value.id", elem.value)
-            if func_attr == "setup" and func_value_id == "setuptools":
-                return elem
+class _Binding(NamedTuple):
+    position: int
+    value: ast.expr
+
+
+# bound to names whose value can't be inferred statically (e.g. unpacking the
+# result of a call), so resolving them fails
+_UNKNOWN = ast.expr()
+
+
+class _SymbolIndex:
+    """Values assigned to names at module level, indexed once per module.
+
+    Names are resolved to the value they had at a given position (the index of
+    a statement), so reassignments like ``DEPS = DEPS + ["foo"]`` work.
+    """
+
+    def __init__(self) -> None:
+        self._bindings: dict[str, list[_Binding]] = defaultdict(list)
+
+    def add(self, statement: ast.stmt, position: int) -> None:
+        """Index names assigned by statement, executed at position."""
+        if isinstance(statement, ast.Assign):
+            for target in statement.targets:
+                self._bind(target, statement.value, position)
+        elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+            self._bind(statement.target, statement.value, position)
+        elif isinstance(statement, ast.AugAssign):
+            value = (
+                ast.BinOp(left=statement.target, op=statement.op, right=statement.value)
+                if isinstance(statement.target, ast.Name)
+                else _UNKNOWN
+            )
+            self._bind(statement.target, value, position)
+
+    def _bind(self, target: ast.expr, value: ast.expr, position: int) -> None:
+        if isinstance(target, ast.Name):
+            self._bindings[target.id].append(_Binding(position, value))
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            if (
+                isinstance(value, (ast.Tuple, ast.List))
+                and len(value.elts) == len(target.elts)
+                and not any(isinstance(el, ast.Starred) for el in value.elts)
+            ):
+                # lengths are checked above (and strict= needs python 3.10)
+                for target_el, value_el in zip(target.elts, value.elts):  # noqa: B905
+                    self._bind(target_el, value_el, position)
+            else:
+                for target_el in target.elts:
+                    self._bind(target_el, _UNKNOWN, position)
+        elif isinstance(target, ast.Starred):
+            self._bind(target.value, _UNKNOWN, position)
+        # assigning to attributes or items doesn't bind names
+
+    def lookup(self, name: ast.Name, position: int) -> _Binding | None:
+        """Get the last binding of name before position, if any."""
+        bindings = self._bindings.get(name.id, [])
+        # bindings are sorted by position, and (position,) sorts before them
+        index = bisect.bisect_left(bindings, (position,))
+        return bindings[index - 1] if index else None
+
+
+def _iter_statements(body: list[ast.stmt]) -> Iterator[ast.stmt]:
+    """Iterate over statements run when executing setup.py, in order."""
+    for statement in body:
+        if _is_main_guard(statement):
+            yield from _iter_statements(statement.body)
+        else:
+            yield statement
+
+
+def _is_main_guard(statement: ast.stmt) -> bool:
+    """Whether statement is ``if __name__ == "__main__":``."""
+    if not isinstance(statement, ast.If):
+        return False
+    test = statement.test
+    return (
+        isinstance(test, ast.Compare)
+        and isinstance(test.left, ast.Name)
+        and test.left.id == "__name__"
+        and len(test.ops) == 1
+        and isinstance(test.ops[0], ast.Eq)
+        and isinstance(test.comparators[0], ast.Constant)
+        and test.comparators[0].value == "__main__"
+    )
+
+
+def _is_setup_call(statement: ast.stmt) -> bool:
+    if isinstance(statement, ast.Expr) and isinstance(
+        attrgetter("value", statement), ast.Call
+    ):
+        func_id = attrgetter("func.id", statement.value)
+        if func_id == "setup":
+            return True
+        func_attr = attrgetter("func.attr", statement.value)
+        func_value_id = attrgetter("func.value.id", statement.value)
+        return func_attr == "setup" and func_value_id == "setuptools"
+    return False
 
 
 def _get_setup_requires(setup_expr: ast.Expr):
@@ -63,32 +154,35 @@ def _get_setup_requires(setup_expr: ast.Expr):
             return kw.value
 
 
-def _resolve_name(name: ast.Name, module: ast.Module):
-    for elem in module.body:
-        if isinstance(elem, ast.Assign):
-            if not (len(elem.targets) == 1 and isinstance(elem.targets[0], ast.Name)):
-                raise NotImplementedError()
-            if elem.targets[0].id == name.id:
-                if isinstance(elem.value, ast.Name):
-                    return _resolve_name(elem.value, module)
-                return elem.value
-
-
-def _ast_value_getter(element, module: ast.Module):
+def _ast_value_getter(element, symbols: _SymbolIndex, position: int):
     if isinstance(element, ast.Constant):
         return element.value
     elif isinstance(element, ast.Name):
-        target_element = _resolve_name(element, module)
-        return _ast_value_getter(target_element, module)
+        binding = symbols.lookup(element, position)
+        if binding is not None:
+            return _ast_value_getter(binding.value, symbols, binding.position)
     raise NotImplementedError()
 
 
-def _resolve_deps(deps_ast, module: ast.Module):
+def _resolve_deps(deps_ast, symbols: _SymbolIndex, position: int) -> list:
     if deps_ast is None:
         return []
-    if isinstance(deps_ast, ast.List):
-        return [_ast_value_getter(el, module) for el in deps_ast.elts]
+    if isinstance(deps_ast, (ast.List, ast.Tuple)):
+        deps = []
+        for el in deps_ast.elts:
+            if isinstance(el, ast.Starred):
+                deps += _resolve_deps(el.value, symbols, position)
+            else:
+                deps.append(_ast_value_getter(el, symbols, position))
+        return deps
+    elif isinstance(deps_ast, ast.BinOp) and isinstance(deps_ast.op, ast.Add):
+        return _resolve_deps(deps_ast.left, symbols, position) + _resolve_deps(
+            deps_ast.right, symbols, position
+        )
     elif isinstance(deps_ast, ast.Name):
-        value = _resolve_name(deps_ast, module)
-        return _resolve_deps(value, module)
+        binding = symbols.lookup(deps_ast, position)
+        if binding is None:
+            # e.g. imported from another module
+            return []
+        return _resolve_deps(binding.value, symbols, binding.position)
     raise NotImplementedError()
@@ -0,0 +1,140 @@
+"""Prefetch package sources ahead of the resolution of build dependencies."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from pip._internal.network.session import PipSession
+from pip._internal.req import InstallRequirement
+
+from .exceptions import PyBuildDepsError
+from .logger import log
+from .source import get_package_source_files, get_pip_session, is_source_cached
+from .timing import collect_counters, collect_timings, install_download_counter
+from .utils import get_version
+
+
+@dataclass
+class PrefetchReport:
+    """Summary of a prefetch."""
+
+    packages: int = 0
+    downloaded: int = 0
+    cached: int = 0
+    failed: int = 0
+    bytes_downloaded: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def packages_per_second(self) -> float:
+        """Packages processed per second."""
+        return self.packages / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        """Downloaded megabytes per second."""
+        return self.bytes_downloaded / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"prefetched {self.packages} sources ({self.downloaded} downloaded, "
+            f"{self.cached} cached, {self.failed} failed) in {self.elapsed:.2f}s: "
+            f"{self.packages_per_second:.1f} packages/s, "
+            f"{self.megabytes_per_second:.2f} MB/s"
+        )
+
+
+class SourcePrefetcher:
+    """Download sources of known packages in the background.
+
+    When compiling, all pinned requirements are known upfront, so their sources
+    can be downloaded by a bounded thread pool while build dependencies are
+    resolved. Consumers call ``wait`` before using a source, so it's never
+    downloaded twice. Failures are only logged: consumers will run into them
+    again (or replay them from the cache) when retrieving the source.
+
+    Timings and counters (see ``pybuild_deps.timing``) of each prefetch are kept
+    in ``metrics``, so consumers can account for them.
+    """
+
+    def __init__(
+        self,
+        jobs: int = 1,
+        pip_session: PipSession | None = None,
+        index_url: str | None = None,
+    ):
+        self.pip_session = pip_session or get_pip_session()
+        self.index_url = index_url
+        self.report = PrefetchReport()
+        self._executor = ThreadPoolExecutor(
+            max_workers=jobs, thread_name_prefix="pybuild-deps-prefetch"
+        )
+        self._futures: dict[tuple[str, str], Future] = {}
+        self.metrics: dict[tuple[str, str], tuple[dict, dict]] = {}
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+
+    def start(self, ireqs: Iterable[InstallRequirement]):
+        """Start downloading sources for given requirements."""
+        install_download_counter(self.pip_session)
+        for ireq in ireqs:
+            try:
+                key = ireq.name, get_version(ireq)
+            except PyBuildDepsError:
+                # the resolution will report it
+                continue
+            if key in self._futures:
+                continue
+            self.report.packages += 1
+            if is_source_cached(*key):
+                self.report.cached += 1
+                continue
+            self._futures[key] = self._executor.submit(self._fetch, *key)
+
+    def wait(self, package_name: str, version: str):
+        """Wait until the source of given package was prefetched, if scheduled."""
+        future = self._futures.get((package_name, version))
+        if future is not None:
+            future.result()
+
+    def close(self) -> PrefetchReport:
+        """Wait for pending downloads and report about them."""
+        self._executor.shutdown(wait=True)
+        self.report.elapsed = time.monotonic() - self._started_at
+        return self.report
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        report = self.close()
+        if report.packages:
+            log.info(str(report))
+
+    def _fetch(self, package_name: str, version: str):
+        with collect_timings() as timings, collect_counters() as counters:
+            try:
+                # reading no files still retrieves (and caches) the source
+                get_package_source_files(
+                    package_name,
+                    version,
+                    pip_session=self.pip_session,
+                    file_names=(),
+                    index_url=self.index_url,
+                )
+            except Exception as err:  # noqa: BLE001
+                log.debug(f"unable to prefetch {package_name}=={version}: {err}")
+                failed = True
+            else:
+                failed = False
+        with self._lock:
+            self.metrics[package_name, version] = dict(timings), dict(counters)
+            self.report.bytes_downloaded += counters["bytes_downloaded"]
+            if failed:
+                self.report.failed += 1
+            else:
+                self.report.downloaded += 1
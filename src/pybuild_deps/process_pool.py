@@ -0,0 +1,67 @@
+"""Extract and parse sources in a pool of processes.
+
+Reading build metadata files from source archives (mostly decompressing them)
+and parsing them is CPU bound, so it doesn't scale with threads. When a pool is
+in use, ``pybuild_deps.finder.find_build_dependencies`` hands the path of each
+source to it, getting back the requirements parsed from its files. For example::
+
+    from pybuild_deps.batch import find_build_dependencies_batch
+    from pybuild_deps.process_pool import process_pool
+
+    with process_pool(processes=8):
+        for result in find_build_dependencies_batch(requirements, jobs=16):
+            ...
+"""
+
+from __future__ import annotations
+
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+# the pool in use, or None when sources are parsed in the calling thread
+_pool: ProcessPoolExecutor | None = None
+
+
+@contextmanager
+def process_pool(processes: int | None = None) -> Generator[ProcessPoolExecutor]:
+    """Extract and parse sources in a pool of processes within the block.
+
+    The pool has one process per CPU unless processes is given, and is shut
+    down on exit.
+    """
+    global _pool
+    # imported here to keep the command-line interface quick to start
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # processes are spawned rather than forked, as forking a process running
+    # other threads (e.g. lookups of a batch) may deadlock
+    with ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        previous, _pool = _pool, pool
+        try:
+            yield pool
+        finally:
+            _pool = previous
+
+
+def processes_option(ctx, param, value: int | None) -> None:
+    """Click callback of --processes options.
+
+    Uses a pool of value processes (one per CPU when 0) for the rest of the
+    command.
+    """
+    if value is not None:
+        ctx.with_resource(process_pool(value or None))
+
+
+def get_process_pool() -> ProcessPoolExecutor | None:
+    """Get the pool in use, if any."""
+    return _pool
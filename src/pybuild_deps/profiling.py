@@ -0,0 +1,179 @@
+"""Profile where time is spent across the fetch, parse and resolve pipeline.
+
+Hot paths are wrapped with ``profiled`` (or ``profile_section`` for blocks).
+Nothing is recorded unless profiling is enabled, and then calls and time
+spent are aggregated for the whole process, along with counters collected
+with ``pybuild_deps.timing.count``. For example::
+
+    from pybuild_deps.finder import find_build_dependencies
+    from pybuild_deps.profiling import profiling
+
+    with profiling() as profiler:
+        find_build_dependencies("cryptography", "39")
+    print(profiler.format_table())
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import TypeVar
+
+
+F = TypeVar("F", bound=Callable)
+
+
+@dataclass
+class SectionStats:
+    """Time spent in a profiled section."""
+
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        """Mean time per call, in seconds."""
+        return self.total / self.calls if self.calls else 0.0
+
+
+class Profiler:
+    """Registry of time spent in profiled sections, and of counters."""
+
+    def __init__(self) -> None:
+        self.sections: dict[str, SectionStats] = defaultdict(SectionStats)
+        self.counters: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, section: str, elapsed: float) -> None:
+        """Record a call to section taking elapsed seconds."""
+        with self._lock:
+            stats = self.sections[section]
+            stats.calls += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        """Add amount to counter."""
+        with self._lock:
+            self.counters[counter] += amount
+
+    def to_dict(self) -> dict:
+        """Represent the numbers collected as a JSON serializable dict."""
+        return {
+            "sections": {
+                section: {
+                    "calls": stats.calls,
+                    "total": stats.total,
+                    "mean": stats.mean,
+                    "max": stats.max,
+                }
+                for section, stats in self.sections.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def format_table(self) -> str:
+        """Summarize sections (slowest first) and counters in a table."""
+        width = max([len(name) for name in (*self.sections, *self.counters)] + [20])
+        header = (
+            f"{'section':<{width}} {'calls':>8} {'total (s)':>10} "
+            f"{'mean (ms)':>10} {'max (ms)':>10}"
+        )
+        lines = [header]
+        by_total = sorted(
+            self.sections.items(), key=lambda item: (-item[1].total, item[0])
+        )
+        for section, stats in by_total:
+            lines.append(
+                f"{section:<{width}} {stats.calls:>8} {stats.total:>10.3f} "
+                f"{stats.mean * 1000:>10.1f} {stats.max * 1000:>10.1f}"
+            )
+        if self.counters:
+            lines += ["", f"{'counter':<{width}} {'value':>8}"]
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"{counter:<{width}} {value:>8}")
+        return "\n".join(lines)
+
+
+# the profiler in use, or None when profiling is disabled
+_profiler: Profiler | None = None
+
+
+@contextmanager
+def profiling(
+    report: Callable[[str], object] | None = None,
+) -> Generator[Profiler]:
+    """Enable profiling within the block, for every thread.
+
+    When given, report is called with ``Profiler.format_table`` on exit, even
+    when the block raised.
+    """
+    global _profiler
+    previous, _profiler = _profiler, Profiler()
+    profiler = _profiler
+    try:
+        yield profiler
+    finally:
+        _profiler = previous
+        if report is not None:
+            report(profiler.format_table())
+
+
+def profile_option(ctx, param, value: bool) -> None:
+    """Click callback of --profile options.
+
+    Profiles the rest of the command, printing the summary to stderr once done.
+    """
+    if value:
+        ctx.with_resource(
+            profiling(report=lambda table: print(table, file=sys.stderr, flush=True))
+        )
+
+
+def get_profiler() -> Profiler | None:
+    """Get the profiler in use, if profiling is enabled."""
+    return _profiler
+
+
+def profiled(func: F) -> F:
+    """Profile calls to func, named after its module and qualified name."""
+    module = func.__module__
+    prefix = "pybuild_deps."
+    # not using str.removeprefix, which requires python 3.9
+    if module.startswith(prefix):  # noqa: FURB188
+        module = module[len(prefix) :]
+    section = f"{module}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _profiler
+        if profiler is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.add(section, time.perf_counter() - start)
+
+    return wrapper  # type: ignore[return-value]
+
+
+@contextmanager
+def profile_section(section: str) -> Generator[None]:
+    """Profile a block of code as section."""
+    profiler = _profiler
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.add(section, time.perf_counter() - start)
@@ -0,0 +1,222 @@
+"""Memoize resolutions of build dependencies."""
+
+from __future__ import annotations
+
+import collections
+import copy
+import time
+from collections.abc import Iterable
+from typing import FrozenSet, Tuple  # noqa: UP035
+
+from pip._internal.req import InstallRequirement
+from pip._internal.req.constructors import install_req_from_req_string
+from pip._vendor.packaging.utils import canonicalize_name
+from piptools.resolver import combine_install_requirements
+from piptools.utils import key_from_ireq
+
+from .cache import get_store, make_key
+from .constants import RESOLUTION_CACHE_TTL
+from .exceptions import CacheMissError, UnsolvableDependenciesError
+from .logger import log
+from .offline import is_offline
+from .utils import get_version, parse_duration
+
+
+RESOLUTIONS = "resolutions"
+HASHES = "hashes"
+
+# not using builtin generics, aliases are evaluated at runtime on python 3.8
+ResolutionKey = Tuple[FrozenSet[str], FrozenSet[str]]  # noqa: UP006
+
+
+class ResolutionContext:
+    """Resolutions shared by all packages of a compilation.
+
+    Lots of packages declare exactly the same build dependencies (e.g.
+    ``["setuptools>=40.8.0", "wheel"]``), which would otherwise be resolved by
+    pip-tools over and over again. Resolved sets of requirements (or the error
+    found while resolving them) are memoized by their normalized input
+    requirements and constraints. Candidate lists are already memoized by pip's
+    PackageFinder, shared through the repository.
+
+    Successful resolutions can also be persisted in the cache store, to be
+    reused by later compilations until persist_ttl (in seconds) expires. As new
+    versions of packages are released, resolutions get stale, so that is opt-in.
+    With persist, they are persisted regardless of persist_ttl (e.g. to warm the
+    cache), and offline (see ``pybuild_deps.offline``) they never expire.
+    """
+
+    def __init__(self, persist_ttl: float | None = None, persist: bool = False) -> None:
+        if persist_ttl is None and RESOLUTION_CACHE_TTL:
+            try:
+                persist_ttl = parse_duration(RESOLUTION_CACHE_TTL)
+            except ValueError as err:
+                # resolutions are only memoized during this compilation then
+                log.warning(f"ignoring PYBUILD_DEPS_RESOLUTION_CACHE_TTL: {err}")
+        self.persist_ttl = persist_ttl
+        self.persist = persist
+        self._results: dict[
+            ResolutionKey, frozenset[InstallRequirement] | UnsolvableDependenciesError
+        ] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(
+        ireqs: Iterable[InstallRequirement],
+        constraints: dict[str, InstallRequirement],
+    ) -> ResolutionKey:
+        """Identify a resolution by its normalized inputs.
+
+        Where requirements come from isn't part of the key: results are rebased
+        on the requirements given to ``get`` instead.
+        """
+        return (
+            frozenset(map(_normalize, ireqs)),
+            frozenset(map(_normalize, constraints.values())),
+        )
+
+    def get(
+        self, key: ResolutionKey, package: str, ireqs: Iterable[InstallRequirement]
+    ) -> set[InstallRequirement] | None:
+        """Get the result of a previous resolution, raising its error if it failed.
+
+        Results are rebased on ireqs, as pip-tools keeps where requirements come
+        from in its results for annotations.
+        """
+        result = self._results.get(key)
+        if result is None and (self.persist_ttl or is_offline()):
+            result = self._load(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if isinstance(result, UnsolvableDependenciesError):
+            raise UnsolvableDependenciesError(package, result.unsolvable_deps)
+        return _rebase(result, ireqs)
+
+    def set(
+        self,
+        key: ResolutionKey,
+        result: set[InstallRequirement] | UnsolvableDependenciesError,
+    ):
+        """Memoize the result of a resolution."""
+        if isinstance(result, UnsolvableDependenciesError):
+            self._results[key] = result
+            return
+        # callers annotate results, keep the memoized ones untouched
+        self._results[key] = frozenset(copy.copy(ireq) for ireq in result)
+        if self.persist_ttl or self.persist:
+            self._save(key, result)
+
+    def _load(self, key: ResolutionKey) -> frozenset[InstallRequirement] | None:
+        entry = get_store().get(RESOLUTIONS, _store_key(key))
+        if entry is None:
+            return None
+        if not is_offline() and time.time() - entry["created_at"] >= self.persist_ttl:
+            return None
+        result = frozenset(
+            _load_ireq(requirement) for requirement in entry["requirements"]
+        )
+        self._results[key] = result
+        return result
+
+    def _save(self, key: ResolutionKey, result: set[InstallRequirement]):
+        get_store().set(
+            RESOLUTIONS,
+            _store_key(key),
+            {
+                "created_at": time.time(),
+                "requirements": sorted(
+                    (_dump_ireq(ireq) for ireq in result), key=lambda r: r["req"]
+                ),
+            },
+        )
+
+
+def save_hashes(hashes: dict[InstallRequirement, set[str]]) -> None:
+    """Persist hashes of pinned requirements, to be used offline."""
+    store = get_store()
+    for ireq, ireq_hashes in hashes.items():
+        store.set(HASHES, hashes_key(ireq.name, get_version(ireq)), sorted(ireq_hashes))
+
+
+def load_hashes(
+    ireqs: Iterable[InstallRequirement],
+) -> dict[InstallRequirement, set[str]]:
+    """Load hashes of pinned requirements persisted by ``save_hashes``.
+
+    Raises CacheMissError listing all requirements without persisted hashes.
+    """
+    store = get_store()
+    hashes, missing = {}, []
+    for ireq in ireqs:
+        version = get_version(ireq)
+        ireq_hashes = store.get(HASHES, hashes_key(ireq.name, version))
+        if ireq_hashes is None:
+            missing.append(f"hashes of {ireq.name}=={version}")
+        else:
+            hashes[ireq] = set(ireq_hashes)
+    if missing:
+        raise CacheMissError(missing)
+    return hashes
+
+
+def hashes_key(package_name: str, version: str) -> str:
+    """Key of the hashes of a package persisted by ``save_hashes``."""
+    return make_key(canonicalize_name(package_name), version)
+
+
+def _normalize(ireq: InstallRequirement) -> str:
+    req = ireq.req
+    extras = f"[{','.join(sorted(req.extras))}]" if req.extras else ""
+    url = f" @ {req.url}" if req.url else ""
+    marker = f"; {req.marker}" if req.marker else ""
+    return f"{canonicalize_name(req.name)}{extras}{req.specifier}{url}{marker}"
+
+
+def _store_key(key: ResolutionKey) -> str:
+    return make_key(sorted(key[0]), sorted(key[1]))
+
+
+def _rebase(
+    result: Iterable[InstallRequirement], ireqs: Iterable[InstallRequirement]
+) -> set[InstallRequirement]:
+    """Copy results, making them come from ireqs, like pip-tools would."""
+    ireqs_per_key = collections.defaultdict(list)
+    for ireq in ireqs:
+        ireqs_per_key[key_from_ireq(ireq)].append(ireq)
+    sources = {
+        key: combine_install_requirements(key_ireqs)
+        for key, key_ireqs in ireqs_per_key.items()
+    }
+    rebased = set()
+    for ireq in result:
+        ireq = copy.copy(ireq)
+        source = sources.get(key_from_ireq(ireq))
+        if source is not None:
+            ireq.comes_from = source.comes_from
+            ireq._source_ireqs = getattr(source, "_source_ireqs", [source])
+        rebased.add(ireq)
+    return rebased
+
+
+def _dump_ireq(ireq: InstallRequirement) -> dict:
+    comes_from = ireq.comes_from
+    if isinstance(comes_from, InstallRequirement):
+        # only the name is used for annotations, and only when it's not the same
+        # package (e.g. a dependency on one of its own extras)
+        comes_from = None if comes_from.name == ireq.name else comes_from.name
+    return {
+        "req": str(ireq.req),
+        "comes_from": comes_from,
+        "required_by": sorted(getattr(ireq, "_required_by", ())),
+    }
+
+
+def _load_ireq(requirement: dict) -> InstallRequirement:
+    ireq = install_req_from_req_string(
+        requirement["req"], comes_from=requirement["comes_from"]
+    )
+    ireq._required_by = set(requirement["required_by"])
+    return ireq
@@ -0,0 +1,153 @@
+"""cache script."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import click
+
+from pybuild_deps import constants
+from pybuild_deps.bundle import export_bundle, import_bundle
+from pybuild_deps.eviction import PruneReport, cache_info, clear_cache, prune_cache
+from pybuild_deps.exceptions import PyBuildDepsError
+from pybuild_deps.logger import log
+from pybuild_deps.parsers import parse_requirements
+from pybuild_deps.utils import format_size, get_version, parse_duration, parse_size
+
+
+def _size_option(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_size(value)
+    except ValueError as err:
+        raise click.BadParameter(str(err)) from err
+
+
+def _duration_option(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_duration(value)
+    except ValueError as err:
+        raise click.BadParameter(str(err)) from err
+
+
+@click.group(context_settings={"help_option_names": ("-h", "--help")})
+def cache() -> None:
+    """Inspect and manage the pybuild-deps cache."""
+
+
+@cache.command()
+def info() -> None:
+    """Show number of entries, size and hit rate of cached data."""
+    stats = cache_info()
+    click.echo(f"Cache directory: {constants.CACHE_PATH}")
+    click.echo(
+        f"{'namespace':<20} {'entries':>8} {'size':>10} {'hits':>8} {'misses':>8} "
+        f"{'hit rate':>8}"
+    )
+    for namespace_stats in sorted(stats.values(), key=lambda s: s.namespace):
+        hit_rate = namespace_stats.hit_rate
+        click.echo(
+            f"{namespace_stats.namespace:<20} {namespace_stats.entries:>8} "
+            f"{format_size(namespace_stats.size):>10} {namespace_stats.hits:>8} "
+            f"{namespace_stats.misses:>8} "
+            f"{'-' if hit_rate is None else f'{hit_rate:.1%}':>8}"
+        )
+    total_entries = sum(s.entries for s in stats.values())
+    total_size = sum(s.size for s in stats.values())
+    click.echo(f"{'total':<20} {total_entries:>8} {format_size(total_size):>10}")
+
+
+@cache.command()
+@click.option(
+    "--max-size",
+    default=constants.CACHE_MAX_SIZE,
+    callback=_size_option,
+    help="Evict least recently used entries until the cache fits this size "
+    "(e.g. '500M', '10G'). Defaults to $PYBUILD_DEPS_CACHE_MAX_SIZE.",
+)
+@click.option(
+    "--ttl",
+    default=constants.CACHE_TTL,
+    callback=_duration_option,
+    help="Evict entries not used for longer than this (e.g. '12h', '30d'). "
+    "Defaults to $PYBUILD_DEPS_CACHE_TTL.",
+)
+def prune(max_size: int | None, ttl: float | None) -> None:
+    """Evict least recently used entries from the cache.
+
+    Sources in use by other processes are skipped, except on windows, where file
+    locking is not supported.
+    """
+    if max_size is None and ttl is None:
+        raise click.UsageError("At least one of --max-size or --ttl is required.")
+    _echo_report(prune_cache(max_size=max_size, ttl=ttl))
+
+
+@cache.command()
+@click.confirmation_option(prompt="Remove all cached sources and results?")
+def clear() -> None:
+    """Remove all cached sources and results."""
+    _echo_report(clear_cache())
+
+
+@cache.command("export")
+@click.option(
+    "-o",
+    "--output-file",
+    required=True,
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Bundle to write (e.g. 'pybuild-deps-cache.tar.gz').",
+)
+@click.argument(
+    "src_files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False)
+)
+def export(output_file: Path, src_files: tuple[str, ...]) -> None:
+    """Export what is cached for pinned requirements to a bundle.
+
+    Results and sources of all requirements in SRC_FILES are exported. Give
+    compiled build requirements as well to export their resolutions, so the
+    bundle is enough to run 'compile --offline' once imported.
+    """
+    requirements = []
+    try:
+        for src_file in src_files:
+            for ireq in parse_requirements(src_file):
+                requirements.append((ireq.name, get_version(ireq)))
+        report = export_bundle(output_file, requirements)
+    except PyBuildDepsError as err:
+        log.error(str(err))
+        sys.exit(2)
+    click.echo(
+        f"Exported {report.results} results and {report.sources} sources to "
+        f"{output_file} ({format_size(output_file.stat().st_size)})."
+    )
+    if report.skipped:
+        click.echo(f"Skipped {report.skipped} requirements not cached.")
+
+
+@cache.command("import")
+@click.argument("bundle", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def import_(bundle: Path) -> None:
+    """Import a bundle written by 'cache export' into the cache.
+
+    The whole bundle is checked before importing anything, and entries already
+    cached are kept.
+    """
+    try:
+        report = import_bundle(bundle)
+    except PyBuildDepsError as err:
+        log.error(str(err))
+        sys.exit(2)
+    click.echo(f"Imported {report.results} results and {report.sources} sources.")
+    if report.skipped:
+        click.echo(f"Skipped {report.skipped} entries already cached.")
+
+
+def _echo_report(report: PruneReport) -> None:
+    click.echo(f"Removed {report.removed} entries ({format_size(report.freed)}).")
+    if report.skipped:
+        click.echo(f"Skipped {report.skipped} entries in use by other processes.")
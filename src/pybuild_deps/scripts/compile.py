@@ -2,8 +2,11 @@
 
 from __future__ import annotations
 
+import json
 import os
 import sys
+from collections.abc import Iterable
+from contextlib import ExitStack
 from pathlib import Path
 from typing import IO, Any, BinaryIO, cast
 
@@ -12,6 +15,7 @@ from click.utils import LazyFile
 from pip._internal.req import InstallRequirement
 from piptools.exceptions import PipToolsError
 from piptools.repositories import PyPIRepository
+from piptools.scripts.compile import cli as pip_compile
 from piptools.utils import get_compile_command as _get_compile_command
 from piptools.utils import (
     key_from_ireq,
@@ -20,11 +24,20 @@ from piptools.writer import OutputWriter as PipToolsWriter
 
 from pybuild_deps.compile_build_dependencies import (
     BuildDependencyCompiler,
+    get_index_url,
 )
 from pybuild_deps.constants import PIPTOOLS_CACHE_DIR
+from pybuild_deps.events import EventStream
+from pybuild_deps.eviction import auto_prune
 from pybuild_deps.exceptions import PyBuildDepsError
+from pybuild_deps.graph import GRAPH_FORMATS, BuildDependencyGraph
 from pybuild_deps.logger import log
+from pybuild_deps.offline import is_offline, offline_option
 from pybuild_deps.parsers import parse_requirements
+from pybuild_deps.prefetch import SourcePrefetcher
+from pybuild_deps.process_pool import processes_option
+from pybuild_deps.profiling import profile_option
+from pybuild_deps.resolution import load_hashes
 from pybuild_deps.utils import get_version
 
 
@@ -33,7 +46,15 @@ REQUIREMENTS_TXT = "requirements.txt"
 
 def get_compile_command(click_ctx):
     """Get pip-compile equivalent command and adjust for pybuild-deps."""
-    command = _get_compile_command(click_ctx)
+    # options only known by pybuild-deps (e.g. --jobs) don't affect the results,
+    # and pip-tools fails on options it doesn't know about.
+    params = click_ctx.params
+    pip_compile_params = {param.name for param in pip_compile.params}
+    click_ctx.params = {k: v for k, v in params.items() if k in pip_compile_params}
+    try:
+        command = _get_compile_command(click_ctx)
+    finally:
+        click_ctx.params = params
     # this is just overriding the command for reproducibility. pip-compile will still
     # get credits since it will be displayed in the top of the header.
     return command.replace("pip-compile", "pybuild-deps compile")
@@ -82,6 +103,85 @@ def get_compile_command(click_ctx):
     default=False,
     help="Generate pip 8 style hashes in the resulting requirements file.",
 )
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of build dependency lookups (download and parse) to run in parallel.",
+)
+@click.option(
+    "--processes",
+    type=click.IntRange(min=0),
+    expose_value=False,
+    callback=processes_option,
+    help=(
+        "Read and parse sources in a pool of this many processes (0 for one per "
+        "CPU), instead of the threads looking them up."
+    ),
+)
+@click.option(
+    "--prefetch/--no-prefetch",
+    is_flag=True,
+    default=True,
+    help=(
+        "Download sources of all pinned requirements in the background (using "
+        "--jobs threads) while build dependencies are resolved."
+    ),
+)
+@click.option(
+    "--graph-output",
+    default=None,
+    type=click.File("w", atomic=True, lazy=True),
+    help=(
+        "Write the graph of build dependencies, with time spent on each package, "
+        "to this file."
+    ),
+)
+@click.option(
+    "--graph-format",
+    type=click.Choice(GRAPH_FORMATS),
+    default=None,
+    help="Format of --graph-output. Defaults to 'dot' for .dot/.gv files, or json.",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    default=False,
+    help=(
+        "Only resolve packages that changed since the previous compilation, "
+        "reusing pins from --output-file and the graph from --graph-output."
+    ),
+)
+@click.option(
+    "--events-json",
+    default=None,
+    type=click.File("w"),
+    help=(
+        "Stream progress events to this file as JSON lines: one per package, with "
+        "timings of each step, cache hits and bytes downloaded."
+    ),
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    expose_value=False,
+    callback=offline_option,
+    help=(
+        "Only use sources, resolutions and hashes cached by 'pybuild-deps warm', "
+        "failing on anything missing instead of accessing the network."
+    ),
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    expose_value=False,
+    callback=profile_option,
+    help="Print a summary of where time was spent to stderr.",
+)
 @click.argument("src_files", nargs=-1, type=click.Path(exists=True, allow_dash=False))
 def compile(
     ctx: click.Context,
@@ -93,6 +193,12 @@ def compile(
     annotation_style: str,
     output_file: LazyFile | IO[Any] | None,
     generate_hashes: bool,
+    jobs: int,
+    prefetch: bool,
+    graph_output: LazyFile | IO[Any] | None,
+    graph_format: str | None,
+    incremental: bool,
+    events_json: IO[str] | None,
     src_files: tuple[str, ...],
 ) -> None:
     """Compiles build-requirements.txt from requirements.txt."""
@@ -104,19 +210,44 @@ def compile(
         dry_run = True
 
     repository = PyPIRepository([], cache_dir=PIPTOOLS_CACHE_DIR)
-
     dependencies: list[InstallRequirement] = []
     for src_file in src_files:
         dependencies.extend(_parse_requirements(repository, src_file))
 
-    compiler = BuildDependencyCompiler(repository)
+    previous_graph = None
+    if incremental:
+        previous_graph = _load_previous_graph(
+            repository, output_file, graph_output, dependencies
+        )
+
     try:
-        results = compiler.resolve(dependencies)
-        hashes = compiler.resolver.resolve_hashes(results) if generate_hashes else None
+        with ExitStack() as stack:
+            prefetcher = None
+            if prefetch:
+                prefetcher = stack.enter_context(
+                    SourcePrefetcher(
+                        jobs,
+                        pip_session=repository.session,
+                        index_url=get_index_url(repository),
+                    )
+                )
+                # sources of packages reused from the previous graph aren't needed
+                prefetcher.start(_changed_requirements(dependencies, previous_graph))
+            compiler = BuildDependencyCompiler(
+                repository,
+                jobs=jobs,
+                prefetcher=prefetcher,
+                events=EventStream(events_json),
+            )
+            results = compiler.resolve(dependencies, previous_graph=previous_graph)
+        hashes = _resolve_hashes(compiler, results) if generate_hashes else None
     except (PipToolsError, PyBuildDepsError) as e:
         log.error(str(e))
         sys.exit(2)
 
+    if graph_output:
+        _write_graph(compiler.graph, graph_output, graph_format)
+
     if header:
         pybuild_deps_cmd = get_compile_command(ctx)
         os.environ.setdefault("CUSTOM_COMPILE_COMMAND", pybuild_deps_cmd)
@@ -154,6 +285,15 @@ def compile(
 
     if dry_run:
         log.info("Dry-run, so no file created/updated.")
+    auto_prune()
+
+
+def _resolve_hashes(
+    compiler: BuildDependencyCompiler, results: set[InstallRequirement]
+) -> dict[InstallRequirement, set[str]]:
+    if is_offline():
+        return load_hashes(results)
+    return compiler.resolver.resolve_hashes(results)
 
 
 def _parse_requirements(repository, src_file):
@@ -171,6 +311,74 @@ def _parse_requirements(repository, src_file):
         sys.exit(2)
 
 
+def _load_previous_graph(
+    repository: PyPIRepository,
+    output_file: LazyFile | IO[Any] | None,
+    graph_output: LazyFile | IO[Any] | None,
+    dependencies: list[InstallRequirement],
+) -> BuildDependencyGraph | None:
+    """Load the parts of the previous graph still matching the compiled pins.
+
+    Parts constrained differently by dependencies (the requirements being
+    compiled) are left out as well.
+    """
+    if output_file is None or graph_output is None:
+        raise click.UsageError(
+            "--incremental requires both --output-file and --graph-output."
+        )
+    output_path, graph_path = Path(output_file.name), Path(graph_output.name)
+    if not output_path.is_file() or not graph_path.is_file():
+        log.warning("No previous compilation found, resolving everything.")
+        return None
+    try:
+        graph = BuildDependencyGraph.from_dict(json.loads(graph_path.read_text()))
+    except (ValueError, KeyError, TypeError, PyBuildDepsError):
+        log.warning(f"Unable to load graph from '{graph_path}', resolving everything.")
+        return None
+    pins = _versions(_parse_requirements(repository, str(output_path)))
+    return graph.reusable(pins, _versions(dependencies))
+
+
+def _versions(ireqs: Iterable[InstallRequirement]) -> dict[str, str]:
+    """Map names of pinned requirements to their versions."""
+    versions = {}
+    for ireq in ireqs:
+        try:
+            name, version = BuildDependencyGraph.key(ireq)
+        except PyBuildDepsError:
+            # the resolution will report requirements not pinned
+            continue
+        versions[name] = version
+    return versions
+
+
+def _changed_requirements(
+    dependencies: list[InstallRequirement],
+    previous_graph: BuildDependencyGraph | None,
+) -> list[InstallRequirement]:
+    """Requirements whose build dependencies aren't reused from previous_graph."""
+    if previous_graph is None:
+        return dependencies
+    changed = []
+    for ireq in dependencies:
+        try:
+            reused = BuildDependencyGraph.key(ireq) in previous_graph
+        except PyBuildDepsError:
+            # the resolution will report requirements not pinned
+            reused = False
+        if not reused:
+            changed.append(ireq)
+    return changed
+
+
+def _write_graph(graph: BuildDependencyGraph, file: LazyFile | IO[Any], fmt):
+    if fmt is None:
+        suffix = Path(getattr(file, "name", "")).suffix
+        fmt = "dot" if suffix in (".dot", ".gv") else "json"
+    with file:
+        graph.dump(cast(IO[str], file), fmt)
+
+
 def _handle_src_files():
     if Path(REQUIREMENTS_TXT).exists():
         src_files = (REQUIREMENTS_TXT,)
@@ -0,0 +1,70 @@
+"""warm script."""
+
+from __future__ import annotations
+
+import sys
+
+import click
+from piptools.exceptions import PipToolsError
+from piptools.repositories import PyPIRepository
+
+from pybuild_deps.compile_build_dependencies import (
+    BuildDependencyCompiler,
+    get_index_url,
+)
+from pybuild_deps.constants import PIPTOOLS_CACHE_DIR
+from pybuild_deps.exceptions import PyBuildDepsError
+from pybuild_deps.logger import log
+from pybuild_deps.prefetch import SourcePrefetcher
+from pybuild_deps.resolution import ResolutionContext, save_hashes
+from pybuild_deps.scripts.compile import _handle_src_files, _parse_requirements
+
+
+@click.command(context_settings={"help_option_names": ("-h", "--help")})
+@click.option("-v", "--verbose", count=True, help="Show more output")
+@click.option("-q", "--quiet", count=True, help="Show less output")
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of build dependency lookups (download and parse) to run in parallel.",
+)
+@click.argument("src_files", nargs=-1, type=click.Path(exists=True, allow_dash=False))
+def warm(verbose: int, quiet: int, jobs: int, src_files: tuple[str, ...]) -> None:
+    """Fill the cache to compile requirements with 'compile --offline'.
+
+    Sources of all packages, resolutions of their build dependencies and hashes
+    of the resolved packages are cached.
+    """
+    log.verbosity = verbose - quiet
+    if len(src_files) == 0:
+        src_files = _handle_src_files()
+
+    repository = PyPIRepository([], cache_dir=PIPTOOLS_CACHE_DIR)
+    dependencies = []
+    for src_file in src_files:
+        dependencies.extend(_parse_requirements(repository, src_file))
+
+    try:
+        with SourcePrefetcher(
+            jobs,
+            pip_session=repository.session,
+            index_url=get_index_url(repository),
+        ) as prefetcher:
+            prefetcher.start(dependencies)
+            compiler = BuildDependencyCompiler(
+                repository,
+                jobs=jobs,
+                prefetcher=prefetcher,
+                context=ResolutionContext(persist=True),
+            )
+            results = compiler.resolve(dependencies)
+        save_hashes(compiler.resolver.resolve_hashes(results))
+    except (PipToolsError, PyBuildDepsError) as e:
+        log.error(str(e))
+        sys.exit(2)
+    # unlike other commands, the cache isn't pruned: evicting what was just cached
+    # would defeat the purpose
+    log.info(f"Cached everything needed to compile {len(results)} build dependencies.")
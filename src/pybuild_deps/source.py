@@ -2,108 +2,775 @@
 
 from __future__ import annotations
 
+import functools
+import hashlib
+import json
 import logging
+import os
+import shutil
 import tarfile
+import threading
+import time
+import zipfile
+from collections.abc import Generator, Iterable
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from tempfile import TemporaryDirectory
+from tempfile import TemporaryDirectory, mkdtemp
 from urllib.parse import urlparse
 
-import requests
-from pip._internal.exceptions import InstallationError
+from pip._internal.exceptions import InstallationError, NetworkConnectionError
+from pip._internal.models.index import PyPI
+from pip._internal.models.link import Link
 from pip._internal.network.download import Downloader
 from pip._internal.network.session import PipSession
 from pip._internal.operations.prepare import unpack_url
 from pip._internal.req.constructors import install_req_from_req_string
 from pip._internal.utils.temp_dir import global_tempdir_manager
 
-from pybuild_deps.constants import CACHE_PATH
-from pybuild_deps.exceptions import PyBuildDepsError
-from pybuild_deps.utils import is_supported_requirement
+from pybuild_deps.archive import is_archive, read_archive_files
+from pybuild_deps.cache import get_store
+from pybuild_deps.constants import (
+    BUILD_METADATA_FILES,
+    CACHE_PATH,
+    DEFAULT_ERROR_CACHE_TTL,
+    ERROR_CACHE_TTL,
+    RANGE_REQUESTS,
+    REQUEST_TIMEOUT,
+    SOURCE_CACHE_MODE,
+)
+from pybuild_deps.exceptions import (
+    CacheMissError,
+    PyBuildDepsError,
+    SourceUnavailableError,
+)
+from pybuild_deps.lazy_archive import RangeRequestsUnsupportedError, fetch_archive_files
+from pybuild_deps.logger import log
+from pybuild_deps.offline import is_offline
+from pybuild_deps.profiling import profiled
+from pybuild_deps.timing import count, install_download_counter, timed
+from pybuild_deps.utils import is_supported_requirement, parse_duration
 
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+METADATA_DIR = "metadata"
+ARTIFACT_DIR = "artifact"
+LEGACY_TARBALL = "source.tar.gz"
+ERROR_FILE = "error.json"
+LOCK_FILE = ".lock"
+# names found inside the directory of a cached source
+SOURCE_ENTRY_NAMES = frozenset((METADATA_DIR, ARTIFACT_DIR, LEGACY_TARBALL, ERROR_FILE))
+# content-addressed store of sources, by hash of their artifact. It's not a valid
+# project name, so it can't clash with sources cached by package name.
+OBJECTS_DIR = "_objects"
+# record pointing to the object holding the source of a package name or URL.
+# Records are not cached sources themselves: objects are, and the records left
+# pointing to evicted objects are removed by remove_dangling_index_records.
+INDEX_FILE = "source.json"
+
+_session_lock = threading.Lock()
+_session: PipSession | None = None
+_tempdir_lock = threading.Lock()
+_tempdir_users = 0
+_tempdir_stack: ExitStack | None = None
+# locks of objects used by sources locked with lock_package_source
+_object_locks: ContextVar[ExitStack | None] = ContextVar("object_locks", default=None)
+
+
+@profiled
 def get_package_source(
-    package_name: str, version: str, pip_session: PipSession | None = None
+    package_name: str,
+    version: str,
+    pip_session: PipSession | None = None,
+    index_url: str | None = None,
 ) -> Path:
-    """Get source code for a given package."""
-    parsed_url = urlparse(version)
-    is_url = all((parsed_url.scheme, parsed_url.netloc))
+    """Get source code for a given package.
 
-    if is_url:
-        if parsed_url.path:
-            path = parsed_url.path[1:]
-        else:
-            path = ""
-        cached_path = (
-            CACHE_PATH / package_name / parsed_url.scheme / parsed_url.netloc / path
-        )
-    else:
-        cached_path = CACHE_PATH / package_name / version
-    tarball_path = cached_path / "source.tar.gz"
-    error_path = cached_path / "error.json"
-    if tarball_path.exists():
+    Returns either a directory holding the package build metadata files or the
+    source archive as downloaded, depending on SOURCE_CACHE_MODE. Use
+    ``read_source_files`` to read files from the returned path.
+
+    Failures that won't go away by retrying (e.g. PyPI not having the source
+    code) are cached as well, and replayed until ERROR_CACHE_TTL expires.
+
+    Sources whose artifact hash is known (from the index or the URL, or computed
+    after downloading it) are kept in a content-addressed store shared by all
+    names and URLs of the same artifact, and are not downloaded again.
+
+    Requests are made with pip_session, or a session shared by the whole process
+    when not given, so connections are reused. Sources are looked up on the JSON
+    API of index_url, which defaults to PyPI. Offline (see ``pybuild_deps.offline``),
+    sources not cached raise CacheMissError instead.
+    """
+    cached_path = _get_cached_path(package_name, version)
+    entry_path = _get_source_entry(cached_path)
+    source_path = _get_cached_source(entry_path)
+    error_path = cached_path / ERROR_FILE
+    store = get_store()
+    if source_path is not None:
         logging.info("using cached version for package %s==%s", package_name, version)
-        return tarball_path
+        store.record_source(cache_key(entry_path))
+        count("source_cache_hits")
+        return source_path
 
     elif error_path.exists():
-        raise NotImplementedError()
+        error = _load_error(error_path)
+        if error is not None:
+            log.debug(f"using cached error for package {package_name}=={version}")
+            store.record_source(cache_key(cached_path))
+            count("source_cache_hits")
+            raise error
+        error_path.unlink(missing_ok=True)
 
-    url = version if is_url else get_source_url_from_pypi(package_name, version)
-
-    return retrieve_and_save_source_from_url(
-        package_name,
-        url,
-        tarball_path=tarball_path,
-        error_path=error_path,
-        pip_session=pip_session,
+    count("source_cache_misses")
+    if is_offline():
+        raise CacheMissError([f"source of {package_name}=={version}"])
+    try:
+        with timed("download"):
+            url = (
+                version
+                if _is_url(version)
+                else get_source_url_from_pypi(
+                    package_name, version, pip_session=pip_session, index_url=index_url
+                )
+            )
+            source_path = retrieve_and_save_source_from_url(
+                package_name,
+                url,
+                cached_path=cached_path,
+                pip_session=pip_session,
+            )
+    except SourceUnavailableError as err:
+        if _error_cache_ttl() > 0:
+            _save_error(error_path, err)
+            store.record_source(
+                cache_key(cached_path),
+                size=cached_source_size(cached_path),
+                hit=False,
+            )
+        raise
+    entry_path = _get_source_entry(cached_path)
+    store.record_source(
+        cache_key(entry_path), size=cached_source_size(entry_path), hit=False
     )
+    return source_path
+
+
+def get_package_source_files(
+    package_name: str,
+    version: str,
+    pip_session: PipSession | None = None,
+    file_names: Iterable[str] = BUILD_METADATA_FILES,
+    index_url: str | None = None,
+) -> dict[str, bytes]:
+    """Get files from the source code of a given package.
+
+    The cache entry is locked while in use, so concurrent processes can't evict it.
+    """
+    with lock_package_source(package_name, version):
+        source_path = get_package_source(
+            package_name, version, pip_session, index_url=index_url
+        )
+        return read_source_files(source_path, file_names)
+
+
+@contextmanager
+def lock_package_source(package_name: str, version: str) -> Generator[None]:
+    """Lock the cached source of a package while in use (see ``entry_lock``).
+
+    Objects of the content-addressed store used by ``get_package_source`` within
+    the block are locked as well.
+    """
+    with ExitStack() as locks:
+        locks.enter_context(entry_lock(_get_cached_path(package_name, version)))
+        token = _object_locks.set(locks)
+        try:
+            yield
+        finally:
+            _object_locks.reset(token)
+
+
+def is_source_cached(package_name: str, version: str) -> bool:
+    """Check if the source of a package (or the error retrieving it) is cached."""
+    cached_path = _get_cached_path(package_name, version)
+    if (cached_path / ERROR_FILE).exists():
+        return True
+    entry_path = _get_source_entry(cached_path)
+    return any((entry_path / name).exists() for name in SOURCE_ENTRY_NAMES)
+
+
+def _is_url(version: str) -> bool:
+    parsed_url = urlparse(version)
+    return all((parsed_url.scheme, parsed_url.netloc))
+
+
+def _get_cached_path(package_name: str, version: str) -> Path:
+    if not _is_url(version):
+        return CACHE_PATH / package_name / version
+    parsed_url = urlparse(version)
+    if parsed_url.path:
+        path = parsed_url.path[1:]
+    else:
+        path = ""
+    return CACHE_PATH / package_name / parsed_url.scheme / parsed_url.netloc / path
+
+
+def cache_key(cached_path: Path) -> str:
+    """Identify a cached source in the cache store."""
+    return cached_path.relative_to(CACHE_PATH).as_posix()
+
+
+def read_source_files(
+    source_path: Path, file_names: Iterable[str] = BUILD_METADATA_FILES
+) -> dict[str, bytes]:
+    """Read files from the root of a source returned by ``get_package_source``."""
+    if source_path.is_dir():
+        return {
+            file_name: (source_path / file_name).read_bytes()
+            for file_name in file_names
+            if (source_path / file_name).is_file()
+        }
+    return read_archive_files(source_path, file_names)
 
 
 def retrieve_and_save_source_from_url(
     package_name: str,
     url: str,
     *,
-    tarball_path: Path,
-    error_path: Path,
+    cached_path: Path,
     pip_session: PipSession = None,
-):
-    """Retrieve package source from URL."""
+) -> Path:
+    """Retrieve package source from URL and store it on cached_path."""
     ireq = install_req_from_req_string(f"{package_name} @ {url}")
     if not is_supported_requirement(ireq):
-        raise PyBuildDepsError(
+        raise SourceUnavailableError(
             f"Unsupported requirement '{ireq.req}'. Requirement must be either pinned "
-            "(==), a vcs link with sha or a direct url."
+            "(==), a vcs link with sha or a direct url.",
+            reason="unsupported requirement",
         )
 
-    pip_session = pip_session or PipSession()
-    pip_downloader = Downloader(pip_session, "")
+    pip_session = pip_session or get_pip_session()
+    unpack_error = SourceUnavailableError(
+        f"Unable to unpack '{ireq.req}'. Is '{ireq.link}' a python package?",
+        reason="unpack failed",
+    )
+
+    with TemporaryDirectory() as tmp_dir:
+        if ireq.link.is_vcs:
+            # there is no artifact for vcs links, just a checkout
+            checkout_dir = Path(tmp_dir) / package_name
+            _checkout(ireq.link, checkout_dir, pip_session, unpack_error)
+            return _save_metadata(cached_path, read_source_files(checkout_dir))
+
+        sha256 = ireq.link.hash if ireq.link.hash_name == "sha256" else None
+        source_path = _link_stored_object(cached_path, sha256)
+        if source_path is not None:
+            return source_path
+
+        if _can_use_range_requests(ireq.link):
+            try:
+                metadata_files = fetch_archive_files(
+                    ireq.link.url_without_fragment, pip_session, BUILD_METADATA_FILES
+                )
+            except RangeRequestsUnsupportedError as err:
+                log.debug(f"{err} for {ireq.link}, downloading the whole artifact")
+            else:
+                return _save_fetched_metadata(cached_path, metadata_files, sha256)
 
-    with global_tempdir_manager(), TemporaryDirectory() as tmp_dir:
+        artifact = _download_artifact(ireq.link, Path(tmp_dir), pip_session)
+        if not is_archive(artifact):
+            raise unpack_error
+        digest = _hash_file(artifact)
+        if sha256 is not None and digest != sha256:
+            raise PyBuildDepsError(
+                f"Hash of '{ireq.link}' doesn't match: expected sha256 {sha256}, "
+                f"got {digest}."
+            )
+        try:
+            return _save_downloaded_artifact(cached_path, artifact, digest)
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError) as err:
+            raise unpack_error from err
+
+
+def _checkout(
+    link: Link, location: Path, pip_session: PipSession, unpack_error: Exception
+):
+    with _shared_tempdir_manager():
         try:
             unpack_url(
-                ireq.link,
-                tmp_dir,
-                download=pip_downloader,
-                verbosity=0,
+                link, str(location), download=Downloader(pip_session, ""), verbosity=0
             )
         except InstallationError as err:
-            raise PyBuildDepsError(
-                f"Unable to unpack '{ireq.req}'. Is '{ireq.link}' a python package?"
-            ) from err
-        tarball_path.parent.mkdir(parents=True, exist_ok=True)
-        with tarfile.open(tarball_path, "w:gz") as tarball:
-            tarball.add(tmp_dir, arcname=package_name)
-    return tarball_path
-
-
-def get_source_url_from_pypi(package_name, version):
-    """Get url for source code for a given package on pypi."""
-    response = requests.get(
-        f"https://pypi.org/pypi/{package_name}/{version}/json", timeout=10
+            raise unpack_error from err
+
+
+def _link_stored_object(cached_path: Path, sha256: str | None) -> Path | None:
+    """Point cached_path to the object stored for sha256, if any."""
+    if sha256 is None:
+        return None
+    source_path = _get_object_source(sha256)
+    if source_path is not None:
+        # the same artifact was already retrieved, for another name or URL
+        count("source_store_hits")
+        _save_index_record(cached_path, sha256)
+    return source_path
+
+
+def _save_fetched_metadata(
+    cached_path: Path, metadata_files: dict[str, bytes], sha256: str | None
+) -> Path:
+    """Save build metadata files fetched without downloading the artifact.
+
+    They are saved in the content-addressed store when the artifact hash is known.
+    """
+    if sha256 is None:
+        return _save_metadata(cached_path, metadata_files)
+    source_path = _save_metadata(_get_object_path(sha256), metadata_files)
+    _save_index_record(cached_path, sha256)
+    return source_path
+
+
+def _save_downloaded_artifact(cached_path: Path, artifact: Path, sha256: str) -> Path:
+    """Save a downloaded artifact in the content-addressed store, unless it's there."""
+    source_path = _get_object_source(sha256)
+    if source_path is None:
+        object_path = _get_object_path(sha256)
+        if SOURCE_CACHE_MODE == "artifact":
+            source_path = _save_artifact(object_path, artifact)
+        else:
+            metadata_files = read_archive_files(artifact, BUILD_METADATA_FILES)
+            source_path = _save_metadata(object_path, metadata_files)
+    _save_index_record(cached_path, sha256)
+    return source_path
+
+
+def _can_use_range_requests(link: Link) -> bool:
+    """Check if build metadata files could be fetched without a full download."""
+    return (
+        RANGE_REQUESTS
+        and SOURCE_CACHE_MODE == "metadata"
+        and link.scheme in ("http", "https")
+    )
+
+
+def _download_artifact(link: Link, location: Path, pip_session: PipSession) -> Path:
+    if link.is_file:
+        return Path(link.file_path)
+    downloader = Downloader(pip_session, "")
+    try:
+        file_path, _ = downloader(link, str(location))
+    except NetworkConnectionError as err:
+        raise PyBuildDepsError(f"Unable to download '{link}'.") from err
+    return Path(file_path)
+
+
+def iter_cached_sources() -> Generator[Path]:
+    """Iterate over directories of cached sources."""
+    if not CACHE_PATH.is_dir():
+        return
+    for dir_path, dir_names, file_names in os.walk(CACHE_PATH):
+        cached_path = Path(dir_path)
+        # cached sources are at least two levels deep, <package>/<version>
+        if len(cached_path.relative_to(CACHE_PATH).parts) < 2:
+            continue
+        if not SOURCE_ENTRY_NAMES.isdisjoint(dir_names + file_names):
+            yield cached_path
+        # don't look for cached sources inside cached sources or temporary dirs
+        dir_names[:] = [
+            d
+            for d in dir_names
+            if d not in SOURCE_ENTRY_NAMES and not d.startswith(".")
+        ]
+
+
+def cached_source_size(cached_path: Path) -> int:
+    """Size in bytes of a cached source."""
+    size = 0
+    for name in SOURCE_ENTRY_NAMES:
+        path = cached_path / name
+        if path.is_file():
+            size += path.stat().st_size
+        elif path.is_dir():
+            size += sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return size
+
+
+def remove_cached_source(cached_path: Path) -> bool:
+    """Remove a cached source, unless it's in use by another process.
+
+    Returns whether the cached source was removed.
+    """
+    with entry_lock(cached_path, exclusive=True, blocking=False) as locked:
+        if not locked:
+            return False
+        for name in SOURCE_ENTRY_NAMES:
+            path = cached_path / name
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+        (cached_path / INDEX_FILE).unlink(missing_ok=True)
+        (cached_path / LOCK_FILE).unlink(missing_ok=True)
+    # remove directories left empty, up to the cache root
+    for directory in (cached_path, *cached_path.parents):
+        if directory == CACHE_PATH:
+            break
+        try:
+            directory.rmdir()
+        except OSError:
+            break
+    return True
+
+
+def get_cached_source_dirs(package_name: str, version: str) -> list[Path]:
+    """Get directories holding the cached source of a package.
+
+    Those are its own directory and, when it holds an index record, the object
+    it points to. Use within ``lock_package_source``, so they are not evicted
+    meanwhile.
+    """
+    cached_path = _get_cached_path(package_name, version)
+    entry_path = _get_source_entry(cached_path)
+    return [
+        path
+        for path in dict.fromkeys((cached_path, entry_path))
+        if any((path / name).exists() for name in (*SOURCE_ENTRY_NAMES, INDEX_FILE))
+    ]
+
+
+def iter_cached_source_files(cached_path: Path) -> Generator[Path]:
+    """Iterate over files of a cached source, see ``get_cached_source_dirs``."""
+    for name in sorted((*SOURCE_ENTRY_NAMES, INDEX_FILE)):
+        path = cached_path / name
+        if path.is_file():
+            yield path
+        elif path.is_dir():
+            yield from sorted(f for f in path.rglob("*") if f.is_file())
+
+
+def copy_cached_source(source_dir: Path, cached_path: Path) -> bool:
+    """Copy a cached source (e.g. extracted from a bundle) to cached_path.
+
+    Sources already cached are kept as they are. Returns whether it was copied.
+    """
+    names = sorted((*SOURCE_ENTRY_NAMES, INDEX_FILE))
+    with entry_lock(cached_path, exclusive=True):
+        if any((cached_path / name).exists() for name in names):
+            return False
+        cached_path.mkdir(parents=True, exist_ok=True)
+        for name in names:
+            path = source_dir / name
+            if path.is_dir():
+                with _atomic_cache_dir(cached_path / name) as tmp_dir:
+                    shutil.copytree(path, tmp_dir, dirs_exist_ok=True)
+            elif path.is_file():
+                tmp_path = cached_path / f".{name}-{os.getpid()}"
+                shutil.copyfile(path, tmp_path)
+                tmp_path.replace(cached_path / name)
+    return True
+
+
+def remove_dangling_index_records() -> int:
+    """Remove index records pointing to objects no longer cached.
+
+    Records in use by other processes are kept. Returns how many were removed.
+    """
+    removed = 0
+    # removing records removes directories left empty, so don't do it while walking
+    for record_path in list(CACHE_PATH.glob(f"*/**/{INDEX_FILE}")):
+        cached_path = record_path.parent
+        entry_path = _get_source_entry(cached_path)
+        if entry_path == cached_path or _get_cached_source(entry_path) is not None:
+            continue
+        removed += remove_cached_source(cached_path)
+    return removed
+
+
+@contextmanager
+def entry_lock(
+    cached_path: Path, exclusive: bool = False, blocking: bool = True
+) -> Generator[bool]:
+    """Lock a cached source.
+
+    Readers hold a shared lock while using a cached source, and eviction only
+    removes it while holding an exclusive lock. Yields whether the lock was
+    acquired, which is always the case when blocking.
+
+    File locking is not supported on windows, where nothing is locked: entries in
+    use are not protected from eviction there.
+    """
+    if fcntl is None:  # pragma: no cover
+        # file locking is not supported on windows, which only refuses to remove
+        # files while they are open
+        yield True
+        return
+    cached_path.mkdir(parents=True, exist_ok=True)
+    lock_path = cached_path / LOCK_FILE
+    operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    if not blocking:
+        operation |= fcntl.LOCK_NB
+    while True:
+        with open(lock_path, "a+b") as lock_file:
+            try:
+                fcntl.flock(lock_file, operation)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                is_current = (
+                    os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino
+                )
+            except FileNotFoundError:
+                is_current = False
+            if not is_current:
+                # the entry was removed while we waited for the lock, try again
+                continue
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return
+
+
+def _error_cache_ttl() -> float:
+    return _parse_error_cache_ttl(ERROR_CACHE_TTL)
+
+
+# not using functools.cache, which requires python 3.9
+@functools.lru_cache(maxsize=None)  # noqa: UP033
+def _parse_error_cache_ttl(value: str) -> float:
+    # memoized, so a malformed setting is only reported once
+    try:
+        return parse_duration(value)
+    except ValueError as err:
+        log.warning(
+            f"ignoring PYBUILD_DEPS_ERROR_CACHE_TTL: {err}, "
+            f"using {DEFAULT_ERROR_CACHE_TTL} instead"
+        )
+        return parse_duration(DEFAULT_ERROR_CACHE_TTL)
+
+
+def _save_error(error_path: Path, error: SourceUnavailableError):
+    error_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = error_path.with_name(f".{error_path.name}-{os.getpid()}")
+    tmp_path.write_text(
+        json.dumps(
+            {"reason": error.reason, "message": str(error), "created_at": time.time()}
+        )
+    )
+    tmp_path.replace(error_path)
+
+
+def _load_error(error_path: Path) -> SourceUnavailableError | None:
+    """Load a cached error, unless it expired or is unreadable."""
+    try:
+        error = json.loads(error_path.read_text())
+        expired = time.time() - error["created_at"] >= _error_cache_ttl()
+        if expired:
+            return None
+        return SourceUnavailableError(error["message"], reason=error["reason"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _get_object_path(sha256: str) -> Path:
+    """Path of an object of the content-addressed store."""
+    return CACHE_PATH / OBJECTS_DIR / "sha256" / sha256[:2] / sha256
+
+
+def _get_object_source(sha256: str) -> Path | None:
+    """Get the source stored as an object, if any.
+
+    The object is locked while in use (see ``_lock_object``).
+    """
+    object_path = _get_object_path(sha256)
+    _lock_object(object_path)
+    return _get_cached_source(object_path)
+
+
+def _get_source_entry(cached_path: Path) -> Path:
+    """Get the directory holding a cached source.
+
+    That's the object an index record points to (whether it still exists or not),
+    or the cached path itself.
+    """
+    try:
+        sha256 = json.loads((cached_path / INDEX_FILE).read_text())["sha256"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return cached_path
+    object_path = _get_object_path(sha256)
+    _lock_object(object_path)
+    return object_path
+
+
+def _lock_object(object_path: Path):
+    """Lock an object until the end of the current ``lock_package_source`` block."""
+    locks = _object_locks.get()
+    if locks is not None:
+        locks.enter_context(entry_lock(object_path))
+
+
+def _save_index_record(cached_path: Path, sha256: str):
+    cached_path.mkdir(parents=True, exist_ok=True)
+    record_path = cached_path / INDEX_FILE
+    tmp_path = record_path.with_name(f".{record_path.name}-{os.getpid()}")
+    tmp_path.write_text(json.dumps({"sha256": sha256}))
+    tmp_path.replace(record_path)
+
+
+def _hash_file(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _get_cached_source(cached_path: Path) -> Path | None:
+    metadata_path = cached_path / METADATA_DIR
+    if metadata_path.is_dir():
+        return metadata_path
+    artifact_dir = cached_path / ARTIFACT_DIR
+    if artifact_dir.is_dir():
+        return next(artifact_dir.iterdir())
+    legacy_tarball_path = cached_path / LEGACY_TARBALL
+    if legacy_tarball_path.exists():
+        return _migrate_legacy_tarball(legacy_tarball_path)
+    return None
+
+
+def _migrate_legacy_tarball(tarball_path: Path) -> Path:
+    """Replace a re-compressed source tarball with its build metadata files.
+
+    Older versions of pybuild-deps used to store a full copy of the source code
+    as a 'source.tar.gz'.
+    """
+    metadata_files = read_archive_files(tarball_path, BUILD_METADATA_FILES)
+    metadata_path = _save_metadata(tarball_path.parent, metadata_files)
+    tarball_path.unlink(missing_ok=True)
+    return metadata_path
+
+
+def _save_metadata(cached_path: Path, files: dict[str, bytes]) -> Path:
+    with _atomic_cache_dir(cached_path / METADATA_DIR) as tmp_dir:
+        for file_name, content in files.items():
+            (tmp_dir / file_name).write_bytes(content)
+    return cached_path / METADATA_DIR
+
+
+def _save_artifact(cached_path: Path, artifact: Path) -> Path:
+    with _atomic_cache_dir(cached_path / ARTIFACT_DIR) as tmp_dir:
+        shutil.copyfile(artifact, tmp_dir / artifact.name)
+    return cached_path / ARTIFACT_DIR / artifact.name
+
+
+@contextmanager
+def _atomic_cache_dir(target: Path) -> Generator[Path]:
+    """Populate a temporary directory and move it to target when done.
+
+    That way, other processes never see a partially written cache entry.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(mkdtemp(dir=target.parent, prefix=f".{target.name}-"))
+    try:
+        yield tmp_dir
+        try:
+            tmp_dir.rename(target)
+        except OSError:
+            # target was created concurrently by another process; keep theirs
+            if not target.is_dir():
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@contextmanager
+def _shared_tempdir_manager() -> Generator[None]:
+    """Thread-safe variant of pip's ``global_tempdir_manager``.
+
+    pip keeps a single module-level stack for its temporary directories. When
+    sources are retrieved from multiple threads, nesting ``global_tempdir_manager``
+    would make threads tear down each others' stacks. Instead, the stack is shared
+    and only closed when its last user leaves.
+    """
+    global _tempdir_users, _tempdir_stack
+    with _tempdir_lock:
+        if _tempdir_users == 0:
+            _tempdir_stack = ExitStack()
+            _tempdir_stack.enter_context(global_tempdir_manager())
+        _tempdir_users += 1
+    try:
+        yield
+    finally:
+        with _tempdir_lock:
+            _tempdir_users -= 1
+            if _tempdir_users == 0:
+                _tempdir_stack.close()
+                _tempdir_stack = None
+
+
+def get_pip_session() -> PipSession:
+    """Get a pip session shared by the whole process.
+
+    Reusing a single session keeps connections alive across requests, instead of
+    doing a new TLS handshake for each package.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = PipSession()
+            _session.timeout = REQUEST_TIMEOUT
+            install_download_counter(_session)
+        return _session
+
+
+def get_json_api_url(package_name: str, version: str, index_url: str | None) -> str:
+    """Get the JSON API url for a given package version on a package index.
+
+    Indexes implementing PyPI's JSON API (e.g. PyPI, TestPyPI or Artifactory) serve
+    it next to the simple API, under '/pypi' instead of '/simple'.
+    """
+    base_url = (index_url or PyPI.simple_url).rstrip("/")
+    # not using str.removesuffix, which requires python 3.9
+    if base_url.endswith("/simple"):  # noqa: FURB188
+        base_url = base_url[: -len("/simple")]
+    return f"{base_url}/pypi/{package_name}/{version}/json"
+
+
+@profiled
+def get_source_url_from_pypi(
+    package_name: str,
+    version: str,
+    pip_session: PipSession | None = None,
+    index_url: str | None = None,
+) -> str:
+    """Get url for source code for a given package on pypi (or index_url).
+
+    When the index provides its sha256 digest, it's added to the URL as a
+    ``#sha256=`` fragment (like pip's simple API links), see ``get_package_source``.
+    """
+    pip_session = pip_session or get_pip_session()
+    response = pip_session.get(
+        get_json_api_url(package_name, version, index_url),
+        timeout=REQUEST_TIMEOUT,
     )
+    if response.status_code == 404:
+        raise SourceUnavailableError(
+            f"Package {package_name}=={version} not found on PyPI",
+            reason="not found on PyPI",
+        )
     response.raise_for_status()
     for url in response.json()["urls"]:  # pragma: no branch
         if url["python_version"] == "source":
+            sha256 = url.get("digests", {}).get("sha256")
+            if sha256 and "#" not in url["url"]:
+                return f"{url['url']}#sha256={sha256}"
             return url["url"]
-    raise PyBuildDepsError(
-        f"PyPI doesn't have the source code for package {package_name}=={version}"
+    raise SourceUnavailableError(
+        f"PyPI doesn't have the source code for package {package_name}=={version}",
+        reason="no source on PyPI",
     )
@@ -0,0 +1,83 @@
+"""Measure how long steps take, and how much work they do, for a given package."""
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .profiling import get_profiler
+
+
+_timings: ContextVar[dict[str, float] | None] = ContextVar("timings", default=None)
+_counters: ContextVar[dict[str, int] | None] = ContextVar("counters", default=None)
+
+
+@contextmanager
+def collect_timings() -> Generator[dict[str, float]]:
+    """Collect time spent in ``timed`` steps within the current context.
+
+    Contexts are per thread, so timings can be collected concurrently.
+    """
+    timings: dict[str, float] = defaultdict(float)
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def timed(step: str) -> Generator[None]:
+    """Add the time spent in the block to step, when collecting timings."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings[step] += time.perf_counter() - start
+
+
+@contextmanager
+def collect_counters() -> Generator[dict[str, int]]:
+    """Collect ``count`` calls within the current context, like collect_timings."""
+    counters: dict[str, int] = defaultdict(int)
+    token = _counters.set(counters)
+    try:
+        yield counters
+    finally:
+        _counters.reset(token)
+
+
+def count(counter: str, amount: int = 1) -> None:
+    """Add amount to counter, when collecting counters or profiling."""
+    counters = _counters.get()
+    if counters is not None:
+        counters[counter] += amount
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.count(counter, amount)
+
+
+def count_downloaded_bytes(response, *args, **kwargs):
+    """Response hook counting bytes downloaded by requests sessions.
+
+    Hooks run in the thread making the request, so bytes are counted for the
+    package being looked up (see ``count``). Only successful GET requests with a
+    known Content-Length are counted.
+    """
+    size = response.headers.get("Content-Length", "")
+    method = getattr(response.request, "method", None)
+    if response.ok and method == "GET" and size.isdigit():
+        count("bytes_downloaded", int(size))
+    return response
+
+
+def install_download_counter(session) -> None:
+    """Count bytes downloaded by session, see ``count_downloaded_bytes``."""
+    hooks = session.hooks["response"]
+    if count_downloaded_bytes not in hooks:
+        hooks.append(count_downloaded_bytes)
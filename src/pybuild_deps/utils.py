@@ -1,5 +1,6 @@
 """utilities module."""
 
+import re
 from urllib.parse import urlparse
 
 from pip._internal.req import InstallRequirement
@@ -42,3 +43,42 @@ def _is_non_vcs_link(ireq: InstallRequirement):
     if not ireq.link:
         return False
     return not ireq.link.is_vcs
+
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+_DURATION_UNITS = {
+    "s": 1,
+    "m": 60,
+    "h": 60 * 60,
+    "d": 24 * 60 * 60,
+    "w": 7 * 24 * 60 * 60,
+}
+
+
+def parse_size(value: str) -> int:
+    """Parse a size in bytes, accepting suffixes like '500M' or '2G'."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", value, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid size '{value}'")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+def parse_duration(value: str) -> float:
+    """Parse a duration in seconds, accepting suffixes like '12h' or '30d'."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*", value)
+    if not match:
+        raise ValueError(f"invalid duration '{value}'")
+    number, unit = match.groups()
+    return float(number) * _DURATION_UNITS[unit or "s"]
+
+
+def format_size(size: int) -> str:
+    """Format a size in bytes in a human readable way."""
+    value, unit = float(size), "B"
+    for next_unit in ("KiB", "MiB", "GiB", "TiB"):
+        if value < 1024:
+            break
+        value /= 1024
+        unit = next_unit
+    return f"{size} B" if unit == "B" else f"{value:.1f} {unit}"
@@ -0,0 +1,34 @@
+"""Test archive module."""
+
+from pathlib import Path
+
+import pytest
+
+from pybuild_deps.archive import read_archive_files
+
+
+@pytest.mark.parametrize("fmt", ["tar.gz", "tar", "zip"])
+def test_read_archive_files(sdist_factory, fmt):
+    """Only files in the root directory are read, missing files are omitted."""
+    sdist = sdist_factory(
+        "foo",
+        "1.0",
+        {"setup.py": "setup()", "tests/setup.cfg": "", "src/foo/__init__.py": ""},
+        fmt=fmt,
+    )
+    assert read_archive_files(sdist, ["setup.py", "setup.cfg"]) == {
+        "setup.py": b"setup()"
+    }
+
+
+def test_read_tar_files_stops_early(sdist_factory, tmp_path: Path):
+    """Members after the wanted files are never read."""
+    files = {"pyproject.toml": "[build-system]", "setup.py": "setup()"}
+    files.update({f"src/module_{i}.py": "x = 1\n" * 100 for i in range(100)})
+    sdist = sdist_factory("foo", "1.0", files, fmt="tar")
+    truncated = tmp_path / sdist.name
+    truncated.write_bytes(sdist.read_bytes()[:4096])
+    assert read_archive_files(truncated, ["setup.py", "pyproject.toml"]) == {
+        "pyproject.toml": b"[build-system]",
+        "setup.py": b"setup()",
+    }
@@ -0,0 +1,75 @@
+"""Test batch module."""
+
+from pybuild_deps.batch import find_build_dependencies_batch
+
+
+def test_batch(http_server, sdist_factory):
+    """Results are yielded for every requirement, failures included."""
+    for name, requires in (("foo", "flit-core"), ("bar", "setuptools")):
+        files = {"pyproject.toml": f"[build-system]\nrequires = ['{requires}']\n"}
+        http_server.publish_sdist(sdist_factory(name, "1.0", files))
+    requirements = [
+        "# pinned requirements",
+        "foo==1.0",
+        "",
+        "bar==1.0  # some comment",
+        "missing==1.0",
+        "unpinned>=1.0",
+        "not a requirement",
+    ]
+    results = find_build_dependencies_batch(
+        iter(requirements), jobs=2, index_url=http_server.index_url
+    )
+    results = sorted(results, key=lambda result: result["requirement"])
+    # the message depends on the version of pip
+    error = results[3].pop("error")
+    assert error.startswith("Invalid requirement: 'not a requirement'")
+    assert results == [
+        {
+            "requirement": "bar==1.0",
+            "name": "bar",
+            "version": "1.0",
+            "build_dependencies": ["setuptools"],
+        },
+        {
+            "requirement": "foo==1.0",
+            "name": "foo",
+            "version": "1.0",
+            "build_dependencies": ["flit-core"],
+        },
+        {
+            "requirement": "missing==1.0",
+            "name": "missing",
+            "version": "1.0",
+            "error": "Package missing==1.0 not found on PyPI",
+        },
+        {"requirement": "not a requirement"},
+        {
+            "requirement": "unpinned>=1.0",
+            "name": "unpinned",
+            "error": "requirement 'unpinned>=1.0' is not exact.",
+        },
+    ]
+
+
+def test_batch_unexpected_error(mocker):
+    """Unexpected errors are reported as failures of a single requirement."""
+    mocker.patch(
+        "pybuild_deps.batch.find_build_dependencies",
+        side_effect=[RuntimeError("boom"), ["wheel"]],
+    )
+    results = find_build_dependencies_batch(["foo==1.0", "bar==1.0"])
+    assert sorted(results, key=lambda result: result["requirement"]) == [
+        {
+            "requirement": "bar==1.0",
+            "name": "bar",
+            "version": "1.0",
+            "build_dependencies": ["wheel"],
+        },
+        {
+            "requirement": "foo==1.0",
+            "name": "foo",
+            "version": "1.0",
+            "error": "RuntimeError: boom",
+        },
+    ]
@@ -0,0 +1,153 @@
+"""Test bundle module."""
+
+import io
+import tarfile
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from pybuild_deps import __main__ as main
+from pybuild_deps import finder
+from pybuild_deps.bundle import MANIFEST, export_bundle, import_bundle
+from pybuild_deps.cache import get_store
+from pybuild_deps.eviction import clear_cache
+from pybuild_deps.exceptions import PyBuildDepsError
+from pybuild_deps.offline import offline
+from pybuild_deps.resolution import HASHES, RESOLUTIONS, hashes_key
+from pybuild_deps.source import get_package_source
+
+
+SDIST_FILES = {"pyproject.toml": "[build-system]\nrequires = ['flit-core']\n"}
+
+
+@pytest.fixture
+def cached_packages(http_server, sdist_factory):
+    """Cache sources and results of foo and bar, hashes and resolutions."""
+    for name in ("foo", "bar"):
+        http_server.publish_sdist(sdist_factory(name, "1.0", SDIST_FILES))
+        finder.find_build_dependencies(name, "1.0", index_url=http_server.index_url)
+    store = get_store()
+    store.set(HASHES, hashes_key("foo", "1.0"), ["sha256:abc"])
+    for key, requirement in (("bar", "bar==1.0"), ("baz", "baz==1.0")):
+        store.set(
+            RESOLUTIONS,
+            key,
+            {
+                "created_at": 0,
+                "requirements": [
+                    {"req": requirement, "comes_from": None, "required_by": []}
+                ],
+            },
+        )
+    store.flush()
+
+
+@pytest.mark.usefixtures("cached_packages")
+def test_export_import_bundle(tmp_path: Path, cache: Path, http_server):
+    """Everything cached for requirements is exported and imported back."""
+    bundle = tmp_path / "bundle.tar.gz"
+    report = export_bundle(bundle, [("foo", "1.0"), ("bar", "1.0"), ("qux", "1.0")])
+    # results of foo and bar, hashes of foo and resolution to bar==1.0 (but not the
+    # one to baz==1.0, which isn't part of requirements)
+    assert (report.results, report.sources, report.skipped) == (4, 2, 1)
+    assert not (cache / "qux").exists()
+    clear_cache()
+    requests_made = len(http_server.requests)
+
+    report = import_bundle(bundle)
+    assert report.results == 4
+    # sources are downloaded and hashed, so their index records and the objects
+    # they point to are imported
+    assert report.sources == 4
+    assert report.skipped == 0
+    with offline():
+        for name in ("foo", "bar"):
+            assert finder.find_build_dependencies(name, "1.0") == ["flit-core"]
+            get_package_source(name, "1.0")
+    assert get_store().get(HASHES, hashes_key("foo", "1.0")) == ["sha256:abc"]
+    assert set(get_store().items(RESOLUTIONS)) == {"bar"}
+    assert len(http_server.requests) == requests_made
+
+    # entries already cached are kept
+    report = import_bundle(bundle)
+    assert (report.results, report.sources, report.skipped) == (0, 0, 8)
+
+
+@pytest.mark.usefixtures("cached_packages")
+def test_import_bundle_without_locking(tmp_path: Path, mocker):
+    """Bundles are imported where file locking is not supported (e.g. windows)."""
+    bundle = tmp_path / "bundle.tar.gz"
+    export_bundle(bundle, [("foo", "1.0"), ("bar", "1.0")])
+    clear_cache()
+    mocker.patch("pybuild_deps.source.fcntl", None)
+    assert import_bundle(bundle).sources == 4
+
+
+def _rewrite(bundle: Path, **members: bytes):
+    """Replace contents of members of bundle, adding them if missing."""
+    with tarfile.open(bundle, "r:gz") as tar:
+        contents = {m.name: tar.extractfile(m).read() for m in tar.getmembers()}
+    contents.update(members)
+    with tarfile.open(bundle, "w:gz") as tar:
+        for name, content in contents.items():
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            tar.addfile(member, io.BytesIO(content))
+
+
+@pytest.mark.usefixtures("cached_packages")
+@pytest.mark.parametrize(
+    "members, expected_error",
+    [
+        ({"results.json": b"{}"}, "is corrupted"),
+        ({"extra.txt": b""}, "is corrupted"),
+        ({"../escape.txt": b""}, "Unexpected path"),
+        ({MANIFEST: b"{"}, "has no valid manifest"),
+        ({MANIFEST: b'{"version": 0, "sources": [], "files": {}}'}, "has version 0"),
+    ],
+)
+def test_import_invalid_bundle(tmp_path: Path, cache: Path, members, expected_error):
+    """Nothing is imported from bundles not matching their manifest."""
+    bundle = tmp_path / "bundle.tar.gz"
+    export_bundle(bundle, [("foo", "1.0")])
+    _rewrite(bundle, **members)
+    clear_cache()
+    with pytest.raises(PyBuildDepsError, match=expected_error):
+        import_bundle(bundle)
+    assert not (cache / "foo").exists()
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_import_truncated_bundle(tmp_path: Path):
+    """Bundles that can't be read are reported."""
+    bundle = tmp_path / "bundle.tar.gz"
+    export_bundle(bundle, [("foo", "1.0")])
+    bundle.write_bytes(bundle.read_bytes()[:20])
+    with pytest.raises(PyBuildDepsError, match="Unable to read bundle"):
+        import_bundle(bundle)
+
+
+@pytest.mark.usefixtures("cached_packages")
+def test_bundle_cli(tmp_path: Path):
+    """Bundles are exported for requirements files, and imported."""
+    runner = CliRunner(mix_stderr=False)
+    (tmp_path / "requirements.txt").write_text("foo==1.0\nmissing==1.0\n")
+    bundle = tmp_path / "bundle.tar.gz"
+    args = ["cache", "export", "-o", str(bundle), str(tmp_path / "requirements.txt")]
+    result = runner.invoke(main.cli, args)
+    assert result.exit_code == 0, result.stderr
+    assert "Exported 2 results and 1 sources" in result.stdout
+    assert "Skipped 1 requirements not cached." in result.stdout
+    result = runner.invoke(main.cli, ["cache", "import", str(bundle)])
+    assert result.exit_code == 0, result.stderr
+    assert "Imported 0 results and 0 sources." in result.stdout
+
+    (tmp_path / "requirements.txt").write_text("foo>=1.0\n")
+    result = runner.invoke(main.cli, args)
+    assert result.exit_code == 2
+    assert "is not exact" in result.stderr
+    bundle.write_bytes(b"")
+    result = runner.invoke(main.cli, ["cache", "import", str(bundle)])
+    assert result.exit_code == 2
+    assert "Unable to read bundle" in result.stderr
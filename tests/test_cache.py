@@ -0,0 +1,141 @@
+"""Test cache module."""
+
+import multiprocessing
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from pybuild_deps import finder
+from pybuild_deps.cache import CacheStore, close_stores, get_store, persistent_cache
+from pybuild_deps.parsers.setup_py import SetupPyParsingError
+from pybuild_deps.source import get_pip_session
+from pybuild_deps.timing import collect_counters, collect_timings
+
+
+def test_persistent_cache(mocker):
+    """Results are stored and reused, even after reopening the store."""
+    func = mocker.Mock(return_value=["setuptools"])
+    cached_func = persistent_cache("test")(func)
+    with collect_timings() as timings, collect_counters() as counters:
+        assert cached_func("foo", "1.0") == ["setuptools"]
+        assert cached_func("foo", "1.0") == ["setuptools"]
+    assert counters == {"cache_misses": 1, "cache_hits": 1}
+    assert set(timings) == {"cache"}
+    close_stores()
+    assert cached_func("foo", "1.0") == ["setuptools"]
+    assert cached_func("bar", "1.0") == ["setuptools"]
+    assert func.call_count == 2
+
+
+def test_get_store_is_reused():
+    """A single store is kept for the lifetime of the process."""
+    assert get_store() is get_store()
+
+
+def test_batched_writes(tmp_path: Path):
+    """Writes are only visible to other connections after being flushed."""
+    path = tmp_path / "cache.sqlite3"
+    store = CacheStore(path, batch_size=3, flush_interval=3600)
+    other_store = CacheStore(path)
+    store.set("ns", "a", [1])
+    store.set("ns", "b", [2])
+    assert other_store.get("ns", "a") is None
+    store.set("ns", "c", [3])
+    assert [other_store.get("ns", key) for key in "abc"] == [[1], [2], [3]]
+    store.set("ns", "d", [4])
+    store.close()
+    assert other_store.get("ns", "d") == [4]
+    other_store.close()
+
+
+def _write_entries(path: Path, prefix: str, count: int):
+    store = CacheStore(path, batch_size=10)
+    for i in range(count):
+        store.set("ns", f"{prefix}-{i}", i)
+    store.close()
+
+
+def test_concurrent_writers(tmp_path: Path):
+    """Multiple processes can write to the same store."""
+    path = tmp_path / "cache.sqlite3"
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=_write_entries, args=(path, prefix, 200))
+        for prefix in ("a", "b", "c")
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    with sqlite3.connect(path) as connection:
+        (count,) = connection.execute("SELECT COUNT(*) FROM results").fetchone()
+    assert count == 600
+
+
+def test_persistent_cache_key(mocker):
+    """Arguments are bound to the function signature and normalized."""
+    mock = mocker.Mock(return_value=["setuptools"])
+
+    def func(package_name, version, flag=True, session=None):
+        return mock(package_name, version)
+
+    cached_func = persistent_cache(
+        "test",
+        ignore_kwargs=["session"],
+        normalizers={"package_name": str.lower},
+    )(func)
+    cached_func("foo", "1.0")
+    cached_func(package_name="Foo", version="1.0", session=object())
+    cached_func("FOO", "1.0", True)
+    assert mock.call_count == 1
+    cached_func("foo", "1.0", flag=False)
+    assert mock.call_count == 2
+    assert set(get_store().items("test")) == {
+        cached_func.cache_key("Foo", "1.0"),
+        cached_func.cache_key("foo", "1.0", flag=False),
+    }
+    # bumping the version invalidates previous results
+    persistent_cache("test", version=1)(func)("foo", "1.0")
+    assert mock.call_count == 3
+
+
+def test_find_build_dependencies_key(mocker):
+    """Positional and keyword calls of find_build_dependencies share entries."""
+    mocked_get_source = mocker.patch(
+        "pybuild_deps.finder.get_package_source_files",
+        return_value={"setup.cfg": b"[options]\nsetup_requires = wheel\n"},
+    )
+    assert finder.find_build_dependencies("Foo_Bar", "1.0.0") == ["wheel"]
+    assert finder.find_build_dependencies(package_name="foo-bar", version="1") == [
+        "wheel"
+    ]
+    # like the compiler does
+    assert finder.find_build_dependencies(
+        "foo-bar",
+        "1.0",
+        raise_setuppy_parsing_exc=False,
+        pip_session=get_pip_session(),
+        index_url="https://example.com/simple",
+    ) == ["wheel"]
+    assert mocked_get_source.call_count == 1
+
+
+def test_find_build_dependencies_unparsable_cached(mocker):
+    """Files that can't be parsed are cached, and reported to every caller."""
+    mocked_get_source = mocker.patch(
+        "pybuild_deps.finder.get_package_source_files",
+        return_value={
+            "setup.cfg": b"[options]\nsetup_requires = wheel\n",
+            "setup.py": b"from setuptools import setup\nsetup(setup_requires=get())\n",
+        },
+    )
+    log_error = mocker.spy(finder.log, "error")
+    assert finder.find_build_dependencies(
+        "foo", "1.0", raise_setuppy_parsing_exc=False
+    ) == ["wheel"]
+    with pytest.raises(SetupPyParsingError, match=r"Unable to parse setup\.py"):
+        finder.find_build_dependencies("foo", "1.0")
+    assert mocked_get_source.call_count == 1
+    log_error.assert_called_once_with("Unable to parse setup.py for package foo==1.0.")
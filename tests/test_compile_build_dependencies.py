@@ -1,21 +1,46 @@
 """test compile_build_dependencies module."""
 
+import io
+import json
 import logging
+import sys
+import time
 
 import pytest
+from pip._internal.exceptions import DistributionNotFound
 from pip._internal.req.constructors import install_req_from_req_string
+from pip._vendor.resolvelib.resolvers import (
+    RequirementInformation,
+    ResolutionImpossible,
+)
 from piptools.repositories import PyPIRepository
+from piptools.resolver import BacktrackingResolver
 
 from pybuild_deps.compile_build_dependencies import BuildDependencyCompiler
 from pybuild_deps.constants import PIPTOOLS_CACHE_DIR
-from pybuild_deps.exceptions import PyBuildDepsError, UnsolvableDependenciesError
+from pybuild_deps.events import EventStream
+from pybuild_deps.exceptions import (
+    CacheMissError,
+    PyBuildDepsError,
+    UnsolvableDependenciesError,
+)
+from pybuild_deps.graph import BUILD
+from pybuild_deps.offline import offline
+from pybuild_deps.prefetch import SourcePrefetcher
+from pybuild_deps.resolution import ResolutionContext
+from pybuild_deps.timing import count, timed
 
 
 @pytest.fixture
-def compiler() -> BuildDependencyCompiler:
+def repository() -> PyPIRepository:
+    """PyPIRepository instance."""
+    return PyPIRepository([], cache_dir=PIPTOOLS_CACHE_DIR)
+
+
+@pytest.fixture
+def compiler(repository) -> BuildDependencyCompiler:
     """BuildDependencyCompiler instance."""
-    repo = PyPIRepository([], cache_dir=PIPTOOLS_CACHE_DIR)
-    return BuildDependencyCompiler(repo)
+    return BuildDependencyCompiler(repository)
 
 
 def test_compile_greenpath(compiler):
@@ -53,3 +78,333 @@ def test_unsolvable_dependencies(compiler):
     )
     with pytest.raises(UnsolvableDependenciesError, match=expected_error_msg):
         compiler._resolve_with_piptools("foo=1.2.3", ireqs)
+
+
+FAKE_BUILD_DEPS = {
+    ("a", "1.0"): ["b>=0.5"],
+    ("b", "1.0"): ["c"],
+    ("c", "1.0"): [],
+    ("d", "1.0"): ["b", "c<2"],
+    ("e", "1.0"): [],
+}
+
+
+@pytest.fixture
+def fake_index(mocker):
+    """Replace network-bound steps with a fake index of build dependencies."""
+
+    def find_build_dependencies(package_name, version, **kwargs):
+        try:
+            return FAKE_BUILD_DEPS[(package_name, version)]
+        except KeyError:
+            raise PyBuildDepsError(f"no source for {package_name}=={version}")  # noqa: B904
+
+    def resolve_with_piptools(self, package, ireqs, constraints=None):
+        return {
+            install_req_from_req_string(f"{ireq.name}==1.0", comes_from=package)
+            for ireq in ireqs
+        }
+
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=find_build_dependencies,
+    )
+    mocker.patch.object(
+        BuildDependencyCompiler, "_resolve_with_piptools", resolve_with_piptools
+    )
+
+
+@pytest.mark.usefixtures("fake_index")
+def test_parallel_resolution_matches_serial(repository):
+    """Ensure resolving with multiple jobs gives the same results as serially."""
+    reqs = ["a==1.0", "d==1.0", "e==1.0"]
+    results = {}
+    for jobs in (1, 4):
+        compiler = BuildDependencyCompiler(repository, jobs=jobs)
+        ireqs = map(install_req_from_req_string, reqs)
+        results[jobs] = sorted(str(ireq.req) for ireq in compiler.resolve(ireqs))
+    assert results[1] == results[4] == ["b==1.0", "c==1.0"]
+
+
+@pytest.mark.usefixtures("fake_index")
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_parallel_resolution_errors(repository, jobs):
+    """Errors found while prefetching surface just like in a serial run."""
+    compiler = BuildDependencyCompiler(repository, jobs=jobs)
+    ireqs = map(install_req_from_req_string, ["a==1.0", "missing==1.0"])
+    with pytest.raises(PyBuildDepsError, match=r"no source for missing==1\.0"):
+        compiler.resolve(ireqs)
+
+
+@pytest.mark.usefixtures("fake_index")
+def test_resolution_waits_for_prefetched_sources(mocker, repository):
+    """Sources being prefetched are waited for before looking for build deps."""
+    prefetcher = mocker.Mock(spec=SourcePrefetcher)
+    # timings and counters of prefetches are accounted for
+    prefetcher.metrics = {("a", "1.0"): ({"download": 1.0}, {})}
+    compiler = BuildDependencyCompiler(repository, prefetcher=prefetcher)
+    compiler.resolve([install_req_from_req_string("a==1.0")])
+    assert {call.args for call in prefetcher.wait.call_args_list} == {
+        ("a", "1.0"),
+        ("b", "1.0"),
+        ("c", "1.0"),
+    }
+    assert compiler.graph.timings["a", "1.0"]["download"] == 1.0
+
+
+@pytest.fixture
+def fake_piptools_resolver(mocker):
+    """Replace pip-tools resolver, pinning every requirement to version 1.0."""
+
+    def resolve(self):
+        names = [ireq.name for ireq in self.constraints]
+        if len(set(names)) != len(names):
+            cause = ResolutionImpossible(
+                [RequirementInformation(ireq.req, None) for ireq in self.constraints]
+            )
+            raise DistributionNotFound() from cause
+        return {
+            install_req_from_req_string(f"{ireq.name}==1.0", comes_from=ireq.comes_from)
+            for ireq in self.constraints
+        }
+
+    return mocker.patch.object(BacktrackingResolver, "resolve", resolve)
+
+
+@pytest.mark.usefixtures("fake_piptools_resolver")
+def test_resolutions_are_memoized(mocker, repository):
+    """Identical sets of requirements are only resolved once."""
+    spy = mocker.spy(BacktrackingResolver, "resolve")
+    compiler = BuildDependencyCompiler(repository)
+    first = compiler._resolve_with_piptools(
+        "foo", _ireqs("wheel", "setuptools>=40.8.0", comes_from="foo")
+    )
+    again = compiler._resolve_with_piptools(
+        "bar", _ireqs("Setuptools >= 40.8.0", "wheel", comes_from="bar")
+    )
+    assert spy.call_count == 1
+    assert sorted(str(ireq.req) for ireq in first) == sorted(
+        str(ireq.req) for ireq in again
+    )
+    assert not first & again
+    # results are rebased on the new requirements
+    assert {ireq.comes_from for ireq in first} == {"foo"}
+    assert {ireq.comes_from for ireq in again} == {"bar"}
+    assert {ireq._source_ireqs[0].comes_from for ireq in again} == {"bar"}
+    # different inputs are resolved again
+    compiler._resolve_with_piptools("foo", _ireqs("wheel"))
+    compiler._resolve_with_piptools(
+        "foo", _ireqs("wheel"), constraints={"wheel": _ireqs("wheel==1.0")[0]}
+    )
+    assert spy.call_count == 3
+    assert (compiler.context.hits, compiler.context.misses) == (1, 3)
+
+
+@pytest.mark.usefixtures("fake_piptools_resolver")
+def test_resolutions_are_persisted(mocker, repository):
+    """Resolutions are reused by later compilations when persisted."""
+    spy = mocker.spy(BacktrackingResolver, "resolve")
+    for _ in range(2):
+        compiler = BuildDependencyCompiler(
+            repository, context=ResolutionContext(persist_ttl=60)
+        )
+        result = compiler._resolve_with_piptools("foo", _ireqs("wheel", "foo"))
+        assert sorted(map(str, result)) == ["foo==1.0", "wheel==1.0"]
+    assert spy.call_count == 1
+    # not persisted by default, or once expired
+    mocker.patch("pybuild_deps.resolution.time.time", return_value=time.time() + 60)
+    for context in (ResolutionContext(), ResolutionContext(persist_ttl=60)):
+        compiler = BuildDependencyCompiler(repository, context=context)
+        compiler._resolve_with_piptools("foo", _ireqs("wheel", "foo"))
+    assert spy.call_count == 3
+
+
+@pytest.mark.usefixtures("fake_piptools_resolver")
+def test_unsolvable_resolutions_are_memoized(mocker, repository):
+    """Unsolvable sets of requirements are reported for each package."""
+    spy = mocker.spy(BacktrackingResolver, "resolve")
+    compiler = BuildDependencyCompiler(repository)
+    for package in ("foo", "bar"):
+        with pytest.raises(UnsolvableDependenciesError, match=f"package '{package}'"):
+            compiler._resolve_with_piptools(
+                package, _ireqs("setuptools<42", "setuptools>=42")
+            )
+    assert spy.call_count == 1
+
+
+@pytest.mark.usefixtures("fake_piptools_resolver")
+def test_offline_resolution(mocker, repository):
+    """Offline, resolutions persisted while warming the cache never expire."""
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=lambda name, *args, **kwargs: ["bar"] if name == "foo" else [],
+    )
+    spy = mocker.spy(BacktrackingResolver, "resolve")
+    requirements = _ireqs("foo==1.0")
+    warm = BuildDependencyCompiler(repository, context=ResolutionContext(persist=True))
+    expected = sorted(str(ireq.req) for ireq in warm.resolve(requirements))
+    assert expected == ["bar==1.0"]
+    mocker.patch("pybuild_deps.resolution.time.time", return_value=time.time() + 1e9)
+    with offline():
+        results = BuildDependencyCompiler(repository).resolve(requirements)
+    assert sorted(str(ireq.req) for ireq in results) == expected
+    assert spy.call_count == 1
+
+
+def test_offline_resolution_missing(mocker, repository):
+    """Offline, everything missing from the cache is reported at once."""
+
+    def find_build_dependencies(package_name, version, **kwargs):
+        if package_name == "foo":
+            raise CacheMissError([f"source of {package_name}=={version}"])
+        return ["setuptools"]
+
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=find_build_dependencies,
+    )
+    spy = mocker.spy(BacktrackingResolver, "resolve")
+    compiler = BuildDependencyCompiler(repository)
+    with offline(), pytest.raises(CacheMissError) as exc_info:
+        compiler.resolve(_ireqs("foo==1.0", "bar==1.0"))
+    assert exc_info.value.artifacts == [
+        "resolution of setuptools (for bar==1.0)",
+        "source of foo==1.0",
+    ]
+    spy.assert_not_called()
+
+
+def _ireqs(*reqs, comes_from=None):
+    return [install_req_from_req_string(req, comes_from=comes_from) for req in reqs]
+
+
+@pytest.mark.usefixtures("fake_index")
+def test_resolution_graph(mocker, repository):
+    """Each package is expanded once, and the graph can be inspected."""
+    spy = mocker.spy(BuildDependencyCompiler, "_find_build_dependencies")
+    compiler = BuildDependencyCompiler(repository)
+    ireqs = map(install_req_from_req_string, ["a==1.0", "d==1.0", "e==1.0"])
+    results = compiler.resolve(ireqs)
+    assert sorted(str(ireq.req) for ireq in results) == ["b==1.0", "c==1.0"]
+    assert sorted(call.args[1].name for call in spy.call_args_list) == [
+        "a",
+        "b",
+        "c",
+        "d",
+        "e",
+    ]
+    graph = compiler.graph
+    assert graph.roots == [("a", "1.0"), ("d", "1.0"), ("e", "1.0")]
+    assert graph.build_dependencies() == [("b", "1.0"), ("c", "1.0")]
+    assert graph.dependencies(("d", "1.0")) == {
+        ("b", "1.0"): BUILD,
+        ("c", "1.0"): BUILD,
+    }
+    assert sorted(graph.dependents(("c", "1.0"))) == [("b", "1.0"), ("d", "1.0")]
+
+
+@pytest.mark.usefixtures("fake_index")
+def test_incremental_resolution(mocker, repository):
+    """Nodes of a previous graph are reused instead of expanded again."""
+    previous = BuildDependencyCompiler(repository)
+    results = previous.resolve(map(install_req_from_req_string, ["a==1.0", "d==1.0"]))
+    spy = mocker.spy(BuildDependencyCompiler, "_find_build_dependencies")
+    compiler = BuildDependencyCompiler(repository)
+    pins = {ireq.name: "1.0" for ireq in results}
+    incremental_results = compiler.resolve(
+        map(install_req_from_req_string, ["a==1.0", "e==1.0"]),
+        previous_graph=previous.graph.reusable(pins, {"a": "1.0", "e": "1.0"}),
+    )
+    assert [call.args[1].name for call in spy.call_args_list] == ["e"]
+    assert sorted(str(ireq.req) for ireq in incremental_results) == [
+        "b==1.0",
+        "c==1.0",
+    ]
+    assert compiler.graph.roots == [("a", "1.0"), ("e", "1.0")]
+    assert compiler.graph.build_dependencies() == [("b", "1.0"), ("c", "1.0")]
+
+
+@pytest.mark.usefixtures("fake_index")
+def test_resolution_events(mocker, repository):
+    """An event is emitted for each package, with its timings and counters."""
+
+    def find_build_dependencies(package_name, version, **kwargs):
+        count("cache_misses")
+        count("source_cache_hits")
+        count("bytes_downloaded", 100)
+        with timed("parse"):
+            if (package_name, version) not in FAKE_BUILD_DEPS:
+                raise PyBuildDepsError(f"no source for {package_name}=={version}")
+            return FAKE_BUILD_DEPS[package_name, version]
+
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=find_build_dependencies,
+    )
+    stream = io.StringIO()
+    compiler = BuildDependencyCompiler(repository, events=EventStream(stream))
+
+    def resolve(*reqs, **kwargs):
+        stream.seek(0)
+        stream.truncate()
+        compiler.resolve(map(install_req_from_req_string, reqs), **kwargs)
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    events = resolve("a==1.0")
+    assert [(event["event"], event.get("package")) for event in events] == [
+        ("start", None),
+        ("package", "a==1.0"),
+        ("package", "b==1.0"),
+        ("package", "c==1.0"),
+        ("finish", None),
+    ]
+    assert events[0]["requirements"] == 1
+    assert events[-1]["packages"] == 3
+    event = events[1]
+    assert set(event["timings"]) == {"parse", "resolve"}
+    assert event["cache"] == {"results": "miss", "source": "hit"}
+    assert event["bytes_downloaded"] == 100
+    assert (event["status"], event["build_dependencies"]) == ("expanded", ["b==1.0"])
+
+    events = resolve("a==1.0", "e==1.0", previous_graph=compiler.graph)
+    assert [(event.get("package"), event.get("status")) for event in events] == [
+        (None, None),
+        ("a==1.0", "reused"),
+        ("e==1.0", "expanded"),
+        ("b==1.0", "reused"),
+        ("c==1.0", "reused"),
+        (None, None),
+    ]
+    assert events[1]["cache"] == {"results": None, "source": None}
+
+    with pytest.raises(PyBuildDepsError):
+        resolve("z==1.0")
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert events[-1]["status"] == "failed"
+    assert events[-1]["error"] == "no source for z==1.0"
+    assert set(events[-1]["timings"]) == {"parse"}
+
+
+def test_deep_build_dependency_chains(mocker, repository):
+    """Deep chains of build dependencies don't hit the recursion limit."""
+    depth = sys.getrecursionlimit() * 2
+
+    def find_build_dependencies(package_name, version, **kwargs):
+        index = int(package_name.removeprefix("pkg"))
+        return [f"pkg{index + 1}"] if index < depth else []
+
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=find_build_dependencies,
+    )
+    mocker.patch.object(
+        BuildDependencyCompiler,
+        "_resolve_with_piptools",
+        lambda self, package, ireqs, constraints=None: {
+            install_req_from_req_string(f"{ireq.name}==1.0") for ireq in ireqs
+        },
+    )
+    compiler = BuildDependencyCompiler(repository)
+    results = compiler.resolve([install_req_from_req_string("pkg0==1.0")])
+    assert len(results) == depth
+    assert len(compiler.graph) == depth + 1
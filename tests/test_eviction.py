@@ -0,0 +1,154 @@
+"""Test eviction module."""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from pybuild_deps import __main__ as main
+from pybuild_deps.cache import SOURCES, get_store
+from pybuild_deps.eviction import auto_prune, cache_info, clear_cache, prune_cache
+from pybuild_deps.source import cache_key, entry_lock, get_package_source
+
+
+SDIST_FILES = {"setup.py": "from setuptools import setup\nsetup()\n"}
+
+
+@pytest.fixture
+def populated_cache(cache: Path, http_server, sdist_factory):
+    """Cache with 2 sources and 2 results, accessed one day apart."""
+    sources = []
+    for name in ("foo", "bar"):
+        sdist = sdist_factory(name, "1.0", SDIST_FILES)
+        sources.append(get_package_source(name, f"{http_server.url}/{sdist.name}"))
+    store = get_store()
+    store.set("test", "a", ["x" * 100])
+    store.set("test", "b", ["y" * 100])
+    store.flush()
+    foo_key, bar_key = (cache_key(source.parent) for source in sources)
+    now = time.time()
+    with store.transaction() as connection:
+        for days, (table, column, key) in enumerate(
+            [
+                ("sources", "path", foo_key),
+                ("results", "key", "a"),
+                ("sources", "path", bar_key),
+                ("results", "key", "b"),
+            ]
+        ):
+            connection.execute(
+                f"UPDATE {table} SET accessed_at = ? WHERE {column} LIKE ?",  # noqa: S608
+                (now - (4 - days) * 24 * 60 * 60, key),
+            )
+    return sources
+
+
+def test_cache_info(populated_cache):
+    """Entries, sizes and hit rates are reported per namespace."""
+    get_store().get("test", "a")
+    get_store().get("test", "missing")
+    stats = cache_info()
+    assert stats[SOURCES].entries == 2
+    assert stats[SOURCES].size > 0
+    assert stats[SOURCES].hit_rate == 0
+    assert stats["test"].entries == 2
+    assert stats["test"].hit_rate == 0.5
+
+
+def test_prune_ttl(populated_cache):
+    """Entries not accessed within ttl are evicted."""
+    foo, bar = populated_cache
+    report = prune_cache(ttl=2.5 * 24 * 60 * 60)
+    assert report.removed == 2
+    assert not foo.exists()
+    assert bar.exists()
+    assert get_store().get("test", "a") is None
+    assert get_store().get("test", "b") is not None
+
+
+def test_prune_max_size(populated_cache):
+    """Least recently used entries are evicted until the cache fits max_size."""
+    foo, bar = populated_cache
+    stats = cache_info()
+    total_size = sum(s.size for s in stats.values())
+    report = prune_cache(max_size=total_size - 1)
+    assert report.removed == 1
+    assert not foo.exists()
+    assert prune_cache(max_size=0).removed == 3
+    assert not bar.exists()
+    assert cache_info()[SOURCES].entries == 0
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="file locking is not supported on windows"
+)
+def test_prune_skips_entries_in_use(populated_cache):
+    """Sources being read by other processes are never evicted."""
+    foo, bar = populated_cache
+    with entry_lock(foo.parent):
+        report = prune_cache(max_size=0)
+    assert report.skipped == 1
+    assert foo.exists()
+    assert not bar.exists()
+
+
+def test_prune_untracked_sources(cache: Path):
+    """Sources cached by older versions are tracked by their modification time."""
+    metadata = cache / "foo" / "1.0" / "metadata"
+    metadata.mkdir(parents=True)
+    (metadata / "setup.py").write_text("")
+    assert cache_info()[SOURCES].entries == 1
+    assert prune_cache(ttl=60 * 60).removed == 0
+    assert prune_cache(ttl=0).removed == 1
+    assert not (cache / "foo").exists()
+
+
+def test_cache_info_many_sources(cache: Path):
+    """Sources are found in a single walk over the cache, whatever its size."""
+    for i in range(3000):
+        metadata = cache / f"pkg-{i}" / "1.0" / "metadata"
+        metadata.mkdir(parents=True)
+        (metadata / "setup.py").write_text("")
+    started_at = time.monotonic()
+    assert cache_info()[SOURCES].entries == 3000
+    # listing the cache root for every directory took over a minute
+    assert time.monotonic() - started_at < 30
+
+
+def test_clear_cache(populated_cache, cache: Path):
+    """All entries are removed."""
+    (cache / "find-build-deps.db").write_text("")
+    report = clear_cache()
+    assert report.removed == 4
+    assert not any(path.exists() for path in populated_cache)
+    assert not (cache / "find-build-deps.db").exists()
+    assert get_store().get("test", "a") is None
+
+
+def test_auto_prune(mocker, populated_cache):
+    """Auto prune only runs if configured and not too often."""
+    assert auto_prune() is None
+    mocker.patch("pybuild_deps.constants.CACHE_TTL", "3.5d")
+    mocker.patch("pybuild_deps.constants.CACHE_MAX_SIZE", "not-a-size")
+    assert auto_prune().removed == 1
+    assert auto_prune() is None
+
+
+def test_cache_cli(populated_cache):
+    """Exercise cache commands."""
+    runner = CliRunner()
+    result = runner.invoke(main.cli, ["cache", "info"])
+    assert result.exit_code == 0
+    assert "sources" in result.output
+    result = runner.invoke(main.cli, ["cache", "prune"])
+    assert result.exit_code == 2
+    result = runner.invoke(main.cli, ["cache", "prune", "--max-size", "lots"])
+    assert result.exit_code == 2
+    result = runner.invoke(main.cli, ["cache", "prune", "--ttl", "3.5d"])
+    assert result.exit_code == 0
+    assert result.output.startswith("Removed 1 entries")
+    result = runner.invoke(main.cli, ["cache", "clear", "--yes"])
+    assert result.exit_code == 0
+    assert result.output.startswith("Removed 3 entries")
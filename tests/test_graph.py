@@ -0,0 +1,166 @@
+"""Test graph module."""
+
+import io
+import json
+
+import pytest
+from pip._internal.req.constructors import install_req_from_req_string
+
+from pybuild_deps.exceptions import PyBuildDepsError
+from pybuild_deps.graph import BUILD, RUNTIME, BuildDependencyGraph
+
+
+def test_graph():
+    """Nodes are identified by canonical name and version."""
+    graph = BuildDependencyGraph()
+    root = graph.add_node(install_req_from_req_string("Foo_Bar==1.0"), root=True)
+    assert root == ("foo-bar", "1.0")
+    assert (
+        graph.add_node(install_req_from_req_string("foo-bar==1.0"), root=True) == root
+    )
+    setuptools = graph.add_node(install_req_from_req_string("setuptools==70.0"))
+    wheel = graph.add_node(install_req_from_req_string("wheel==0.43"))
+    graph.add_edge(root, setuptools, BUILD)
+    graph.add_edge(root, wheel, RUNTIME)
+    assert graph.roots == [root]
+    assert list(graph) == [root, setuptools, wheel]
+    assert len(graph) == 3
+    assert wheel in graph
+    assert list(graph.edges()) == [(root, setuptools, BUILD), (root, wheel, RUNTIME)]
+    assert graph.dependencies(root) == {setuptools: BUILD, wheel: RUNTIME}
+    assert graph.dependents(wheel) == [root]
+    assert graph.build_dependencies() == [setuptools, wheel]
+
+
+def test_graph_unpinned_requirement():
+    """Only pinned requirements can be nodes."""
+    with pytest.raises(PyBuildDepsError, match="is not exact"):
+        BuildDependencyGraph().add_node(install_req_from_req_string("foo>=1.0"))
+
+
+def test_graph_export():
+    """Graphs are exported as JSON and DOT, with edge labels and timings."""
+    graph = BuildDependencyGraph()
+    root = graph.add_node(
+        install_req_from_req_string("foo @ https://example.com/foo.tar.gz"), root=True
+    )
+    setuptools = graph.add_node(install_req_from_req_string("setuptools==70.0"))
+    graph.add_edge(root, setuptools, BUILD)
+    graph.timings[root] = {"fetch": 0.5, "parse": 0.25}
+    assert graph.to_dict() == {
+        "roots": ["foo @ https://example.com/foo.tar.gz"],
+        "nodes": [
+            {
+                "id": "foo @ https://example.com/foo.tar.gz",
+                "name": "foo",
+                "version": "https://example.com/foo.tar.gz",
+                "timings": {"fetch": 0.5, "parse": 0.25},
+            },
+            {
+                "id": "setuptools==70.0",
+                "name": "setuptools",
+                "version": "70.0",
+                "timings": {},
+            },
+        ],
+        "edges": [
+            {
+                "from": "foo @ https://example.com/foo.tar.gz",
+                "to": "setuptools==70.0",
+                "kind": BUILD,
+                "label": "build requirement",
+                "via": [],
+            }
+        ],
+    }
+    dot = io.StringIO()
+    graph.dump(dot, "dot")
+    assert dot.getvalue().splitlines() == [
+        "digraph build_dependencies {",
+        (
+            '  "foo @ https://example.com/foo.tar.gz" '
+            '[label="foo @ https://example.com/foo.tar.gz'
+            '\\nfetch: 0.500s\\nparse: 0.250s", shape=box];'
+        ),
+        '  "setuptools==70.0" [label="setuptools==70.0", shape=ellipse];',
+        (
+            '  "foo @ https://example.com/foo.tar.gz" -> "setuptools==70.0" '
+            '[label="build requirement", style=solid];'
+        ),
+        "}",
+    ]
+    as_json = io.StringIO()
+    graph.dump(as_json)
+    assert json.loads(as_json.getvalue()) == graph.to_dict()
+
+
+def test_graph_round_trip():
+    """Graphs are loaded back from their dict representation."""
+    graph = BuildDependencyGraph()
+    root = graph.add_node(install_req_from_req_string("foo==1.0"), root=True)
+    setuptools = graph.add_node(install_req_from_req_string("setuptools==70.0"))
+    graph.add_edge(root, setuptools, BUILD, via={"foo", "bar"})
+    graph.timings[root] = {"fetch": 0.5}
+    loaded = BuildDependencyGraph.from_dict(json.loads(json.dumps(graph.to_dict())))
+    assert loaded.to_dict() == graph.to_dict()
+    ireq = loaded.requirement(root, setuptools)
+    assert str(ireq.req) == "setuptools==70.0"
+    assert ireq._required_by == {"bar", "foo"}
+
+
+def test_graph_reusable():
+    """Only nodes whose whole closure is still pinned are reusable."""
+    graph = BuildDependencyGraph()
+    foo, bar, setuptools, wheel, packaging = (
+        graph.add_node(install_req_from_req_string(req))
+        for req in (
+            "foo==1.0",
+            "bar==1.0",
+            "setuptools==70.0",
+            "wheel==0.43",
+            "packaging==24.0",
+        )
+    )
+    graph.add_edge(foo, setuptools)
+    graph.add_edge(bar, wheel)
+    graph.add_edge(wheel, packaging, RUNTIME)
+    assert graph.closure(bar) == {wheel, packaging}
+    pins = {"setuptools": "70.0", "wheel": "0.43", "packaging": "23.0"}
+    reusable = graph.reusable(pins, {})
+    assert foo in reusable
+    assert bar not in reusable
+    assert wheel not in reusable
+    # leaves are reusable, even if no longer pinned
+    assert packaging in reusable
+    assert reusable.dependencies(foo) == {setuptools: BUILD}
+
+
+def test_graph_reusable_constraints():
+    """Nodes whose closure is constrained differently by the roots are left out."""
+    graph = BuildDependencyGraph()
+    foo, bar, setuptools, wheel = (
+        graph.add_node(install_req_from_req_string(req), root=root)
+        for req, root in (
+            ("foo==1.0", True),
+            ("bar==1.0", True),
+            ("setuptools==70.0", True),
+            ("wheel==0.43", False),
+        )
+    )
+    graph.add_edge(foo, setuptools)
+    graph.add_edge(bar, wheel)
+    pins = {"setuptools": "70.0", "wheel": "0.43"}
+    constraints = {"foo": "1.0", "bar": "1.0", "setuptools": "70.0"}
+    assert set(graph.reusable(pins, constraints)) == {foo, bar, setuptools, wheel}
+    # setuptools is pinned differently by the roots, or not at all
+    for changed in (
+        {"foo": "1.0", "bar": "1.0", "setuptools": "71.0"},
+        {"foo": "1.0", "bar": "1.0"},
+    ):
+        reusable = graph.reusable(pins, changed)
+        assert foo not in reusable
+        assert {bar, setuptools, wheel} <= set(reusable)
+    # wheel is constrained by the roots now
+    reusable = graph.reusable(pins, {**constraints, "wheel": "0.43"})
+    assert bar not in reusable
+    assert foo in reusable
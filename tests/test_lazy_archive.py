@@ -0,0 +1,70 @@
+"""Test lazy_archive module."""
+
+import os
+
+import pytest
+from pip._internal.network.session import PipSession
+
+from pybuild_deps.constants import BUILD_METADATA_FILES
+from pybuild_deps.lazy_archive import RangeRequestsUnsupportedError, fetch_archive_files
+from pybuild_deps.source import get_package_source, read_source_files
+
+
+SDIST_FILES = {
+    "pyproject.toml": '[build-system]\nrequires = ["setuptools>=61"]\n',
+    "setup.cfg": "[metadata]\nname = foo\n",
+    "setup.py": "from setuptools import setup\nsetup()\n",
+}
+
+
+@pytest.fixture
+def large_sdist_factory(sdist_factory):
+    """Create sdists bundling a large file after the build metadata files."""
+
+    def factory(fmt):
+        files = {**SDIST_FILES, "data.bin": os.urandom(4 * 1024 * 1024).hex()}
+        return sdist_factory("foo", "1.0", files, fmt=fmt)
+
+    return factory
+
+
+@pytest.mark.parametrize("fmt", ["zip", "tar"])
+def test_fetch_archive_files(http_server, large_sdist_factory, fmt):
+    """Only a small fraction of the archive is downloaded."""
+    sdist = large_sdist_factory(fmt)
+    url = f"{http_server.url}/{sdist.name}"
+    files = fetch_archive_files(url, PipSession(), BUILD_METADATA_FILES)
+    assert files == {name: content.encode() for name, content in SDIST_FILES.items()}
+    range_requests = [r for r in http_server.requests if r[0] == "GET"]
+    assert all(range_header for _, _, range_header in range_requests)
+    assert len(range_requests) <= 4
+
+
+@pytest.mark.parametrize(
+    "supports_ranges,fmt", [(False, "zip"), (True, "tar.gz")], ids=["server", "format"]
+)
+def test_fetch_archive_files_unsupported(
+    http_server, large_sdist_factory, supports_ranges, fmt
+):
+    """RangeRequestsUnsupportedError is raised when a full download is required."""
+    http_server.supports_ranges = supports_ranges
+    sdist = large_sdist_factory(fmt)
+    with pytest.raises(RangeRequestsUnsupportedError):
+        fetch_archive_files(
+            f"{http_server.url}/{sdist.name}", PipSession(), BUILD_METADATA_FILES
+        )
+
+
+@pytest.mark.parametrize("supports_ranges", [True, False])
+def test_get_package_source_with_range_requests(
+    http_server, large_sdist_factory, supports_ranges
+):
+    """Sources are retrieved whether or not range requests are supported."""
+    http_server.supports_ranges = supports_ranges
+    sdist = large_sdist_factory("zip")
+    source_path = get_package_source("foo", f"{http_server.url}/{sdist.name}")
+    assert read_source_files(source_path) == {
+        name: content.encode() for name, content in SDIST_FILES.items()
+    }
+    full_downloads = [r for r in http_server.requests if r[0] == "GET" and r[2] is None]
+    assert len(full_downloads) == (0 if supports_ranges else 1)
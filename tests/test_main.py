@@ -1,18 +1,27 @@
 """Test cases for the __main__ module."""
 
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
 import traceback
 from os import chdir
 from pathlib import Path
 
 import pytest
 from click.testing import CliRunner
+from pip._internal.req.constructors import install_req_from_req_string
 from piptools.exceptions import PipToolsError
 from piptools.repositories import PyPIRepository
+from piptools.resolver import BacktrackingResolver
 
 from pybuild_deps import __main__ as main
+from pybuild_deps import constants
 from pybuild_deps.compile_build_dependencies import BuildDependencyCompiler
 from pybuild_deps.constants import PIPTOOLS_CACHE_DIR
 from pybuild_deps.parsers import parse_requirements
+from pybuild_deps.prefetch import SourcePrefetcher
 
 
 @pytest.fixture
@@ -31,6 +40,36 @@ def test_main_succeeds(runner: CliRunner) -> None:
     """It exits with a status code of zero."""
     result = runner.invoke(main.cli)
     assert result.exit_code == 0
+    commands = result.stdout.split("Commands:")[1].splitlines()
+    assert [line.split()[0] for line in commands if line] == [
+        "cache",
+        "compile",
+        "find-build-deps",
+        "warm",
+    ]
+
+
+def test_cli_imports_subcommands_lazily() -> None:
+    """Importing the CLI doesn't import what only subcommands need."""
+    code = (
+        "import sys, pybuild_deps.__main__, pybuild_deps.constants;"
+        "print('\\n'.join(sys.modules))"
+    )
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    imported = set(result.stdout.splitlines())
+    assert "pybuild_deps.__main__" in imported
+    assert not imported & {
+        "piptools.repositories",
+        "piptools.resolver",
+        "piptools.scripts.compile",
+        "pip._internal.network.session",
+        "pybuild_deps.scripts.compile",
+        "pybuild_deps.finder",
+    }
+    with pytest.raises(AttributeError, match="has no attribute 'MISSING'"):
+        constants.MISSING  # noqa: B018
 
 
 @pytest.mark.e2e
@@ -255,3 +294,310 @@ def test_compile_consistent_ordering(runner: CliRunner, tmp_path: Path):
     )
     assert result2.exit_code == 0
     assert outfile1.read_text() == outfile2.read_text()
+
+
+def test_find_build_deps_local_sdist(runner: CliRunner, http_server, sdist_factory):
+    """Find build dependencies of a source distribution served locally."""
+    sdist = sdist_factory(
+        "foo",
+        "1.0",
+        {
+            "pyproject.toml": '[build-system]\nrequires = ["flit_core>=3.2"]\n',
+            "setup.cfg": "[options]\nsetup_requires =\n    wheel\n",
+        },
+    )
+    url = f"{http_server.url}/{sdist.name}"
+    result = runner.invoke(main.cli, args=["find-build-deps", "foo", url])
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == ["flit_core>=3.2", "wheel"]
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--processes", "1"]])
+def test_find_build_deps_batch(
+    runner: CliRunner, http_server, sdist_factory, extra_args
+):
+    """Requirements are read from stdin, writing results as JSON lines."""
+    files = {"pyproject.toml": "[build-system]\nrequires = ['flit-core']\n"}
+    http_server.publish_sdist(sdist_factory("foo", "1.0", files))
+    result = runner.invoke(
+        main.cli,
+        args=["find-build-deps", "--batch", "-", "-j", "2", *extra_args],
+        input="foo==1.0\nmissing==1.0\n",
+        env={"PIP_INDEX_URL": http_server.index_url},
+    )
+    assert result.exit_code == 2
+    results = {
+        line["requirement"]: line.get("build_dependencies")
+        for line in map(json.loads, result.stdout.splitlines())
+    }
+    assert results == {"foo==1.0": ["flit-core"], "missing==1.0": None}
+    assert "missing==1.0: Package missing==1.0 not found on PyPI" in result.stderr
+
+
+def test_find_build_deps_offline(runner: CliRunner, http_server):
+    """Offline, everything missing from the cache is reported at once."""
+    result = runner.invoke(
+        main.cli,
+        args=["find-build-deps", "--offline", "--batch", "-"],
+        input="foo==1.0\nbar==1.0\n",
+        env={"PIP_INDEX_URL": http_server.index_url},
+    )
+    assert result.exit_code == 2
+    assert "missing from the cache" in result.stderr
+    assert "source of bar==1.0\nsource of foo==1.0" in result.stderr
+    assert http_server.requests == []
+
+
+@pytest.mark.parametrize(
+    "args",
+    [["find-build-deps"], ["find-build-deps", "foo", "--batch", "-"]],
+)
+def test_find_build_deps_usage_errors(runner: CliRunner, args):
+    """Either a package or --batch is required."""
+    result = runner.invoke(main.cli, args=args)
+    assert result.exit_code == 2
+    assert "PACKAGE_NAME and PACKAGE_VERSION" in result.stderr
+
+
+def test_find_build_deps_profile(runner: CliRunner, http_server, sdist_factory):
+    """A summary of where time was spent is printed with --profile."""
+    files = {"pyproject.toml": "[build-system]\nrequires = ['flit-core']\n"}
+    http_server.publish_sdist(sdist_factory("foo", "1.0", files))
+    result = runner.invoke(
+        main.cli,
+        args=["find-build-deps", "--profile", "foo", "1.0"],
+        env={"PIP_INDEX_URL": http_server.index_url},
+    )
+    assert result.exit_code == 0
+    assert result.stdout == "flit-core\n"
+    for section in (
+        "finder.find_build_dependencies",
+        "source.get_package_source",
+        "source.get_source_url_from_pypi",
+        "parsers.parse_pyproject_toml",
+        "bytes_downloaded",
+    ):
+        assert section in result.stderr
+
+
+@pytest.mark.parametrize("graph_file", ["graph.json", "graph.dot"])
+def test_compile_graph_output(
+    runner: CliRunner, tmp_path: Path, mocker, graph_file: str
+):
+    """The graph of build dependencies is written along with requirements."""
+    chdir(tmp_path)
+    (tmp_path / "requirements.txt").write_text("foo==1.0\n")
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=lambda name, *args, **kwargs: ["bar"] if name == "foo" else [],
+    )
+    mocker.patch.object(
+        BacktrackingResolver,
+        "resolve",
+        lambda self: {
+            install_req_from_req_string("bar==2.0", comes_from="foo"),
+            install_req_from_req_string("baz==3.0", comes_from="bar"),
+        },
+    )
+    result = runner.invoke(
+        main.cli,
+        args=[
+            "compile",
+            "--no-prefetch",
+            "-o",
+            "build-requirements.txt",
+            "--graph-output",
+            graph_file,
+        ],
+    )
+    assert result.exit_code == 0, result.stderr
+    # options unknown to pip-compile are left out of the header
+    header = (tmp_path / "build-requirements.txt").read_text()
+    assert "pybuild-deps compile --output-file=build-requirements.txt\n" in header
+    graph = (tmp_path / graph_file).read_text()
+    if graph_file.endswith(".json"):
+        graph = json.loads(graph)
+        assert graph["roots"] == ["foo==1.0"]
+        assert [(e["from"], e["to"], e["label"]) for e in graph["edges"]] == [
+            ("foo==1.0", "bar==2.0", "build requirement"),
+            ("foo==1.0", "baz==3.0", "runtime dependency of build requirement"),
+        ]
+        assert set(graph["nodes"][0]["timings"]) == {"resolve"}
+    else:
+        assert graph.startswith("digraph build_dependencies {")
+        assert (
+            '"foo==1.0" -> "baz==3.0" '
+            '[label="runtime dependency of build requirement", style=dashed];'
+        ) in graph
+
+
+def test_compile_events_json(runner: CliRunner, tmp_path: Path, mocker):
+    """Progress events are streamed as JSON lines, and profiles printed."""
+    chdir(tmp_path)
+    (tmp_path / "requirements.txt").write_text("foo==1.0\n")
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=lambda name, *args, **kwargs: ["bar"] if name == "foo" else [],
+    )
+    mocker.patch.object(
+        BacktrackingResolver,
+        "resolve",
+        lambda self: {install_req_from_req_string("bar==2.0", comes_from="foo")},
+    )
+    result = runner.invoke(
+        main.cli,
+        args=[
+            "compile",
+            "--no-prefetch",
+            "--dry-run",
+            "--events-json",
+            "events.json",
+            "--profile",
+        ],
+    )
+    assert result.exit_code == 0, result.stderr
+    assert "BuildDependencyCompiler._resolve_with_piptools" in result.stderr
+    events = (tmp_path / "events.json").read_text().splitlines()
+    assert [json.loads(event).get("package") for event in events] == [
+        None,
+        "foo==1.0",
+        "bar==2.0",
+        None,
+    ]
+
+
+def test_compile_incremental(runner: CliRunner, tmp_path: Path, mocker):
+    """Only packages changed since the previous compilation are expanded."""
+    chdir(tmp_path)
+    build_deps = {"foo": ["setuptools"], "bar": ["setuptools", "wheel"]}
+    find_build_deps = mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        side_effect=lambda name, *args, **kwargs: build_deps.get(name, []),
+    )
+    mocker.patch.object(
+        BacktrackingResolver,
+        "resolve",
+        lambda self: {
+            install_req_from_req_string(f"{ireq.name}==1.0", comes_from=ireq.comes_from)
+            for ireq in self.constraints
+        },
+    )
+    prefetch = mocker.patch.object(SourcePrefetcher, "start", autospec=True)
+    args = ["compile", "-o", "build.txt", "--graph-output", "g.json"]
+
+    def compile_requirements(requirements, *extra_args):
+        (tmp_path / "requirements.txt").write_text(requirements)
+        find_build_deps.reset_mock()
+        prefetch.reset_mock()
+        result = runner.invoke(main.cli, args=[*args, *extra_args])
+        assert result.exit_code == 0, result.stderr
+        return (tmp_path / "build.txt").read_text()
+
+    # without previous compilation, everything is resolved
+    compile_requirements("foo==1.0\nbar==1.0\n", "--incremental")
+    assert find_build_deps.call_count == 4
+    assert _prefetched(prefetch) == ["foo==1.0", "bar==1.0"]
+    incremental = compile_requirements("foo==2.0\nbar==1.0\n", "--incremental")
+    assert [call.args[:2] for call in find_build_deps.call_args_list] == [
+        ("foo", "2.0")
+    ]
+    # only sources of packages not reused are prefetched
+    assert _prefetched(prefetch) == ["foo==2.0"]
+    # packages depending on pins changed in the output are resolved again
+    output = (tmp_path / "build.txt").read_text()
+    (tmp_path / "build.txt").write_text(output.replace("wheel==1.0", "wheel==0.9"))
+    compile_requirements("foo==2.0\nbar==1.0\n", "--incremental")
+    assert [call.args[:2] for call in find_build_deps.call_args_list] == [
+        ("bar", "1.0")
+    ]
+    # pins are the same as resolving everything again
+    full = compile_requirements("foo==2.0\nbar==1.0\n")
+    assert _pins(full) == _pins(incremental) == ["setuptools==1.0", "wheel==1.0"]
+    # nothing changed, nothing is resolved
+    unchanged = compile_requirements("foo==2.0\nbar==1.0\n", "--incremental")
+    assert _pins(unchanged) == _pins(full)
+    find_build_deps.assert_not_called()
+    assert _prefetched(prefetch) == []
+    # packages whose build dependencies are constrained differently are resolved
+    # again
+    compile_requirements("foo==2.0\nbar==1.0\nwheel==1.0\n", "--incremental")
+    assert [call.args[:2] for call in find_build_deps.call_args_list] == [
+        ("bar", "1.0")
+    ]
+    assert _prefetched(prefetch) == ["bar==1.0"]
+
+
+def _prefetched(prefetch) -> list[str]:
+    return [str(ireq.req) for call in prefetch.call_args_list for ireq in call.args[1]]
+
+
+def _pins(requirements: str) -> list[str]:
+    return sorted(line for line in requirements.splitlines() if "==" in line)
+
+
+@pytest.mark.parametrize(
+    "args, graph, expected_error",
+    [
+        ([], None, "--incremental requires both --output-file and --graph-output"),
+        (["--graph-output", "g.json"], "{}", "Unable to load graph"),
+    ],
+)
+def test_compile_incremental_errors(
+    runner: CliRunner, tmp_path: Path, mocker, args, graph, expected_error
+):
+    """Incremental compilation needs a previous graph."""
+    chdir(tmp_path)
+    (tmp_path / "requirements.txt").write_text("foo==1.0\n")
+    (tmp_path / "build.txt").write_text("")
+    if graph is not None:
+        (tmp_path / "g.json").write_text(graph)
+    mocker.patch(
+        "pybuild_deps.compile_build_dependencies.find_build_dependencies",
+        return_value=[],
+    )
+    result = runner.invoke(
+        main.cli,
+        args=["compile", "--no-prefetch", "--incremental", "-o", "build.txt", *args],
+    )
+    assert expected_error in result.stderr
+
+
+def test_compile_offline(
+    runner: CliRunner, tmp_path: Path, mocker, http_server, sdist_factory
+):
+    """Compilation runs offline from the cache filled by warm."""
+    chdir(tmp_path)
+    (tmp_path / "requirements.txt").write_text("foo==1.0\n")
+    for name, requires in (("foo", ["flit-core"]), ("flit-core", [])):
+        files = {"pyproject.toml": f"[build-system]\nrequires = {requires}\n"}
+        http_server.publish_sdist(sdist_factory(name, "1.0", files))
+    resolve = mocker.patch.object(
+        BacktrackingResolver,
+        "resolve",
+        return_value={install_req_from_req_string("flit-core==1.0", comes_from="foo")},
+    )
+    mocker.patch.object(
+        BacktrackingResolver,
+        "resolve_hashes",
+        lambda self, ireqs: {ireq: {f"sha256:{'0' * 64}"} for ireq in ireqs},
+    )
+    env = {"PIP_INDEX_URL": http_server.index_url}
+    args = ["compile", "--offline", "--generate-hashes", "-o", "build.txt"]
+
+    result = runner.invoke(main.cli, args=args, env=env)
+    assert result.exit_code == 2
+    assert "source of foo==1.0" in result.stderr
+    assert http_server.requests == []
+
+    result = runner.invoke(main.cli, args=["warm"], env=env)
+    assert result.exit_code == 0, result.stderr
+    resolve.reset_mock()
+    requests_made = len(http_server.requests)
+    result = runner.invoke(main.cli, args=args, env=env)
+    assert result.exit_code == 0, result.stderr
+    assert (
+        f"flit-core==1.0 \\\n    --hash=sha256:{'0' * 64}"
+        in (tmp_path / "build.txt").read_text()
+    )
+    resolve.assert_not_called()
+    assert len(http_server.requests) == requests_made
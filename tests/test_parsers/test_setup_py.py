@@ -2,7 +2,7 @@
 
 import pytest
 
-from pybuild_deps.parsers import parse_setup_py
+from pybuild_deps.parsers import SetupPyParsingError, parse_setup_py
 
 
 SIMPLE = """
@@ -123,7 +123,7 @@ setup(
 MULTIPLE_ASSIGNMENT_2 = """
 from setuptools import setup
 
-# yet another weird unsupported scenario
+# yet another weird scenario
 DEP1, DEP2 = ["foo", "bar"]
 
 setup(
@@ -131,6 +131,78 @@ setup(
 )
 """
 
+CHAINED_ASSIGNMENT = """
+from setuptools import setup
+
+SETUP_REQUIRES = BUILD_REQUIRES = ["foo"]
+setup(setup_requires=BUILD_REQUIRES)
+"""
+
+TUPLE = """
+from setuptools import setup
+
+CYTHON = "cython"
+SETUP_REQUIRES = ("foo", CYTHON)
+setup(setup_requires=SETUP_REQUIRES)
+"""
+
+CONCATENATION = """
+from setuptools import setup
+
+BASE = ["foo"]
+EXTRA = ("bar",)
+setup(setup_requires=BASE + ["baz", *EXTRA])
+"""
+
+REASSIGNMENT = """
+from setuptools import setup
+
+SETUP_REQUIRES = ["foo"]
+SETUP_REQUIRES = SETUP_REQUIRES + ["bar"]
+SETUP_REQUIRES += ["baz"]
+setup(setup_requires=SETUP_REQUIRES)
+SETUP_REQUIRES = ["assigned after setup"]
+"""
+
+MAIN_GUARD = """
+import setuptools
+
+SETUP_REQUIRES = ["foo"]
+config.attr = "assigning attributes doesn't bind names"
+config.count += 1
+VERSION: str
+
+if sys.platform == "win32":
+    # conditional assignments are ignored
+    SETUP_REQUIRES = ["pywin32"]
+
+if __name__ == "__main__":
+    SETUP_REQUIRES.append("not supported")
+    DEP: str = "bar"
+    setuptools.setup(setup_requires=[*SETUP_REQUIRES, DEP])
+"""
+
+UNPACKED_CALL = """
+from setuptools import setup
+
+SETUP_REQUIRES, INSTALL_REQUIRES = get_requirements()
+setup(setup_requires=SETUP_REQUIRES)
+"""
+
+UNKNOWN_ELEMENT = """
+from setuptools import setup
+from foo import bar
+
+first, *rest = "foo", "bar"
+setup(setup_requires=[bar, *rest])
+"""
+
+NON_LITERAL = """
+from setuptools import setup
+
+setup(setup_requires=get_setup_requires())
+"""
+
 
 @pytest.mark.parametrize(
     "setup_py,expected_result",
@@ -156,18 +228,22 @@ setup(
             ["foo"],
             marks=pytest.mark.xfail(reason="not implemented"),
         ),
-        pytest.param(
-            MULTIPLE_ASSIGNMENT,
-            ["foo"],
-            marks=pytest.mark.xfail(reason="not implemented"),
-        ),
-        pytest.param(
-            MULTIPLE_ASSIGNMENT_2,
-            ["foo"],
-            marks=pytest.mark.xfail(reason="not implemented"),
-        ),
+        (MULTIPLE_ASSIGNMENT, ["foo"]),
+        (MULTIPLE_ASSIGNMENT_2, ["foo", "bar"]),
+        (CHAINED_ASSIGNMENT, ["foo"]),
+        (TUPLE, ["foo", "cython"]),
+        (CONCATENATION, ["foo", "baz", "bar"]),
+        (REASSIGNMENT, ["foo", "bar", "baz"]),
+        (MAIN_GUARD, ["foo", "bar"]),
     ],
 )
 def test_parse_setup_py(setup_py, expected_result):
     """Test setup.py parser."""
     assert parse_setup_py(setup_py) == expected_result
+
+
+@pytest.mark.parametrize("setup_py", [UNPACKED_CALL, UNKNOWN_ELEMENT, NON_LITERAL])
+def test_parse_setup_py_error(setup_py):
+    """Values that can't be inferred statically raise SetupPyParsingError."""
+    with pytest.raises(SetupPyParsingError):
+        parse_setup_py(setup_py)
@@ -0,0 +1,62 @@
+"""Test prefetch module."""
+
+from pathlib import Path
+
+from pip._internal.req.constructors import install_req_from_req_string
+
+from pybuild_deps.prefetch import PrefetchReport, SourcePrefetcher
+from pybuild_deps.source import get_package_source_files, is_source_cached
+
+
+def _ireqs(*reqs):
+    return [install_req_from_req_string(req) for req in reqs]
+
+
+def test_prefetch(mocker, http_server, sdist_factory):
+    """Sources are downloaded from the index, reporting throughput."""
+    files = {"pyproject.toml": "[build-system]\nrequires = ['flit-core']\n"}
+    for name in ("foo", "bar"):
+        http_server.publish_sdist(sdist_factory(name, "1.0", files))
+    mocker.patch("pybuild_deps.prefetch.log")
+    with SourcePrefetcher(jobs=2, index_url=http_server.index_url) as prefetcher:
+        prefetcher.start(_ireqs("foo==1.0", "bar==1.0", "foo==1.0", "missing==1.0"))
+        prefetcher.wait("foo", "1.0")
+        assert is_source_cached("foo", "1.0")
+        # not scheduled, nothing to wait for
+        prefetcher.wait("baz", "1.0")
+    report = prefetcher.report
+    assert (report.packages, report.downloaded, report.cached, report.failed) == (
+        3,
+        2,
+        0,
+        1,
+    )
+    assert report.bytes_downloaded > 0
+    assert report.packages_per_second > 0
+    assert report.megabytes_per_second > 0
+    assert "3 sources (2 downloaded, 0 cached, 1 failed)" in str(report)
+
+    # prefetched sources are consumed without network access
+    requests_made = len(http_server.requests)
+    assert get_package_source_files("bar", "1.0") == {
+        "pyproject.toml": files["pyproject.toml"].encode()
+    }
+    assert len(http_server.requests) == requests_made
+
+
+def test_prefetch_cached_sources(cache: Path, http_server, sdist_factory):
+    """Cached sources, and requirements that aren't pinned, are skipped."""
+    sdist = sdist_factory("foo", "1.0", {"setup.py": "setup()"})
+    http_server.publish_sdist(sdist)
+    get_package_source_files("foo", "1.0", index_url=http_server.index_url)
+    requests_made = len(http_server.requests)
+    with SourcePrefetcher(index_url=http_server.index_url) as prefetcher:
+        prefetcher.start(_ireqs("foo==1.0", "bar>=1.0"))
+    assert prefetcher.report.packages == prefetcher.report.cached == 1
+    assert len(http_server.requests) == requests_made
+
+
+def test_prefetch_report_without_elapsed_time():
+    """Throughput is zero when no time has passed."""
+    report = PrefetchReport(packages=1)
+    assert report.packages_per_second == report.megabytes_per_second == 0
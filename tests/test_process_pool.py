@@ -0,0 +1,42 @@
+"""Test process_pool module."""
+
+import pytest
+
+from pybuild_deps import finder
+from pybuild_deps.parsers.setup_py import SetupPyParsingError
+from pybuild_deps.process_pool import get_process_pool, process_pool
+from pybuild_deps.timing import collect_timings
+
+
+UNPARSABLE_SETUP_PY = "from setuptools import setup\nsetup(setup_requires=get())\n"
+
+
+def test_process_pool(http_server, sdist_factory, mocker):
+    """Sources are read and parsed in the pool, with the same results."""
+    log_error = mocker.spy(finder.log, "error")
+    files = {
+        "pyproject.toml": "[build-system]\nrequires = ['setuptools']\n",
+        "setup.cfg": "[options]\nsetup_requires = wheel\n",
+    }
+    http_server.publish_sdist(sdist_factory("foo", "1.0", files))
+    files = {**files, "setup.py": UNPARSABLE_SETUP_PY}
+    http_server.publish_sdist(sdist_factory("bar", "1.0", files))
+    index_url = http_server.index_url
+
+    assert get_process_pool() is None
+    with process_pool(processes=1) as pool:
+        assert get_process_pool() is pool
+        with collect_timings() as timings:
+            assert finder.find_build_dependencies(
+                "foo", "1.0", index_url=index_url
+            ) == ["setuptools", "wheel"]
+        assert {"fetch", "parse"} <= set(timings)
+        with pytest.raises(SetupPyParsingError, match="Unable to parse setup"):
+            finder.find_build_dependencies("bar", "1.0", index_url=index_url)
+        assert finder.find_build_dependencies(
+            "bar", "1.0", raise_setuppy_parsing_exc=False, index_url=index_url
+        ) == ["setuptools", "wheel"]
+        log_error.assert_called_once_with(
+            "Unable to parse setup.py for package bar==1.0."
+        )
+    assert get_process_pool() is None
@@ -0,0 +1,77 @@
+"""Test profiling module."""
+
+import pytest
+
+from pybuild_deps.profiling import (
+    Profiler,
+    get_profiler,
+    profile_section,
+    profiled,
+    profiling,
+)
+from pybuild_deps.timing import count
+
+
+@profiled
+def double(value):
+    """Function profiled for testing."""
+    return value * 2
+
+
+def test_profiling():
+    """Calls are only recorded while profiling, along with counters."""
+    assert double(1) == 2
+    with profile_section("ignored"):
+        count("ignored")
+    assert get_profiler() is None
+
+    with profiling() as profiler:
+        assert get_profiler() is profiler
+        assert double(2) == 4
+        assert double(3) == 6
+        with profile_section("section"):
+            count("bytes", 10)
+            count("bytes", 5)
+    assert get_profiler() is None
+    data = profiler.to_dict()
+    assert set(data["sections"]) == {"tests.test_profiling.double", "section"}
+    stats = data["sections"]["tests.test_profiling.double"]
+    assert stats["calls"] == 2
+    assert stats["total"] >= stats["max"] >= stats["mean"] >= 0
+    assert data["counters"] == {"bytes": 15}
+
+
+def test_profiling_report():
+    """The summary is reported on exit, even on errors."""
+    reports = []
+    with pytest.raises(ValueError), profiling(report=reports.append):
+        double(1)
+        raise ValueError()
+    assert len(reports) == 1
+    assert "tests.test_profiling.double" in reports[0]
+
+
+def test_format_table():
+    """Sections are sorted by total time, slowest first."""
+    profiler = Profiler()
+    assert profiler.format_table().split() == [
+        "section",
+        "calls",
+        "total",
+        "(s)",
+        "mean",
+        "(ms)",
+        "max",
+        "(ms)",
+    ]
+    profiler.add("fast", 0.5)
+    profiler.add("slow", 1.0)
+    profiler.add("slow", 2.0)
+    profiler.count("bytes", 1024)
+    assert profiler.format_table().splitlines()[1:] == [
+        f"{'slow':<20}        2      3.000     1500.0     2000.0",
+        f"{'fast':<20}        1      0.500      500.0      500.0",
+        "",
+        f"{'counter':<20}    value",
+        f"{'bytes':<20}     1024",
+    ]
@@ -0,0 +1,70 @@
+"""Test resolution module."""
+
+from pip._internal.req.constructors import install_req_from_req_string
+
+from pybuild_deps.logger import log
+from pybuild_deps.resolution import ResolutionContext, _dump_ireq, _load_ireq
+
+
+def test_key_is_normalized():
+    """Equivalent requirements share the same key."""
+    first = install_req_from_req_string("Foo_Bar[b,a] >=1.0, <2 ; python_version>'3'")
+    second = install_req_from_req_string("foo-bar[a,b]<2,>=1.0; python_version > '3'")
+    assert ResolutionContext.key([first], {}) == ResolutionContext.key([second], {})
+
+
+def test_key_ignores_where_requirements_come_from():
+    """Packages declaring the same build dependencies share the same key."""
+    parent = install_req_from_req_string("foo==1.0")
+    first = [
+        install_req_from_req_string("setuptools>=40.8.0", comes_from=parent),
+        install_req_from_req_string("wheel", comes_from="foo"),
+    ]
+    second = [
+        install_req_from_req_string("setuptools>=40.8.0", comes_from="bar"),
+        install_req_from_req_string("Wheel", comes_from="bar"),
+    ]
+    # like constraints parsed from different lines of requirement files
+    constraints = [
+        {
+            "wheel": install_req_from_req_string(
+                "wheel==0.43", comes_from=f"-r requirements.txt (line {line})"
+            )
+        }
+        for line in (1, 2)
+    ]
+    assert str(first[1]) != str(second[1])
+    assert ResolutionContext.key(first, constraints[0]) == ResolutionContext.key(
+        second, constraints[1]
+    )
+    assert ResolutionContext.key(first, constraints[0]) == (
+        frozenset({"setuptools>=40.8.0", "wheel"}),
+        frozenset({"wheel==0.43"}),
+    )
+
+
+def test_persist_ttl_setting(mocker):
+    """RESOLUTION_CACHE_TTL is used by default, unless malformed."""
+    log_warning = mocker.spy(log, "warning")
+    mocker.patch("pybuild_deps.resolution.RESOLUTION_CACHE_TTL", "2h")
+    assert ResolutionContext().persist_ttl == 2 * 60 * 60
+    assert ResolutionContext(persist_ttl=10).persist_ttl == 10
+    mocker.patch("pybuild_deps.resolution.RESOLUTION_CACHE_TTL", "forever")
+    assert ResolutionContext().persist_ttl is None
+    log_warning.assert_called_once_with(
+        "ignoring PYBUILD_DEPS_RESOLUTION_CACHE_TTL: invalid duration 'forever'"
+    )
+
+
+def test_dump_and_load_ireq():
+    """Only what is needed for annotations is persisted."""
+    parent = install_req_from_req_string("foo==1.0")
+    ireq = install_req_from_req_string("bar==2.0", comes_from=parent)
+    ireq._required_by = {"foo", "baz"}
+    loaded = _load_ireq(_dump_ireq(ireq))
+    assert str(loaded.req) == "bar==2.0"
+    assert loaded.comes_from == "foo"
+    assert loaded._required_by == {"foo", "baz"}
+    # comes_from is dropped for dependencies on a package's own extras
+    extra = install_req_from_req_string("foo[extra]==1.0", comes_from=parent)
+    assert _dump_ireq(extra)["comes_from"] is None
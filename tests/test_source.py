@@ -1,8 +1,38 @@
 """Test source module."""
 
+import hashlib
+import json
+import sys
+import time
 from pathlib import Path
 
-from pybuild_deps.source import get_package_source
+import pytest
+from pip._internal.network.session import PipSession
+
+from pybuild_deps.constants import REQUEST_TIMEOUT
+from pybuild_deps.exceptions import (
+    CacheMissError,
+    PyBuildDepsError,
+    SourceUnavailableError,
+)
+from pybuild_deps.logger import log
+from pybuild_deps.offline import offline
+from pybuild_deps.source import (
+    _error_cache_ttl,
+    get_json_api_url,
+    get_package_source,
+    get_pip_session,
+    is_source_cached,
+    lock_package_source,
+    read_source_files,
+    remove_cached_source,
+    remove_dangling_index_records,
+)
+from pybuild_deps.timing import (
+    collect_counters,
+    collect_timings,
+    install_download_counter,
+)
 
 
 def test_get_package_source(
@@ -13,8 +43,300 @@ def test_get_package_source(
     source_tarball = get_package_source("cryptography", "40")
     assert cache.exists()
     assert source_tarball.is_relative_to(cache)
-    assert source_tarball == cache / "cryptography" / "40" / "source.tar.gz"
+    # PyPI provides the artifact hash, so the source is stored by hash
+    assert source_tarball.name == "metadata"
+    assert (cache / "cryptography" / "40" / "source.json").is_file()
     last_modified_at = source_tarball.stat().st_mtime
     # invoke it again to test the path for a cached result
     source_tarball_cached = get_package_source("cryptography", "40")
     assert source_tarball_cached.stat().st_mtime == last_modified_at
+
+
+SDIST_FILES = {
+    "pyproject.toml": '[build-system]\nrequires = ["setuptools>=61"]\n',
+    "setup.py": "from setuptools import setup\nsetup()\n",
+    "src/foo/__init__.py": "",
+}
+
+
+def test_get_package_source_metadata_mode(cache: Path, http_server, sdist_factory):
+    """Only build metadata files are kept by default."""
+    sdist = sdist_factory("foo", "1.0", SDIST_FILES)
+    url = f"{http_server.url}/{sdist.name}"
+    source_path = get_package_source("foo", url)
+    assert source_path.is_relative_to(cache)
+    assert source_path.is_dir()
+    assert sorted(p.name for p in source_path.iterdir()) == [
+        "pyproject.toml",
+        "setup.py",
+    ]
+    sdist.unlink()
+    assert get_package_source("foo", url) == source_path
+
+
+@pytest.mark.parametrize("fmt", ["tar.gz", "zip"])
+def test_get_package_source_artifact_mode(mocker, http_server, sdist_factory, fmt):
+    """The downloaded artifact is stored as is when using 'artifact' mode."""
+    mocker.patch("pybuild_deps.source.SOURCE_CACHE_MODE", "artifact")
+    sdist = sdist_factory("foo", "1.0", SDIST_FILES, fmt=fmt)
+    source_path = get_package_source("foo", f"{http_server.url}/{sdist.name}")
+    assert source_path.name == sdist.name
+    assert source_path.read_bytes() == sdist.read_bytes()
+    assert read_source_files(source_path) == {
+        "pyproject.toml": SDIST_FILES["pyproject.toml"].encode(),
+        "setup.py": SDIST_FILES["setup.py"].encode(),
+    }
+
+
+def test_get_package_source_migrates_legacy_tarball(cache: Path, sdist_factory):
+    """Sources cached by older versions are migrated without network access."""
+    legacy_sdist = sdist_factory("foo", "1.0", SDIST_FILES)
+    legacy_tarball = cache / "foo" / "1.0" / "source.tar.gz"
+    legacy_tarball.parent.mkdir(parents=True)
+    legacy_sdist.rename(legacy_tarball)
+    source_path = get_package_source("foo", "1.0")
+    assert source_path == cache / "foo" / "1.0" / "metadata"
+    assert not legacy_tarball.exists()
+    assert (
+        read_source_files(source_path)["setup.py"]
+        == b"from setuptools import setup\nsetup()\n"
+    )
+
+
+def test_get_package_source_not_an_archive(http_server):
+    """A helpful error is raised when the URL doesn't point to an archive."""
+    (http_server.root / "index.html").write_text("<html></html>")
+    url = f"{http_server.url}/index.html"
+    with pytest.raises(PyBuildDepsError, match="Unable to unpack"):
+        get_package_source("foo", url)
+
+
+def test_get_package_source_not_found(http_server):
+    """HTTP errors are reported as PyBuildDepsError."""
+    with pytest.raises(PyBuildDepsError, match="Unable to download"):
+        get_package_source("foo", f"{http_server.url}/foo-1.0.tar.gz")
+
+
+def test_get_package_source_caches_errors(mocker, cache: Path, http_server):
+    """Failures are cached and replayed without network access until they expire."""
+    (http_server.root / "index.html").write_text("<html></html>")
+    url = f"{http_server.url}/index.html"
+    with pytest.raises(SourceUnavailableError, match="Unable to unpack"):
+        get_package_source("foo", url)
+    error_file = next(cache.glob("foo/**/error.json"))
+    assert json.loads(error_file.read_text())["reason"] == "unpack failed"
+
+    requests_made = len(http_server.requests)
+    with pytest.raises(SourceUnavailableError, match="Unable to unpack") as exc_info:
+        get_package_source("foo", url)
+    assert exc_info.value.reason == "unpack failed"
+    assert len(http_server.requests) == requests_made
+
+    # once expired, the source is retrieved again
+    mocker.patch("pybuild_deps.source.ERROR_CACHE_TTL", "0.001")
+    time.sleep(0.01)
+    with pytest.raises(SourceUnavailableError, match="Unable to unpack"):
+        get_package_source("foo", url)
+    assert len(http_server.requests) > requests_made
+
+
+def test_get_package_source_error_cache_disabled(mocker, cache: Path, http_server):
+    """Errors are not cached when ERROR_CACHE_TTL is 0."""
+    mocker.patch("pybuild_deps.source.ERROR_CACHE_TTL", "0")
+    (http_server.root / "index.html").write_text("<html></html>")
+    with pytest.raises(SourceUnavailableError):
+        get_package_source("foo", f"{http_server.url}/index.html")
+    assert not list(cache.glob("foo/**/error.json"))
+
+
+def test_error_cache_ttl_invalid(mocker):
+    """A malformed ERROR_CACHE_TTL is reported, and the default used instead."""
+    log_warning = mocker.spy(log, "warning")
+    mocker.patch("pybuild_deps.source.ERROR_CACHE_TTL", "forever")
+    assert _error_cache_ttl() == 24 * 60 * 60
+    assert _error_cache_ttl() == 24 * 60 * 60
+    log_warning.assert_called_once_with(
+        "ignoring PYBUILD_DEPS_ERROR_CACHE_TTL: invalid duration 'forever', "
+        "using 1d instead"
+    )
+
+
+def test_get_package_source_transient_errors_not_cached(cache: Path, http_server):
+    """Download failures may be transient, so they are not cached."""
+    with pytest.raises(PyBuildDepsError, match="Unable to download"):
+        get_package_source("foo", f"{http_server.url}/foo-1.0.tar.gz")
+    assert not list(cache.glob("foo/**/error.json"))
+
+
+@pytest.mark.parametrize(
+    "urls, reason",
+    [
+        (None, "not found on PyPI"),
+        ([{"python_version": "py3", "url": "foo.whl"}], "no source on PyPI"),
+    ],
+)
+def test_get_package_source_unavailable_on_pypi(cache: Path, http_server, urls, reason):
+    """Packages without source code on PyPI are cached as errors."""
+    if urls is not None:
+        http_server.publish("foo", "1.0", urls)
+    for _ in range(2):
+        with pytest.raises(SourceUnavailableError) as exc_info:
+            get_package_source("foo", "1.0", index_url=http_server.index_url)
+        assert exc_info.value.reason == reason
+    assert len(http_server.requests) == 1
+    assert (cache / "foo" / "1.0" / "error.json").is_file()
+
+
+def test_get_package_source_from_index(mocker, http_server, sdist_factory):
+    """Sources are looked up on the configured index, using the given session."""
+    http_server.publish_sdist(sdist_factory("foo", "1.0", SDIST_FILES))
+    session = PipSession()
+    spy = mocker.spy(session, "get")
+    source_path = get_package_source(
+        "foo", "1.0", pip_session=session, index_url=http_server.index_url
+    )
+    assert (
+        read_source_files(source_path)["setup.py"] == SDIST_FILES["setup.py"].encode()
+    )
+    assert spy.call_args_list[0].args == (f"{http_server.url}/pypi/foo/1.0/json",)
+
+
+def test_get_package_source_metrics(http_server, sdist_factory):
+    """Cache hits, downloads and bytes downloaded are measured."""
+    http_server.publish_sdist(sdist_factory("foo", "1.0", SDIST_FILES))
+    session = PipSession()
+    install_download_counter(session)
+    with collect_timings() as timings, collect_counters() as counters:
+        get_package_source(
+            "foo", "1.0", pip_session=session, index_url=http_server.index_url
+        )
+    assert set(timings) == {"download"}
+    assert counters["source_cache_misses"] == 1
+    assert counters["bytes_downloaded"] > 0
+    with collect_timings() as timings, collect_counters() as counters:
+        get_package_source(
+            "foo", "1.0", pip_session=session, index_url=http_server.index_url
+        )
+    assert not timings
+    assert counters == {"source_cache_hits": 1}
+
+
+def test_get_package_source_content_addressed(cache: Path, http_server, sdist_factory):
+    """Names and URLs of the same artifact share a single copy of its source."""
+    sdist = sdist_factory("foo", "1.0", SDIST_FILES)
+    sha256 = hashlib.sha256(sdist.read_bytes()).hexdigest()
+    url = f"{http_server.url}/{sdist.name}"
+    http_server.publish(
+        "foo",
+        "1.0",
+        [{"python_version": "source", "url": url, "digests": {"sha256": sha256}}],
+    )
+    source_path = get_package_source("foo", "1.0", index_url=http_server.index_url)
+    assert source_path.parent.name == sha256
+    assert cache / "_objects" in source_path.parents
+    assert json.loads((cache / "foo" / "1.0" / "source.json").read_text()) == {
+        "sha256": sha256
+    }
+
+    # the same artifact on a mirror, without a known hash: downloaded and hashed
+    mirror = http_server.root / "mirror"
+    mirror.mkdir()
+    (mirror / sdist.name).write_bytes(sdist.read_bytes())
+    assert get_package_source("foo", f"{http_server.url}/mirror/{sdist.name}") == (
+        source_path
+    )
+    # with a known hash, it's not even downloaded
+    requests_made = len(http_server.requests)
+    missing_url = f"{http_server.url}/missing/{sdist.name}#sha256={sha256}"
+    assert get_package_source("foo", missing_url) == source_path
+    assert len(http_server.requests) == requests_made
+    assert len(list(cache.glob("_objects/sha256/*/*"))) == 1
+
+    # once the object is evicted, records pointing to it are removed
+    assert remove_cached_source(source_path.parent)
+    assert not is_source_cached("foo", "1.0")
+    assert remove_dangling_index_records() == 3
+    assert not list(cache.glob("**/source.json"))
+    # and the source is retrieved again
+    assert get_package_source("foo", "1.0", index_url=http_server.index_url) == (
+        source_path
+    )
+    assert is_source_cached("foo", "1.0")
+    assert remove_dangling_index_records() == 0
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="file locking is not supported on windows"
+)
+def test_lock_package_source_objects(cache: Path, http_server, sdist_factory):
+    """Objects are locked along with the sources using them."""
+    sdist = sdist_factory("foo", "1.0", SDIST_FILES)
+    sha256 = hashlib.sha256(sdist.read_bytes()).hexdigest()
+    url = f"{http_server.url}/{sdist.name}#sha256={sha256}"
+    source_path = get_package_source("foo", url)
+    assert cache / "_objects" in source_path.parents
+    with lock_package_source("foo", url):
+        assert get_package_source("foo", url) == source_path
+        assert not remove_cached_source(source_path.parent)
+    assert remove_cached_source(source_path.parent)
+
+
+def test_get_package_source_content_addressed_range_requests(
+    cache: Path, http_server, sdist_factory
+):
+    """Files fetched with range requests are stored by the hash given in the URL."""
+    sdist = sdist_factory("foo", "1.0", SDIST_FILES, fmt="zip")
+    sha256 = hashlib.sha256(sdist.read_bytes()).hexdigest()
+    source_path = get_package_source(
+        "foo", f"{http_server.url}/{sdist.name}#sha256={sha256}"
+    )
+    assert source_path.parent == cache / "_objects" / "sha256" / sha256[:2] / sha256
+    downloads = [r for r in http_server.requests if r[0] == "GET"]
+    assert all(range_header for _, _, range_header in downloads)
+
+
+def test_get_package_source_hash_mismatch(cache: Path, http_server, sdist_factory):
+    """Artifacts not matching their expected hash are rejected."""
+    sdist = sdist_factory("foo", "1.0", SDIST_FILES)
+    url = f"{http_server.url}/{sdist.name}#sha256={'0' * 64}"
+    with pytest.raises(PyBuildDepsError, match="doesn't match"):
+        get_package_source("foo", url)
+    assert not list(cache.glob("**/source.json"))
+
+
+def test_get_pip_session():
+    """A single session is shared when no session is given."""
+    assert get_pip_session() is get_pip_session()
+    # requests don't hang forever on unresponsive servers
+    assert get_pip_session().timeout == REQUEST_TIMEOUT
+
+
+@pytest.mark.parametrize(
+    "index_url, expected",
+    [
+        (None, "https://pypi.org/pypi/foo/1.0/json"),
+        ("https://test.pypi.org/simple/", "https://test.pypi.org/pypi/foo/1.0/json"),
+        (
+            "https://example.com/api/pypi/repo/simple",
+            "https://example.com/api/pypi/repo/pypi/foo/1.0/json",
+        ),
+    ],
+)
+def test_get_json_api_url(index_url, expected):
+    """The JSON API is found next to the simple API of an index."""
+    assert get_json_api_url("foo", "1.0", index_url) == expected
+
+
+def test_get_package_source_offline(http_server, sdist_factory):
+    """Offline, only cached sources are used, failing right away on others."""
+    http_server.publish_sdist(sdist_factory("foo", "1.0", SDIST_FILES))
+    with offline(), pytest.raises(CacheMissError, match=r"source of foo==1\.0"):
+        get_package_source("foo", "1.0", index_url=http_server.index_url)
+    assert http_server.requests == []
+    assert not is_source_cached("foo", "1.0")
+
+    source_path = get_package_source("foo", "1.0", index_url=http_server.index_url)
+    requests_made = len(http_server.requests)
+    with offline():
+        assert get_package_source("foo", "1.0") == source_path
+    assert len(http_server.requests) == requests_made
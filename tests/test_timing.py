@@ -0,0 +1,58 @@
+"""Test timing module."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pybuild_deps.timing import (
+    collect_counters,
+    collect_timings,
+    count,
+    count_downloaded_bytes,
+    install_download_counter,
+    timed,
+)
+
+
+def test_timed_steps():
+    """Steps are only measured when collecting timings, in the current thread."""
+    with timed("ignored"):
+        pass
+
+    def worker():
+        with timed("other thread"):
+            pass
+
+    with collect_timings() as timings:
+        for _ in range(2):
+            with timed("step"):
+                pass
+        with ThreadPoolExecutor() as executor:
+            executor.submit(worker).result()
+    assert set(timings) == {"step"}
+    assert timings["step"] >= 0
+
+
+def test_counters(mocker):
+    """Counters are only collected in the current thread, like timings."""
+    count("ignored")
+
+    def response(method="GET", ok=True, size="10"):
+        return mocker.Mock(
+            request=mocker.Mock(method=method), ok=ok, headers={"Content-Length": size}
+        )
+
+    with collect_counters() as counters:
+        count("step")
+        count("step", 2)
+        with ThreadPoolExecutor() as executor:
+            executor.submit(count, "other thread").result()
+        for args in (("GET",), ("HEAD",), ("GET", False), ("GET", True, "")):
+            count_downloaded_bytes(response(*args))
+    assert counters == {"step": 3, "bytes_downloaded": 10}
+
+
+def test_install_download_counter(mocker):
+    """The download counter is installed once per session."""
+    session = mocker.Mock(hooks={"response": []})
+    install_download_counter(session)
+    install_download_counter(session)
+    assert session.hooks["response"] == [count_downloaded_bytes]
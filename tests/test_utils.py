@@ -3,7 +3,13 @@
 import pytest
 from pip._internal.req.constructors import install_req_from_req_string
 
-from pybuild_deps.utils import get_version, is_supported_requirement
+from pybuild_deps.utils import (
+    format_size,
+    get_version,
+    is_supported_requirement,
+    parse_duration,
+    parse_size,
+)
 
 
 @pytest.mark.parametrize(
@@ -40,3 +46,35 @@ def test_get_version_url():
     )
     version = get_version(ireq)
     assert version == "git+https://remote.url/some_project@commitsha"
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [("10", 10), ("1.5K", 1536), ("500M", 500 * 1024**2), ("2GiB", 2 * 1024**3)],
+)
+def test_parse_size(value, expected):
+    """Sizes accept binary suffixes."""
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value,expected", [("10", 10), ("12h", 12 * 60 * 60), ("30d", 30 * 24 * 60 * 60)]
+)
+def test_parse_duration(value, expected):
+    """Durations accept time unit suffixes."""
+    assert parse_duration(value) == expected
+
+
+@pytest.mark.parametrize("parser", [parse_size, parse_duration])
+def test_parse_invalid(parser):
+    """Invalid values raise ValueError."""
+    with pytest.raises(ValueError, match="invalid"):
+        parser("a lot")
+
+
+@pytest.mark.parametrize(
+    "size,expected", [(10, "10 B"), (2048, "2.0 KiB"), (5 * 1024**3, "5.0 GiB")]
+)
+def test_format_size(size, expected):
+    """Sizes are formatted with binary units."""
+    assert format_size(size) == expected